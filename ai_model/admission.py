@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Construction Placement AI - Admission Control
+
+Bounds how many requests run the model at once and how many may wait for it,
+so a traffic spike degrades some answers instead of growing the latency of
+all of them. A request is refused a model slot (Overloaded) when:
+
+- queue_full: max_concurrent requests are running and max_queue are waiting
+- deadline: its deadline passes, or will pass, before a slot frees up and the
+  model can finish; the expected model time is a moving average per kind of
+  call, measured here
+
+The caller then answers from the geometric fallback or with 503 and a
+Retry-After estimate (see service.py).
+"""
+
+import math
+import time
+import threading
+from contextlib import contextmanager
+
+
+class Overloaded(Exception):
+    """Raised instead of running the model; reason is 'queue_full' or 'deadline'"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Model overloaded ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Counting semaphore with a bounded wait queue and deadline checks.
+
+    Args:
+        max_concurrent: Requests allowed to run the model at the same time
+        max_queue: Requests allowed to wait for a slot; more are refused at once
+        smoothing: Weight of the newest call in the moving average of model time
+    """
+
+    def __init__(self, max_concurrent, max_queue, smoothing=0.1):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.smoothing = smoothing
+        self._condition = threading.Condition()
+        self._running = 0
+        self._waiting = 0
+        self._service_seconds = {}
+        self.admitted = 0
+        self.refused = {'queue_full': 0, 'deadline': 0}
+
+    def expected_seconds(self, kind):
+        """Moving average of the model time for a kind of call (0 until measured)"""
+        return self._service_seconds.get(kind, 0.0)
+
+    def _expected_wait(self, kind):
+        # Requests ahead of us, served max_concurrent at a time (caller holds the lock)
+        ahead = self._waiting + self._running - self.max_concurrent + 1
+        return max(ahead, 0) / self.max_concurrent * self.expected_seconds(kind)
+
+    def _refuse(self, reason, kind):
+        self.refused[reason] += 1
+        retry_after = max(1, math.ceil(self._expected_wait(kind) + self.expected_seconds(kind)))
+        return Overloaded(reason, retry_after)
+
+    def refuse(self, reason, kind='predict'):
+        """Overloaded for a request the server refuses before it reaches slot(), counted like the others"""
+        with self._condition:
+            return self._refuse(reason, kind)
+
+    @contextmanager
+    def slot(self, deadline=None, kind='predict'):
+        """
+        Hold a model slot for the duration of the with block.
+
+        Args:
+            deadline: time.monotonic() by which the call must finish, or None
+            kind: Name under which the model time is averaged
+
+        Raises:
+            Overloaded: If no slot can be had in time
+        """
+        with self._condition:
+            if self._running >= self.max_concurrent:
+                if self._waiting >= self.max_queue:
+                    raise self._refuse('queue_full', kind)
+                if deadline is not None and \
+                        time.monotonic() + self._expected_wait(kind) + self.expected_seconds(kind) > deadline:
+                    raise self._refuse('deadline', kind)
+                self._waiting += 1
+                try:
+                    while self._running >= self.max_concurrent:
+                        # Give up once the model could no longer finish in time
+                        remaining = None
+                        if deadline is not None:
+                            remaining = deadline - self.expected_seconds(kind) - time.monotonic()
+                            if remaining <= 0:
+                                raise self._refuse('deadline', kind)
+                        self._condition.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            elif deadline is not None and time.monotonic() + self.expected_seconds(kind) > deadline:
+                raise self._refuse('deadline', kind)
+            self._running += 1
+            self.admitted += 1
+
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._condition:
+                self._running -= 1
+                previous = self._service_seconds.get(kind)
+                self._service_seconds[kind] = elapsed if previous is None else \
+                    previous + self.smoothing * (elapsed - previous)
+                self._condition.notify()
+
+    def stats(self):
+        with self._condition:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'running': self._running,
+                'waiting': self._waiting,
+                'admitted': self.admitted,
+                'refused': dict(self.refused),
+                'expected_ms': {kind: seconds * 1000.0 for kind, seconds in self._service_seconds.items()}
+            }
@@ -8,11 +8,9 @@ It allows the web application to get AI predictions via API calls.
 
 import os
 import json
-from flask import Flask, request, jsonify, send_from_directory
+import time
+from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
-import numpy as np
-import torch
-from predict import ConstructionPlacementPredictor, load_trained_model
 import logging
 
 # Configure logging
@@ -20,105 +18,93 @@ logging.basicConfig(level=logging.INFO,
                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+import service
+from metrics import STAGE_LATENCY, render_metrics
+
+# Load and warm up the model (in a background thread with STARTUP_MODE=background)
+service.start()
+
 # Initialize Flask app
 app = Flask(__name__, static_folder='.')
 CORS(app)  # Enable CORS to allow requests from the web app
 
-# Load the trained model at startup
-logger.info("Loading trained model...")
-model, scaler, device = load_trained_model()
-if model is None:
-    logger.error("Failed to load model. Using fallback logic.")
-else:
-    logger.info("Model loaded successfully")
-
-@app.route('/api/predict', methods=['POST'])
-def predict_rotation():
-    """API endpoint to predict optimal rotation from work area points"""
+def handle_json_request(handler, *args):
+    """Decode the JSON body and pass it (and args) to a service handler"""
     try:
-        # Get data from request
+        started = time.perf_counter()
         data = request.get_json()
-        
-        if not data or 'workAreaPoints' not in data:
-            return jsonify({
-                'error': 'Missing work area points',
-                'success': False
-            }), 400
-            
-        work_area_points = data['workAreaPoints']
-        
-        # Validate input format
-        if len(work_area_points) != 4:
-            return jsonify({
-                'error': 'Expected exactly 4 work area points',
-                'success': False
-            }), 400
-        
-        # Make prediction using the trained model if available
-        if model is not None:
-            try:
-                # Try using the new prediction function first
-                from predict import predict_construction_placement
-                predictions = predict_construction_placement(model, scaler, device, work_area_points)
-                predicted_angle = predictions["rotation"]
-                predicted_position = predictions["position"]
-                logger.info(f"Predicted angle: {predicted_angle}")
-                logger.info(f"Predicted position: {predicted_position}")
-                
-                return jsonify({
-                    'rotation': float(predicted_angle),
-                    'position': [float(predicted_position[0]), float(predicted_position[1])],
-                    'success': True
-                })
-            except Exception as e:
-                # Fall back to the older function if there's an error
-                logger.warning(f"Error using new prediction function: {str(e)}. Falling back to rotation-only prediction.")
-                from predict import predict_construction_rotation
-                predicted_angle = predict_construction_rotation(model, scaler, device, work_area_points)
-                logger.info(f"Predicted angle: {predicted_angle}")
-                
-                return jsonify({
-                    'rotation': float(predicted_angle),
-                    'success': True
-                })
-        else:
-            # Fallback to simple algorithm if model isn't available
-            logger.warning("Using fallback prediction algorithm")
-            
-            # Simple algorithm (same as in JavaScript version)
-            def calculate_angle_between_points(p1, p2):
-                return np.arctan2(p2[0] - p1[0], p2[1] - p1[1]) * 180 / np.pi
-            
-            # Get a base angle from the first two points
-            reference_point = work_area_points[0]
-            point2 = work_area_points[1]
-            
-            base_angle = calculate_angle_between_points(reference_point, point2)
-            suggested_rotation = (base_angle + 90) % 360
-            if suggested_rotation < 0:
-                suggested_rotation += 360
-                
-            return jsonify({
-                'rotation': float(suggested_rotation),
-                'fallback': True,
-                'success': True
-            })
-            
+        STAGE_LATENCY.observe(time.perf_counter() - started, 'request_parsing')
     except Exception as e:
-        logger.error(f"Prediction error: {str(e)}")
+        logger.error(f"Request parsing error: {str(e)}")
         return jsonify({
             'error': str(e),
             'success': False
         }), 500
+    if service.profiler.enabled:
+        payload, status_code = service.profiler.run(request.path, handler, data, *args)
+    else:
+        payload, status_code = handler(data, *args)
+    started = time.perf_counter()
+    response = jsonify(payload)
+    STAGE_LATENCY.observe(time.perf_counter() - started, 'json_encoding')
+    if status_code == 503 and 'retryAfter' in payload:
+        response.headers['Retry-After'] = str(payload['retryAfter'])
+    return response, status_code
+
+def request_deadline():
+    """Deadline from the X-Request-Deadline-Ms header (or REQUEST_DEADLINE_MS), counted from now"""
+    return service.request_deadline(request.headers.get('X-Request-Deadline-Ms'))
+
+@app.route('/api/predict', methods=['POST'])
+def predict_rotation():
+    """API endpoint to predict optimal rotation from work area points"""
+    return handle_json_request(service.handle_predict, request_deadline())
+
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_rotation_batch():
+    """API endpoint to predict rotation and position for many work areas in one call"""
+    return handle_json_request(service.handle_predict_batch, request_deadline())
+
+@app.route('/api/predict/stream', methods=['POST'])
+def predict_rotation_stream():
+    """API endpoint that predicts NDJSON work areas line by line, streaming the results"""
+    chunks = iter(lambda: request.stream.read(65536), b'')
+    return Response(stream_with_context(service.stream_predictions(chunks)), mimetype='application/x-ndjson')
+
+@app.route('/api/similar', methods=['POST'])
+def similar_placements():
+    """API endpoint returning the k most similar historical placements"""
+    return handle_json_request(service.handle_similar)
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    status = {
-        'status': 'healthy',
-        'model_loaded': model is not None
-    }
-    return jsonify(status)
+    return jsonify(service.health_status())
+
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """Readiness endpoint: 200 once the model is loaded and warmed up, 503 before"""
+    status, status_code = service.ready_status()
+    return jsonify(status), status_code
+
+@app.route('/api/admin/reload', methods=['POST'])
+def reload_model():
+    """Load the model artifacts again and swap them in if they pass a smoke prediction"""
+    payload, status_code = service.handle_reload(request.get_json(silent=True),
+                                                 request.headers.get('X-Admin-Token'))
+    return jsonify(payload), status_code
+
+@app.route('/api/admin/profile', methods=['POST'])
+def profile_requests():
+    """Profile a sampled fraction of requests and/or the next N requests"""
+    payload, status_code = service.handle_profile(request.get_json(silent=True),
+                                                  request.headers.get('X-Admin-Token'))
+    return jsonify(payload), status_code
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics: per-stage latency histograms and response counters"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/', methods=['GET'])
 def index():
@@ -151,7 +137,8 @@ def index():
     [49.80136, -97.07778],  // Point 2
     [49.80134, -97.07764],  // Point 3 
     [49.80142, -97.07768]   // Point 4
-  ]
+  ],
+  "constructionName": "LONG TERM RIGHT LANE CLOSURE ..."  // Optional: per-type model (MODEL_REGISTRY_DIR)
 }
                 </pre>
                 <h4>Response:</h4>
@@ -164,6 +151,69 @@ def index():
                 </pre>
             </div>
             
+            <div class="endpoint">
+                <h3>POST /api/predict/batch</h3>
+                <p>Predicts rotation and position for many work areas in one call.</p>
+                <h4>Request:</h4>
+                <pre>
+{
+  "workAreas": [
+    [[49.80141, -97.07760], [49.80136, -97.07778], [49.80134, -97.07764], [49.80142, -97.07768]],
+    ...
+  ]
+}
+                </pre>
+                <h4>Response:</h4>
+                <pre>
+{
+  "results": [
+    {"rotation": 145.23, "position": [49.80138, -97.07768]},
+    ...
+  ],
+  "success": true
+}
+                </pre>
+            </div>
+            
+            <div class="endpoint">
+                <h3>POST /api/predict/stream</h3>
+                <p>Streams predictions for a newline-delimited (NDJSON) body of work areas, one result line per input line, as they are computed. Each line is a list of 4 [lat, lng] points or an object with <code>workAreaPoints</code> and an optional <code>id</code>. Invalid lines get an error result; the rest of the stream continues.</p>
+                <h4>Request (Content-Type: application/x-ndjson):</h4>
+                <pre>
+[[49.80141, -97.07760], [49.80136, -97.07778], [49.80134, -97.07764], [49.80142, -97.07768]]
+{"id": "segment-2", "workAreaPoints": [[49.80241, -97.07760], [49.80236, -97.07778], [49.80234, -97.07764], [49.80242, -97.07768]]}
+[[49.80141, -97.07760]]
+                </pre>
+                <h4>Response:</h4>
+                <pre>
+{"line": 1, "rotation": 145.23, "position": [49.80138, -97.07768], "success": true}
+{"line": 2, "id": "segment-2", "rotation": 144.87, "position": [49.80238, -97.07768], "success": true}
+{"line": 3, "error": "Expected exactly 4 work area points", "success": false}
+                </pre>
+            </div>
+            
+            <div class="endpoint">
+                <h3>POST /api/similar</h3>
+                <p>Returns the k past placements whose work areas are closest to the given one (distance is the RMS distance between corresponding points, in meters).</p>
+                <h4>Request:</h4>
+                <pre>
+{
+  "workAreaPoints": [[49.80141, -97.07760], [49.80136, -97.07778], [49.80134, -97.07764], [49.80142, -97.07768]],
+  "k": 3
+}
+                </pre>
+                <h4>Response:</h4>
+                <pre>
+{
+  "results": [
+    {"rotation": 137.0, "distance": 0.42, "position": [49.80138, -97.07768], "constructionName": "..."},
+    ...
+  ],
+  "success": true
+}
+                </pre>
+            </div>
+            
             <div class="endpoint">
                 <h3>GET /api/health</h3>
                 <p>Health check endpoint to verify the API is working.</p>
@@ -171,7 +221,64 @@ def index():
                 <pre>
 {
   "status": "healthy",
-  "model_loaded": true
+  "model_loaded": true,
+  "ready": true,
+  "backend": "torch",
+  "model": {"version": "3f9c2a7e41d0", "loaded_at": "2025-04-04T10:15:02", "load_seconds": 0.05}
+}
+                </pre>
+            </div>
+            
+            <div class="endpoint">
+                <h3>GET /api/ready</h3>
+                <p>Readiness endpoint. Returns 200 once the model is loaded and warmed up, 503 before that.</p>
+                <h4>Response:</h4>
+                <pre>
+{
+  "ready": true,
+  "model_loaded": true,
+  "startup_seconds": {"import_backend": 1.21, "load_artifacts": 0.05, "warmup": 0.02, "total": 1.28}
+}
+                </pre>
+            </div>
+            
+            <div class="endpoint">
+                <h3>POST /api/admin/reload</h3>
+                <p>Loads the model artifacts again and swaps them in if a smoke prediction succeeds; otherwise the current model stays active. Requires the <code>X-Admin-Token</code> header to match <code>ADMIN_TOKEN</code>; disabled (403) when <code>ADMIN_TOKEN</code> is not set. Send <code>{"force": true}</code> to reload an unchanged version.</p>
+                <h4>Response:</h4>
+                <pre>
+{
+  "status": "swapped",
+  "reason": "admin",
+  "previous_version": "3f9c2a7e41d0",
+  "version": "b81d09c5e7a2",
+  "seconds": 0.09,
+  "success": true
+}
+                </pre>
+            </div>
+            
+            <div class="endpoint">
+                <h3>POST /api/admin/profile</h3>
+                <p>Profiles a fraction of the JSON API requests (<code>sampleRate</code>) and/or the next <code>next</code> requests with cProfile, writing the dumps and a collapsed-stack flame graph to <code>PROFILE_DIR</code>. Send <code>{}</code> to switch profiling off. Requires the <code>X-Admin-Token</code> header to match <code>ADMIN_TOKEN</code>; disabled (403) when <code>ADMIN_TOKEN</code> is not set.</p>
+                <h4>Request:</h4>
+                <pre>
+{
+  "sampleRate": 0.01,
+  "next": 20
+}
+                </pre>
+                <h4>Response:</h4>
+                <pre>
+{
+  "enabled": true,
+  "sample_rate": 0.01,
+  "next_requests": 20,
+  "profiled": 0,
+  "dropped": 0,
+  "max_dumps": 100,
+  "output_dir": "profiles",
+  "success": true
 }
                 </pre>
             </div>
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Construction Placement AI - ASGI API Server
+
+An asynchronous alternative to app.py exposing the same /api/predict,
+/api/predict/batch, /api/predict/stream, /api/similar, /api/health,
+/api/ready, /api/metrics and /api/admin/reload contract. Request bodies are read on the
+event loop, while model calls and JSON encoding run on a bounded executor,
+so slow clients do not each tie up an OS thread.
+
+Run with:
+    uvicorn asgi_app:app --host 0.0.0.0 --port 8080
+
+Environment variables:
+    INFERENCE_EXECUTOR: 'thread' (default) or 'process'
+    INFERENCE_WORKERS: Executor size (default: number of CPU cores)
+    MAX_BODY_BYTES: Largest accepted request body (default: 10 MB)
+"""
+
+import os
+import json
+import time
+import asyncio
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+import service
+from metrics import STAGE_LATENCY, render_metrics, drain_metrics, merge_metrics
+
+INFERENCE_EXECUTOR = os.environ.get('INFERENCE_EXECUTOR', 'thread').lower()
+INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', os.cpu_count() or 1))
+MAX_BODY_BYTES = int(os.environ.get('MAX_BODY_BYTES', 10 * 1024 * 1024))
+
+# Process workers are forked from this process and share the loaded model
+# pages, so in that mode the model must be loaded before the pool starts
+if INFERENCE_EXECUTOR == 'process':
+    service.start(background=False)
+else:
+    service.start()
+
+# POST routes and the service handler that serves each of them
+POST_ROUTES = {
+    '/api/predict': 'handle_predict',
+    '/api/predict/batch': 'handle_predict_batch',
+    '/api/similar': 'handle_similar'
+}
+
+# /api/health sections whose state is kept separately in every executor
+# process in process mode, so the server's own copy says nothing
+PER_PROCESS_STATUS = ('model_registry', 'prediction_cache', 'micro_batching', 'admission')
+
+# Routes whose handlers take a deadline (X-Request-Deadline-Ms, see service.request_deadline)
+DEADLINE_ROUTES = {'/api/predict', '/api/predict/batch'}
+
+CORS_HEADERS = [
+    (b'access-control-allow-origin', b'*'),
+    (b'access-control-allow-methods', b'GET, POST, OPTIONS'),
+    (b'access-control-allow-headers', b'Content-Type, X-Request-Deadline-Ms')
+]
+
+executor = None
+
+# Admission-controlled requests handed to the executor and not answered yet.
+# Queued on the executor, they would wait before reaching admission control,
+# so requests beyond what it can hold (running + queued) are refused here.
+admission_backlog = 0
+
+def _init_process_worker():
+    """Prepare a forked executor process to serve predictions"""
+    # The batcher's thread is not copied by fork, and each process already
+    # handles one request at a time
+    service.disable_micro_batching()
+    # Drop the metrics inherited from the server, which still counts them
+    drain_metrics()
+    if service.INFERENCE_BACKEND != 'numpy':
+        import torch
+        torch.set_num_threads(1)
+
+def _restart_process_executor(loaded_model):
+    """Fork fresh workers after a model swap; running workers keep the model they were forked with"""
+    global executor
+    if executor is None:
+        return
+    old_executor = executor
+    executor = create_executor()
+    # Requests already queued on the old workers still complete
+    old_executor.shutdown(wait=False)
+    logger.info(f"Restarted process workers with model {loaded_model.version}")
+
+if INFERENCE_EXECUTOR == 'process':
+    service.model_swapped_callbacks.append(_restart_process_executor)
+
+def _run_handler(handler_name, data, *args):
+    """Run a service handler and encode its response (executes on the executor)"""
+    payload, status_code = getattr(service, handler_name)(data, *args)
+    started = time.perf_counter()
+    body = json.dumps(payload).encode('utf-8')
+    STAGE_LATENCY.observe(time.perf_counter() - started, 'json_encoding')
+    headers = []
+    if status_code == 503 and 'retryAfter' in payload:
+        headers.append((b'retry-after', str(payload['retryAfter']).encode()))
+    return body, status_code, headers
+
+def _call_in_process(fn, *args):
+    """Run fn in an executor process and hand back the metrics it recorded with its result"""
+    return fn(*args), drain_metrics()
+
+async def run_on_executor(loop, fn, *args):
+    """Run fn on the inference executor; in process mode its metrics are merged into ours"""
+    if INFERENCE_EXECUTOR != 'process':
+        return await loop.run_in_executor(executor, fn, *args)
+    result, recorded = await loop.run_in_executor(executor, _call_in_process, fn, *args)
+    merge_metrics(recorded)
+    return result
+
+def create_executor():
+    if INFERENCE_EXECUTOR == 'process':
+        # Fork so workers inherit the model instead of loading their own copy
+        context = multiprocessing.get_context('fork')
+        logger.info(f"Starting process executor with {INFERENCE_WORKERS} workers")
+        return ProcessPoolExecutor(max_workers=INFERENCE_WORKERS, mp_context=context,
+                                   initializer=_init_process_worker)
+    workers = INFERENCE_WORKERS
+    if service.admission is not None:
+        # A thread for every request admission control may hold, so the queued
+        # ones wait in its queue (with their deadlines) rather than the executor's
+        workers = max(workers, service.admission.max_concurrent + service.admission.max_queue)
+    logger.info(f"Starting thread executor with {workers} workers")
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='inference')
+
+async def read_body(receive):
+    """Read the full request body, or return None if it exceeds MAX_BODY_BYTES"""
+    chunks = []
+    size = 0
+    more_body = True
+    while more_body:
+        message = await receive()
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            return None
+        chunks.append(chunk)
+        more_body = message.get('more_body', False)
+    return b''.join(chunks)
+
+async def send_response(send, status_code, body, content_type=b'application/json', extra_headers=()):
+    headers = [(b'content-type', content_type),
+               (b'content-length', str(len(body)).encode())] + CORS_HEADERS + list(extra_headers)
+    await send({'type': 'http.response.start', 'status': status_code, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+def error_body(message):
+    return json.dumps({'error': message, 'success': False}).encode('utf-8')
+
+async def stream_predict(receive, send, loop):
+    """
+    Serve /api/predict/stream: parse NDJSON work areas as the body arrives and
+    send each chunk's results before reading further, so memory stays flat
+    """
+    headers = [(b'content-type', b'application/x-ndjson')] + CORS_HEADERS
+    await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+    parser = service.StreamParser()
+    try:
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            more_body = message.get('more_body', False)
+            chunks = parser.feed(message.get('body', b''))
+            if not more_body:
+                chunks += parser.finish()
+            for entries in chunks:
+                body = await run_on_executor(loop, service.predict_stream_chunk, entries)
+                await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+        service.record_stream(parser)
+    except Exception as e:
+        service.record_stream(parser, str(e))
+        await send({'type': 'http.response.body', 'body': service.stream_error_line(str(e)), 'more_body': True})
+    await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+async def handle_lifespan(receive, send):
+    global executor
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            executor = create_executor()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if executor is not None:
+                executor.shutdown(wait=True)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def run_admitted(loop, handler_name, data, deadline):
+    """Run an admission-controlled handler, refusing it (queue_full) if admission control is already full"""
+    global admission_backlog
+    admission = service.admission
+    if admission is None:
+        return await run_on_executor(loop, _run_handler, handler_name, data, deadline)
+    if admission_backlog >= admission.max_concurrent + admission.max_queue:
+        # Answered on the default thread pool: the handler only checks the
+        # cache and builds the fallback or 503, without waiting for a slot
+        return await loop.run_in_executor(None, _run_handler, handler_name, data, service.QUEUE_FULL)
+    admission_backlog += 1
+    try:
+        return await run_on_executor(loop, _run_handler, handler_name, data, deadline)
+    finally:
+        admission_backlog -= 1
+
+async def app(scope, receive, send):
+    """ASGI application entry point"""
+    global executor
+    if scope['type'] == 'lifespan':
+        await handle_lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    # Servers that skip the lifespan protocol still get an executor
+    if executor is None:
+        executor = create_executor()
+
+    path = scope['path']
+    method = scope['method']
+    loop = asyncio.get_running_loop()
+
+    if method == 'OPTIONS':
+        await send_response(send, 204, b'')
+        return
+
+    if path == '/api/health' and method == 'GET':
+        # Cheap enough to answer on the event loop
+        status = service.health_status()
+        if INFERENCE_EXECUTOR == 'process':
+            for key in PER_PROCESS_STATUS:
+                if key in status:
+                    status[key] = {'unavailable': 'kept per executor process (INFERENCE_EXECUTOR=process)'}
+        await send_response(send, 200, json.dumps(status).encode('utf-8'))
+        return
+
+    if path == '/api/metrics' and method == 'GET':
+        await send_response(send, 200, render_metrics().encode('utf-8'),
+                            content_type=b'text/plain; version=0.0.4')
+        return
+
+    if path == '/api/ready' and method == 'GET':
+        status, status_code = service.ready_status()
+        await send_response(send, status_code, json.dumps(status).encode('utf-8'))
+        return
+
+    if path == '/api/admin/reload' and method == 'POST':
+        raw_body = await read_body(receive)
+        try:
+            data = json.loads(raw_body) if raw_body else None
+        except ValueError:
+            data = None
+        token = dict(scope['headers']).get(b'x-admin-token', b'').decode('latin-1') or None
+        # Loading runs on the default thread pool, outside the inference executor
+        payload, status_code = await loop.run_in_executor(None, service.handle_reload, data, token)
+        await send_response(send, status_code, json.dumps(payload).encode('utf-8'))
+        return
+
+    if path == '/api/predict/stream' and method == 'POST':
+        await stream_predict(receive, send, loop)
+        return
+
+    handler_name = POST_ROUTES.get(path)
+    # Counted from arrival, so time spent reading the body and queued on the executor is included
+    handler_args = ()
+    if path in DEADLINE_ROUTES:
+        header = dict(scope['headers']).get(b'x-request-deadline-ms', b'').decode('latin-1')
+        handler_args = (service.request_deadline(header),)
+    if handler_name is None:
+        await send_response(send, 404, error_body('Not found'))
+        return
+    if method != 'POST':
+        await send_response(send, 405, error_body('Method not allowed'))
+        return
+
+    raw_body = await read_body(receive)
+    if raw_body is None:
+        await send_response(send, 413, error_body('Request body too large'))
+        return
+
+    try:
+        started = time.perf_counter()
+        data = json.loads(raw_body) if raw_body else None
+        STAGE_LATENCY.observe(time.perf_counter() - started, 'request_parsing')
+    except ValueError as e:
+        # Same status as app.py, where request parsing errors are returned as 500
+        logger.error(f"Request parsing error: {str(e)}")
+        await send_response(send, 500, error_body(str(e)))
+        return
+
+    if path in DEADLINE_ROUTES:
+        body, status_code, headers = await run_admitted(loop, handler_name, data, *handler_args)
+    else:
+        body, status_code, headers = await run_on_executor(loop, _run_handler, handler_name, data, *handler_args)
+    await send_response(send, status_code, body, extra_headers=headers)
+
+if __name__ == "__main__":
+    import uvicorn
+    port = int(os.environ.get('PORT', 8080))
+    uvicorn.run(app, host='0.0.0.0', port=port)
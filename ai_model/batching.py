@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Construction Placement AI - Dynamic Micro-Batching
+
+This module collects single-item predictions that arrive from concurrent
+request threads within a short window and runs them as one batched forward
+pass. Each caller blocks until its own result is ready.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class _PendingPrediction:
+    """A single queued work area waiting for its batch."""
+    __slots__ = ('work_area_points', 'future', 'enqueued_at')
+
+    def __init__(self, work_area_points):
+        self.work_area_points = work_area_points
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    Groups concurrent single-item predictions into batches.
+
+    A background thread waits for the first queued item, then keeps collecting
+    until either max_batch_size items are queued or max_wait_ms has passed
+    since that first item arrived. The batch is passed to predict_batch_fn,
+    which must accept a list of work areas and return one result per item.
+    """
+
+    def __init__(self, predict_batch_fn, max_batch_size=32, max_wait_ms=2.0, stats_window=10000):
+        self.predict_batch_fn = predict_batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._running = True
+
+        # Recent batch sizes and queue waits (seconds) for tuning the window
+        self._batch_sizes = deque(maxlen=stats_window)
+        self._queue_waits = deque(maxlen=stats_window)
+        self._total_batches = 0
+        self._total_items = 0
+
+        self._worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._worker.start()
+
+    def predict(self, work_area_points, timeout=None):
+        """Queue one work area and block until its prediction is ready."""
+        pending = _PendingPrediction(work_area_points)
+        with self._condition:
+            if not self._running:
+                raise RuntimeError('Micro-batcher has been stopped')
+            self._queue.append(pending)
+            self._condition.notify()
+        return pending.future.result(timeout=timeout)
+
+    def stop(self):
+        """Stop the worker thread after it drains the queue."""
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        self._worker.join()
+
+    def _next_batch(self):
+        """Wait for the first item, then collect until the window closes."""
+        with self._condition:
+            while not self._queue and self._running:
+                self._condition.wait()
+            if not self._queue:
+                return []
+
+            deadline = self._queue[0].enqueued_at + self.max_wait
+            while len(self._queue) < self.max_batch_size and self._running:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            batch = []
+            while self._queue and len(batch) < self.max_batch_size:
+                batch.append(self._queue.popleft())
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+
+            started = time.perf_counter()
+            with self._condition:
+                for pending in batch:
+                    self._queue_waits.append(started - pending.enqueued_at)
+                self._batch_sizes.append(len(batch))
+                self._total_batches += 1
+                self._total_items += len(batch)
+
+            try:
+                results = self.predict_batch_fn([p.work_area_points for p in batch])
+            except Exception as e:
+                for pending in batch:
+                    pending.future.set_exception(e)
+                continue
+
+            for pending, result in zip(batch, results):
+                pending.future.set_result(result)
+
+    def stats(self):
+        """Batch-size and queue-wait statistics over the recent window."""
+        # Copy under the lock the worker updates them with; the percentiles
+        # are computed outside it
+        with self._condition:
+            batch_sizes = np.array(self._batch_sizes, dtype=np.float64)
+            queue_waits = np.array(self._queue_waits, dtype=np.float64) * 1000.0
+            stats = {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'total_batches': self._total_batches,
+                'total_items': self._total_items,
+                'queue_depth': len(self._queue)
+            }
+        if len(batch_sizes) > 0:
+            stats['batch_size'] = {
+                'mean': float(batch_sizes.mean()),
+                'p50': float(np.percentile(batch_sizes, 50)),
+                'max': float(batch_sizes.max())
+            }
+        if len(queue_waits) > 0:
+            stats['queue_wait_ms'] = {
+                'mean': float(queue_waits.mean()),
+                'p50': float(np.percentile(queue_waits, 50)),
+                'p95': float(np.percentile(queue_waits, 95)),
+                'p99': float(np.percentile(queue_waits, 99))
+            }
+        return stats
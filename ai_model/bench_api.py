@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Construction Placement AI - API Load Test
+
+This script drives /api/predict and /api/health at a controlled concurrency
+and (optionally) request rate, using work areas sampled from the
+construction sample CSVs, and reports throughput, latency percentiles and
+error rate. Results are saved as JSON so runs against different model or
+server versions can be compared.
+
+Only model predictions count as successful /api/predict responses: answers
+from the geometric or overload fallback (fallback: true), from the similar
+placement index (similar: true) and 503s from admission control (shed) are
+counted as separate outcomes, and the latency percentiles and throughput
+cover model predictions only. A locally started server runs without its
+prediction cache (unless --cache), since the sampled work areas repeat.
+
+Modes:
+- http: Send requests to --url, or start app.py / asgi_app.py locally first
+- inprocess: Call predict_construction_placement directly, to separate the
+  model cost from the server overhead
+
+Usage:
+    python bench_api.py --start-server flask --concurrency 16 --duration 30
+    python bench_api.py --url http://localhost:8080 --rate 500 --output run.json --compare baseline.json
+    python bench_api.py --mode inprocess --concurrency 4
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import random
+import argparse
+import platform
+import threading
+import subprocess
+import http.client
+from urllib.parse import urlparse
+import numpy as np
+import pandas as pd
+
+FEATURE_COLUMNS = ['reference_point_lat', 'reference_point_lng',
+                   'point2_lat', 'point2_lng',
+                   'point3_lat', 'point3_lng',
+                   'point4_lat', 'point4_lng']
+
+DEFAULT_SAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'construction_samples_*.csv')
+
+def load_work_areas(pattern, limit=10000, seed=42):
+    """Sample up to limit work areas from the CSVs matching pattern."""
+    frames = [pd.read_csv(path, usecols=FEATURE_COLUMNS) for path in sorted(glob.glob(pattern))]
+    if not frames:
+        raise SystemExit(f"No sample CSVs match {pattern}")
+    df = pd.concat(frames, ignore_index=True)
+    if len(df) > limit:
+        df = df.sample(n=limit, random_state=seed)
+    return df[FEATURE_COLUMNS].to_numpy().reshape(-1, 4, 2).tolist()
+
+class HttpTarget:
+    """Sends requests over one persistent connection per worker thread."""
+
+    def __init__(self, url, timeout=10.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.connection = connection
+        return connection
+
+    def request(self, method, path, payload=None):
+        """
+        Send one request.
+
+        Returns:
+            str: Outcome: 'ok' (for /api/predict, a model prediction),
+                 'fallback', 'similar', 'shed' (503 from admission control) or 'error'
+        """
+        body = json.dumps(payload) if payload is not None else None
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        try:
+            connection = self._connection()
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            data = response.read()
+            if response.status == 503 and path == '/api/predict':
+                return 'shed' if 'reason' in json.loads(data) else 'error'
+            if response.status != 200:
+                return 'error'
+            if path != '/api/predict':
+                return 'ok'
+            result = json.loads(data)
+            if not result.get('success', False):
+                return 'error'
+            if result.get('fallback'):
+                return 'fallback'
+            if result.get('similar'):
+                return 'similar'
+            return 'ok'
+        except (OSError, http.client.HTTPException, ValueError):
+            # Reconnect on the next request
+            self._local.connection = None
+            return 'error'
+
+    def predict(self, work_area_points):
+        return self.request('POST', '/api/predict', {'workAreaPoints': work_area_points})
+
+    def health(self):
+        return self.request('GET', '/api/health')
+
+class InProcessTarget:
+    """Calls the prediction function directly, without any server."""
+
+    def __init__(self, backend_name):
+        if backend_name == 'numpy':
+            import numpy_engine as backend
+        else:
+            import predict as backend
+        self.backend = backend
+        self.model, self.scaler, self.device = backend.load_trained_model()
+        if self.model is None:
+            raise SystemExit("Model could not be loaded")
+
+    def predict(self, work_area_points):
+        try:
+            self.backend.predict_construction_placement(self.model, self.scaler, self.device, work_area_points)
+            return 'ok'
+        except Exception:
+            return 'error'
+
+    def health(self):
+        return 'ok'
+
+def start_local_server(server, port, cache=False):
+    """Start app.py or asgi_app.py on port (without its prediction cache unless cache) and wait until it is ready."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PORT=str(port))
+    if not cache:
+        env['PREDICTION_CACHE_SIZE'] = '0'
+    if server == 'asgi':
+        command = [sys.executable, '-m', 'uvicorn', 'asgi_app:app', '--host', '127.0.0.1',
+                   '--port', str(port), '--log-level', 'warning']
+    else:
+        command = [sys.executable, 'app.py']
+    process = subprocess.Popen(command, cwd=here, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    target = HttpTarget(f'http://127.0.0.1:{port}')
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Server exited with code {process.returncode}")
+        if target.request('GET', '/api/ready') == 'ok':
+            return process
+        time.sleep(0.25)
+    process.terminate()
+    raise SystemExit("Server did not become ready within 120 seconds")
+
+def run_load(target, work_areas, concurrency, duration, rate=None, health_fraction=0.0, warmup=2.0, seed=42):
+    """
+    Drive the target from concurrency threads for duration seconds.
+
+    Without a rate each thread sends its next request as soon as the previous
+    one returns (closed loop). With a rate, request i is scheduled at
+    start + i / rate and its latency is measured from the scheduled time, so
+    queueing delay is not hidden when the server falls behind.
+
+    Returns:
+        tuple: Per-endpoint dicts of the latencies (seconds) of 'ok' responses
+               and of the count of every outcome
+    """
+    results = {'predict': [], 'health': []}
+    outcomes = {'predict': {}, 'health': {}}
+    lock = threading.Lock()
+    counter = iter(range(sys.maxsize))
+    start = time.perf_counter() + warmup
+    end = start + duration
+
+    def worker(worker_id):
+        rng = random.Random(seed + worker_id)
+        while True:
+            with lock:
+                index = next(counter)
+            scheduled = start - warmup + index / rate if rate else time.perf_counter()
+            if scheduled >= end:
+                return
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+            endpoint = 'health' if rng.random() < health_fraction else 'predict'
+            sent = scheduled if rate else time.perf_counter()
+            if endpoint == 'health':
+                outcome = target.health()
+            else:
+                outcome = target.predict(rng.choice(work_areas))
+            latency = time.perf_counter() - sent
+
+            # Requests sent during warmup are not recorded
+            if sent >= start:
+                with lock:
+                    outcomes[endpoint][outcome] = outcomes[endpoint].get(outcome, 0) + 1
+                    if outcome == 'ok':
+                        results[endpoint].append(latency)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, outcomes
+
+def summarize(latencies, outcomes, duration):
+    """Totals per outcome; throughput and latency cover the 'ok' responses only"""
+    total = sum(outcomes.values())
+    error_count = outcomes.get('error', 0)
+    summary = {
+        'requests': total,
+        'outcomes': dict(outcomes),
+        'errors': error_count,
+        'error_rate': error_count / total if total else 0.0,
+        'throughput_rps': len(latencies) / duration
+    }
+    if latencies:
+        ms = np.array(latencies) * 1000.0
+        summary['latency_ms'] = {
+            'mean': float(ms.mean()),
+            'p50': float(np.percentile(ms, 50)),
+            'p95': float(np.percentile(ms, 95)),
+            'p99': float(np.percentile(ms, 99)),
+            'max': float(ms.max())
+        }
+    return summary
+
+def compare(current, baseline_path):
+    """Print the change in throughput and latency against a saved run."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path}:")
+    for endpoint, summary in current['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(endpoint)
+        if not previous or 'latency_ms' not in summary or 'latency_ms' not in previous:
+            continue
+        change = (summary['throughput_rps'] / previous['throughput_rps'] - 1) * 100 if previous['throughput_rps'] else 0.0
+        print(f"- {endpoint}: throughput {change:+.1f}%")
+        for key in ('p50', 'p95', 'p99'):
+            before, after = previous['latency_ms'][key], summary['latency_ms'][key]
+            print(f"    {key}: {before:.2f} -> {after:.2f} ms ({(after / before - 1) * 100 if before else 0.0:+.1f}%)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the construction placement prediction API")
+    parser.add_argument('--mode', choices=['http', 'inprocess'], default='http')
+    parser.add_argument('--url', default=None, help="Server to target (default: start one locally)")
+    parser.add_argument('--start-server', choices=['flask', 'asgi'], default='flask',
+                        help="Server to start locally when no --url is given")
+    parser.add_argument('--port', type=int, default=8765, help="Port for the locally started server")
+    parser.add_argument('--cache', action='store_true',
+                        help="Keep the prediction cache of the locally started server (default: PREDICTION_CACHE_SIZE=0)")
+    parser.add_argument('--backend', choices=['torch', 'numpy'], default='torch', help="Backend for inprocess mode")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=None, help="Target requests/sec (default: closed loop)")
+    parser.add_argument('--duration', type=float, default=20.0, help="Measured seconds")
+    parser.add_argument('--warmup', type=float, default=2.0, help="Unmeasured seconds before measuring")
+    parser.add_argument('--health-fraction', type=float, default=0.05, help="Share of requests sent to /api/health")
+    parser.add_argument('--samples', default=DEFAULT_SAMPLES, help="Glob of sample CSVs to draw work areas from")
+    parser.add_argument('--output', default=None, help="Write results to this JSON file")
+    parser.add_argument('--compare', default=None, help="Compare against a previous results JSON file")
+    parser.add_argument('--label', default=None, help="Free-form label stored with the results")
+    args = parser.parse_args()
+
+    work_areas = load_work_areas(args.samples)
+    server_process = None
+    if args.mode == 'inprocess':
+        target = InProcessTarget(args.backend)
+        target_name = f'inprocess:{args.backend}'
+    elif args.url:
+        target = HttpTarget(args.url)
+        target_name = args.url
+    else:
+        print(f"Starting {args.start_server} server on port {args.port}...")
+        server_process = start_local_server(args.start_server, args.port, cache=args.cache)
+        target = HttpTarget(f'http://127.0.0.1:{args.port}')
+        target_name = f'local:{args.start_server}'
+
+    try:
+        print(f"Running {args.duration:.0f}s against {target_name} with concurrency {args.concurrency}"
+              + (f" at {args.rate:.0f} req/s" if args.rate else " (closed loop)"))
+        latencies, outcomes = run_load(target, work_areas, args.concurrency, args.duration, rate=args.rate,
+                                     health_fraction=args.health_fraction, warmup=args.warmup)
+    finally:
+        if server_process is not None:
+            server_process.terminate()
+            server_process.wait()
+
+    report = {
+        'label': args.label,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'target': target_name,
+        'concurrency': args.concurrency,
+        'rate': args.rate,
+        'duration': args.duration,
+        'host': {'python': platform.python_version(), 'machine': platform.machine(), 'cpus': os.cpu_count()},
+        'cache': args.cache if server_process is not None else None,
+        'endpoints': {endpoint: summarize(latencies[endpoint], outcomes[endpoint], args.duration)
+                      for endpoint in latencies}
+    }
+
+    for endpoint, summary in report['endpoints'].items():
+        if summary['requests'] == 0:
+            continue
+        print(f"\n/api/{endpoint}: {summary['requests']} requests, {summary['throughput_rps']:.1f} req/s, "
+              f"{summary['error_rate'] * 100:.2f}% errors")
+        others = {outcome: count for outcome, count in summary['outcomes'].items() if outcome not in ('ok', 'error')}
+        if others:
+            print("  not model predictions: " + ', '.join(f"{count} {outcome}" for outcome, count in sorted(others.items())))
+        if 'latency_ms' in summary:
+            latency = summary['latency_ms']
+            print(f"  latency ms: p50 {latency['p50']:.2f}, p95 {latency['p95']:.2f}, "
+                  f"p99 {latency['p99']:.2f}, max {latency['max']:.2f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+    if args.compare:
+        compare(report, args.compare)
+
+if __name__ == "__main__":
+    main()
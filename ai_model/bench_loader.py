@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Construction Placement AI - Training Loader Benchmark
+
+This script measures training throughput (samples/sec) with the original
+per-sample DataLoader over ConstructionDataset and with TensorBatchLoader,
+both for iterating the batches alone and for full training epochs
+(forward, backward and optimizer step).
+
+Usage:
+    python bench_loader.py --rows 100000 --batch-sizes 32 256 1024
+"""
+
+import argparse
+import time
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from torch.utils.data import DataLoader
+from train_model import ConstructionDataset, TensorBatchLoader, ConstructionPlacementPredictor
+
+def make_data(rows, seed=42):
+    """Random standardized features with rotation and position targets."""
+    rng = np.random.default_rng(seed)
+    X = rng.standard_normal((rows, 8)).astype(np.float32)
+    y_rotation = rng.random(rows).astype(np.float32)
+    y_position = rng.standard_normal((rows, 2)).astype(np.float32) * 1e-4
+    return X, y_rotation, y_position
+
+def iterate_epoch(loader):
+    for batch_features, (batch_rotation_targets, batch_position_targets) in loader:
+        pass
+
+def train_epoch(loader, model, optimizer, criterion):
+    model.train()
+    for batch_features, (batch_rotation_targets, batch_position_targets) in loader:
+        rotation_outputs, position_outputs = model(batch_features)
+        loss = (criterion(rotation_outputs, batch_rotation_targets)
+                + 0.5 * criterion(position_outputs, batch_position_targets))
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+
+def samples_per_second(fn, rows, epochs):
+    start = time.perf_counter()
+    for _ in range(epochs):
+        fn()
+    return rows * epochs / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark training data loaders")
+    parser.add_argument('--rows', type=int, default=100000, help="Number of training samples")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[32, 256, 1024])
+    parser.add_argument('--epochs', type=int, default=2, help="Epochs timed per measurement")
+    args = parser.parse_args()
+
+    X, y_rotation, y_position = make_data(args.rows)
+    # Avoid a final batch of one, which BatchNorm rejects in training mode
+    if any(args.rows % batch_size == 1 for batch_size in args.batch_sizes):
+        X, y_rotation, y_position = X[:-1], y_rotation[:-1], y_position[:-1]
+    rows = len(X)
+    criterion = nn.MSELoss()
+
+    print(f"Benchmarking with {rows} samples, {args.epochs} epochs per measurement")
+    print(f"{'loader':<20}{'batch':>8}{'iterate (samples/s)':>22}{'train (samples/s)':>20}")
+
+    for batch_size in args.batch_sizes:
+        loaders = {
+            'DataLoader': DataLoader(ConstructionDataset(X, y_rotation, y_position),
+                                     batch_size=batch_size, shuffle=True),
+            'TensorBatchLoader': TensorBatchLoader(X, y_rotation, y_position,
+                                                   batch_size=batch_size, shuffle=True)
+        }
+        for name, loader in loaders.items():
+            torch.manual_seed(42)
+            model = ConstructionPlacementPredictor(8)
+            optimizer = optim.Adam(model.parameters(), lr=0.001)
+
+            iterate_rate = samples_per_second(lambda: iterate_epoch(loader), rows, args.epochs)
+            train_rate = samples_per_second(lambda: train_epoch(loader, model, optimizer, criterion),
+                                            rows, args.epochs)
+            print(f"{name:<20}{batch_size:>8}{iterate_rate:>22,.0f}{train_rate:>20,.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Construction Placement AI - Binary Dataset Cache
+
+This script converts construction sample CSVs into a memory-mappable binary
+dataset, once, so training does not have to parse the CSVs on every run or
+hold the whole dataset in RAM.
+
+A cache directory contains:
+- features.f64: (N, 8) float64 work area coordinates
+- rotation.f64: (N,) rotation targets normalized to 0-1
+- position.f64: (N, 2) position offsets from the work area centroid (if present)
+- train_idx.npy, val_idx.npy, test_idx.npy: sorted row indices of a 70/15/15 split
+- meta.json: row count, column layout and source files
+
+Usage:
+    python dataset_cache.py --output dataset_cache ../construction_samples_*.csv
+"""
+
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+from placement import work_area_centroids
+
+FEATURE_COLUMNS = ['reference_point_lat', 'reference_point_lng',
+                   'point2_lat', 'point2_lng',
+                   'point3_lat', 'point3_lng',
+                   'point4_lat', 'point4_lng']
+POSITION_COLUMNS = ['construction_center_lat', 'construction_center_lng']
+
+META_FILE = 'meta.json'
+
+def convert_csvs(csv_paths, cache_dir, chunksize=1000000, val_fraction=0.15, test_fraction=0.15, seed=42):
+    """
+    Convert sample CSVs into a binary dataset cache.
+
+    CSVs are read in chunks and appended to the binary files, so memory use
+    is bounded by the chunk size. Position targets are only written when
+    every input file has the construction center columns.
+
+    Returns:
+        dict: The cache metadata
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+
+    has_position = all(
+        set(POSITION_COLUMNS) <= set(pd.read_csv(path, nrows=0).columns) for path in csv_paths)
+    usecols = ['construction_rotation'] + FEATURE_COLUMNS + (POSITION_COLUMNS if has_position else [])
+
+    num_rows = 0
+    with open(os.path.join(cache_dir, 'features.f64'), 'wb') as features_file, \
+         open(os.path.join(cache_dir, 'rotation.f64'), 'wb') as rotation_file, \
+         open(os.path.join(cache_dir, 'position.f64'), 'wb') as position_file:
+        for path in csv_paths:
+            print(f"Converting {path}...")
+            for chunk in pd.read_csv(path, usecols=usecols, chunksize=chunksize):
+                X = chunk[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+                y_rotation = chunk['construction_rotation'].to_numpy(dtype=np.float64) / 360.0
+                X.tofile(features_file)
+                y_rotation.tofile(rotation_file)
+                if has_position:
+                    position_data = chunk[POSITION_COLUMNS].to_numpy(dtype=np.float64)
+                    (position_data - work_area_centroids(X)).tofile(position_file)
+                num_rows += len(chunk)
+
+    if not has_position:
+        os.remove(os.path.join(cache_dir, 'position.f64'))
+
+    # Random split, stored as sorted indices so chunks read the files in order
+    rng = np.random.default_rng(seed)
+    permutation = rng.permutation(num_rows)
+    num_test = int(round(num_rows * test_fraction))
+    num_val = int(round(num_rows * val_fraction))
+    splits = {
+        'test': permutation[:num_test],
+        'val': permutation[num_test:num_test + num_val],
+        'train': permutation[num_test + num_val:]
+    }
+    for name, indices in splits.items():
+        np.save(os.path.join(cache_dir, f'{name}_idx.npy'), np.sort(indices))
+
+    meta = {
+        'num_rows': num_rows,
+        'feature_columns': FEATURE_COLUMNS,
+        'has_position': has_position,
+        'split_sizes': {name: int(len(indices)) for name, indices in splits.items()},
+        'seed': seed,
+        'sources': [os.path.abspath(path) for path in csv_paths]
+    }
+    with open(os.path.join(cache_dir, META_FILE), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    print(f"Wrote {num_rows} rows to {cache_dir}")
+    return meta
+
+class CachedDataset:
+    """Read-only, memory-mapped view of a dataset cache directory."""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        with open(os.path.join(cache_dir, META_FILE)) as f:
+            self.meta = json.load(f)
+        self.num_rows = self.meta['num_rows']
+        self.has_position = self.meta['has_position']
+
+        self.features = np.memmap(os.path.join(cache_dir, 'features.f64'), dtype=np.float64,
+                                  mode='r', shape=(self.num_rows, len(FEATURE_COLUMNS)))
+        self.rotation = np.memmap(os.path.join(cache_dir, 'rotation.f64'), dtype=np.float64,
+                                  mode='r', shape=(self.num_rows,))
+        self.position = None
+        if self.has_position:
+            self.position = np.memmap(os.path.join(cache_dir, 'position.f64'), dtype=np.float64,
+                                      mode='r', shape=(self.num_rows, 2))
+
+    def split_indices(self, split):
+        """Sorted row indices of the 'train', 'val' or 'test' split."""
+        return np.load(os.path.join(self.cache_dir, f'{split}_idx.npy'), mmap_mode='r')
+
+    def load_rows(self, indices):
+        """Copy the given rows into memory as (X, y_rotation, y_position)."""
+        indices = np.asarray(indices)
+        X = np.asarray(self.features[indices])
+        y_rotation = np.asarray(self.rotation[indices])
+        y_position = np.asarray(self.position[indices]) if self.has_position else None
+        return X, y_rotation, y_position
+
+    def iter_chunks(self, indices, chunk_rows, rng=None):
+        """
+        Yield (X, y_rotation, y_position) chunks of at most chunk_rows rows.
+
+        Chunks are contiguous runs of the sorted indices, so each one is a
+        mostly sequential read. With an rng, the chunk order and the rows
+        within each chunk are shuffled.
+        """
+        starts = np.arange(0, len(indices), chunk_rows)
+        if rng is not None:
+            rng.shuffle(starts)
+        for start in starts:
+            chunk_indices = np.asarray(indices[start:start + chunk_rows])
+            X, y_rotation, y_position = self.load_rows(chunk_indices)
+            if rng is not None:
+                order = rng.permutation(len(chunk_indices))
+                X, y_rotation = X[order], y_rotation[order]
+                if y_position is not None:
+                    y_position = y_position[order]
+            yield X, y_rotation, y_position
+
+def fit_scaler(dataset, indices, chunk_rows=1000000):
+    """Fit a StandardScaler on the given rows one chunk at a time."""
+    from sklearn.preprocessing import StandardScaler
+    scaler = StandardScaler()
+    for X, _, _ in dataset.iter_chunks(indices, chunk_rows):
+        scaler.partial_fit(X)
+    return scaler
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert sample CSVs into a binary dataset cache")
+    parser.add_argument('csv_paths', nargs='+', help="Sample CSV files to convert")
+    parser.add_argument('--output', default='dataset_cache', help="Cache directory to write")
+    parser.add_argument('--chunksize', type=int, default=1000000, help="CSV rows read at a time")
+    parser.add_argument('--seed', type=int, default=42, help="Seed for the train/val/test split")
+    args = parser.parse_args()
+
+    convert_csvs(args.csv_paths, args.output, chunksize=args.chunksize, seed=args.seed)
+
+if __name__ == "__main__":
+    main()
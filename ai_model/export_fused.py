@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Construction Placement AI - Fused Model Exporter
+
+This script reads the trained PyTorch model and feature scaler, folds the
+StandardScaler and every BatchNorm1d layer into the adjacent Linear weights,
+and writes a compact weight file for numpy_engine.py.
+
+With --verify it also checks the fused model against the torch model on the
+sample CSV and compares their per-call and batched latency.
+"""
+
+import os
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from predict import load_trained_model, predict_construction_placement_batch
+from numpy_engine import FusedPlacementModel, fused_model_path
+from placement import resolve_artifact_path
+import numpy_engine
+
+# File paths (relative to this file, not the current working directory)
+csv_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'construction_samples_1743777545928.csv')
+
+FEATURE_COLUMNS = ['reference_point_lat', 'reference_point_lng',
+                   'point2_lat', 'point2_lng',
+                   'point3_lat', 'point3_lng',
+                   'point4_lat', 'point4_lng']
+
+def fold_batchnorm(linear, batchnorm):
+    """
+    Fold an eval-mode BatchNorm1d into the Linear layer before it.
+
+    Returns:
+        tuple: (weight, bias) as float64 arrays, weight shaped (out, in)
+    """
+    weight = linear.weight.detach().cpu().double().numpy()
+    bias = linear.bias.detach().cpu().double().numpy()
+    gamma = batchnorm.weight.detach().cpu().double().numpy()
+    beta = batchnorm.bias.detach().cpu().double().numpy()
+    running_mean = batchnorm.running_mean.detach().cpu().double().numpy()
+    running_var = batchnorm.running_var.detach().cpu().double().numpy()
+
+    scale = gamma / np.sqrt(running_var + batchnorm.eps)
+    return weight * scale[:, None], (bias - running_mean) * scale + beta
+
+def fold_scaler(weight, bias, scaler):
+    """Fold a fitted StandardScaler into the first Linear layer."""
+    if scaler is None:
+        return weight, bias
+    mean = scaler.mean_ if scaler.mean_ is not None else np.zeros(weight.shape[1])
+    scale = scaler.scale_ if scaler.scale_ is not None else np.ones(weight.shape[1])
+    weight = weight / scale[None, :]
+    return weight, bias - weight @ mean
+
+def linear_params(linear):
+    return (linear.weight.detach().cpu().double().numpy(),
+            linear.bias.detach().cpu().double().numpy())
+
+def fuse_model(model, scaler):
+    """
+    Build the fused layer list from a trained ConstructionPlacementPredictor.
+
+    Dropout is the identity in eval mode, so each Linear -> BatchNorm1d pair
+    becomes one layer. The rotation and position heads are merged: their
+    hidden layers are stacked and their output layers become one
+    block-diagonal layer with outputs [rotation, lat offset, lng offset].
+
+    Returns:
+        FusedPlacementModel
+    """
+    shared = model.shared_network
+    rotation = model.rotation_network
+    position = model.position_network
+
+    w0, b0 = fold_batchnorm(shared[0], shared[1])
+    w0, b0 = fold_scaler(w0, b0, scaler)
+    w1, b1 = fold_batchnorm(shared[4], shared[5])
+
+    w_rot, b_rot = fold_batchnorm(rotation[0], rotation[1])
+    w_pos, b_pos = fold_batchnorm(position[0], position[1])
+    w2 = np.vstack([w_rot, w_pos])
+    b2 = np.concatenate([b_rot, b_pos])
+
+    w_rot_out, b_rot_out = linear_params(rotation[3])
+    w_pos_out, b_pos_out = linear_params(position[3])
+    rot_hidden = w_rot_out.shape[1]
+    w3 = np.zeros((w_rot_out.shape[0] + w_pos_out.shape[0], w2.shape[0]))
+    w3[:w_rot_out.shape[0], :rot_hidden] = w_rot_out
+    w3[w_rot_out.shape[0]:, rot_hidden:] = w_pos_out
+    b3 = np.concatenate([b_rot_out, b_pos_out])
+
+    # Stored as (in, out) so the forward pass is x @ w + b
+    weights = [w.T for w in (w0, w1, w2, w3)]
+    biases = [b0, b1, b2, b3]
+    return FusedPlacementModel(weights, biases)
+
+def save_fused_model(fused, path):
+    arrays = {'num_layers': np.array(len(fused.weights))}
+    for i, (w, b) in enumerate(zip(fused.weights, fused.biases)):
+        arrays[f'w{i}'] = w
+        arrays[f'b{i}'] = b
+    np.savez(path, **arrays)
+
+def time_per_call(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000.0
+
+def verify_export(model, scaler, device, fused, num_samples=1000, repeats=200):
+    """
+    Compare the fused model with the torch model on sample work areas.
+
+    Prints the largest rotation and position differences and the
+    per-call and batched latency of both backends.
+    """
+    df = pd.read_csv(csv_path, nrows=num_samples)
+    work_areas = df[FEATURE_COLUMNS].values.reshape(-1, 4, 2).tolist()
+
+    torch_results = predict_construction_placement_batch(model, scaler, device, work_areas)
+    fused_results = numpy_engine.predict_construction_placement_batch(fused, None, None, work_areas)
+
+    torch_rot = np.array([r['rotation'] for r in torch_results])
+    fused_rot = np.array([r['rotation'] for r in fused_results])
+    rotation_diff = np.abs((torch_rot - fused_rot + 180) % 360 - 180)
+    torch_pos = np.array([r['position'] for r in torch_results])
+    fused_pos = np.array([r['position'] for r in fused_results])
+    position_diff = np.abs(torch_pos - fused_pos)
+
+    print("\nParity (fused vs torch):")
+    print(f"- Max rotation difference (degrees): {rotation_diff.max():.6f}")
+    print(f"- Max position difference (coordinate units): {position_diff.max():.3e}")
+
+    one = work_areas[:1]
+    timings = {
+        'torch': (
+            time_per_call(lambda: predict_construction_placement_batch(model, scaler, device, one), repeats),
+            time_per_call(lambda: predict_construction_placement_batch(model, scaler, device, work_areas), 10)),
+        'numpy': (
+            time_per_call(lambda: numpy_engine.predict_construction_placement_batch(fused, None, None, one), repeats),
+            time_per_call(lambda: numpy_engine.predict_construction_placement_batch(fused, None, None, work_areas), 10))
+    }
+
+    print(f"\nLatency (ms), single item and batch of {len(work_areas)}:")
+    for backend, (single_ms, batch_ms) in timings.items():
+        print(f"- {backend}: {single_ms:.4f} per call, {batch_ms:.4f} per batch")
+
+    # Allow for the float32 precision of the torch forward pass
+    passed = rotation_diff.max() < 0.01 and position_diff.max() < 1e-7
+    print(f"\nParity check {'passed' if passed else 'FAILED'}")
+    return passed
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a fused NumPy model from the trained torch model")
+    parser.add_argument('--output', default=resolve_artifact_path(fused_model_path),
+                        help="Fused weight file to write (default: where numpy_engine.py loads it from)")
+    parser.add_argument('--verify', action='store_true', help="Check parity and latency against torch")
+    args = parser.parse_args()
+
+    model, scaler, device = load_trained_model()
+    if model is None:
+        return 1
+
+    fused = fuse_model(model, scaler)
+    save_fused_model(fused, args.output)
+    print(f"Fused model saved to {args.output}")
+
+    if args.verify:
+        return 0 if verify_export(model, scaler, device, fused) else 1
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Construction Placement AI - Incremental Fine-Tuning
+
+This script updates the trained model with only the rows appended to the
+samples CSV since the last run, instead of retraining from scratch on the
+whole file. The current weights and feature scaler are the starting point;
+the scaler is kept fixed so the existing weights stay valid.
+
+Progress is tracked in finetune_state.json with a row watermark (the byte
+offset of the last consumed row) and a hash of the bytes just before it, so
+rows appended to the CSV are found without re-reading it. If the CSV was
+rewritten instead of appended to, the script stops and asks for a full
+retrain with train_model.py.
+
+Two bounded reservoir samples are kept next to the model:
+- finetune_replay.npz: old training rows mixed into each update (--replay-ratio)
+- finetune_holdout.npz: held-out rows used to gate publishing. They are only
+  taken from rows after the first watermark, so no published model has been
+  trained on them.
+
+A fine-tuned model is only published (atomically replacing
+construction_placement_model.pt) if its mean circular error, and position
+error when trained with positions, on the held-out rows is no worse than
+the current model's; a metric that is not finite for the fine-tuned model
+blocks publishing, with the reason printed. Publishing also rewrites the
+fused NumPy weights (if construction_placement_fused.npz exists) and the
+model bundle (MODEL_BUNDLE, or model_bundle.bin if it exists), so every
+backend serves the new weights. The cost of an update grows with the number
+of new rows and the reservoir sizes, not with the size of the CSV.
+
+Usage:
+    python finetune.py                  # first run: record the watermark and build the reservoirs
+    python finetune.py --epochs 20      # later runs: fine-tune on the rows added since
+"""
+
+import io
+import os
+import json
+import time
+import hashlib
+import argparse
+import pickle
+import numpy as np
+import pandas as pd
+import torch
+from train_model import (csv_path, model_path, scaler_path, extract_training_arrays, TensorBatchLoader,
+                         ConstructionPlacementPredictor, train_model, evaluate_model)
+from numpy_engine import fused_model_path
+from model_bundle import bundle_path
+from placement import resolve_artifact_path
+
+# File paths
+state_path = 'finetune_state.json'
+replay_path = 'finetune_replay.npz'
+holdout_path = 'finetune_holdout.npz'
+
+# Bytes before the watermark that must be unchanged for the CSV to count as appended to
+TAIL_HASH_BYTES = 65536
+
+# Recorded in the state once the held-out reservoir only holds rows from after
+# the first watermark (older states seeded it from the training CSV)
+HOLDOUT_SOURCE = 'after_watermark'
+
+def tail_hash(path, offset):
+    """SHA-256 of the TAIL_HASH_BYTES bytes of path ending at offset."""
+    start = max(0, offset - TAIL_HASH_BYTES)
+    with open(path, 'rb') as f:
+        f.seek(start)
+        return hashlib.sha256(f.read(offset - start)).hexdigest()
+
+def read_rows_after(path, offset):
+    """
+    Read the complete CSV rows after byte offset.
+
+    Returns:
+        tuple: (DataFrame of the new rows, byte offset after the last complete row)
+    """
+    with open(path, 'rb') as f:
+        columns = f.readline().decode().strip().split(',')
+        f.seek(max(offset, f.tell()))
+        start = f.tell()
+        data = f.read()
+    # A row still being written has no trailing newline yet; leave it for the next run
+    data = data[:data.rfind(b'\n') + 1]
+    if not data:
+        return pd.DataFrame(columns=columns), start
+    return pd.read_csv(io.BytesIO(data), header=None, names=columns), start + len(data)
+
+class Reservoir:
+    """Fixed-size uniform sample of (X, y_rotation, y_position) rows, stored as an npz file."""
+
+    def __init__(self, capacity, X, y_rotation, y_position, seen):
+        self.capacity = capacity
+        self.X = X
+        self.y_rotation = y_rotation
+        self.y_position = y_position
+        self.seen = seen
+
+    @classmethod
+    def empty(cls, capacity, has_position):
+        return cls(capacity, np.empty((0, 8)), np.empty(0), np.empty((0, 2)) if has_position else None, 0)
+
+    @classmethod
+    def load(cls, path, capacity):
+        data = np.load(path)
+        y_position = data['y_position'] if 'y_position' in data.files else None
+        return cls(capacity, data['X'], data['y_rotation'], y_position, int(data['seen']))
+
+    def save(self, path):
+        arrays = {'X': self.X, 'y_rotation': self.y_rotation, 'seen': self.seen}
+        if self.y_position is not None:
+            arrays['y_position'] = self.y_position
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    def add(self, X, y_rotation, y_position, rng):
+        """Reservoir-sample the given rows into the reservoir."""
+        # Fill any free slots first
+        free = min(self.capacity - len(self.X), len(X))
+        if free > 0:
+            self.X = np.concatenate([self.X, X[:free]])
+            self.y_rotation = np.concatenate([self.y_rotation, y_rotation[:free]])
+            if self.y_position is not None:
+                self.y_position = np.concatenate([self.y_position, y_position[:free]])
+
+        # Then row k of the rest replaces a random slot with probability capacity / (seen + k + 1)
+        seen_before = self.seen + free + np.arange(len(X) - free)
+        slots = (rng.random(len(X) - free) * (seen_before + 1)).astype(np.int64)
+        accepted = slots < self.capacity
+        rows = np.arange(free, len(X))[accepted]
+        self.X[slots[accepted]] = X[rows]
+        self.y_rotation[slots[accepted]] = y_rotation[rows]
+        if self.y_position is not None:
+            self.y_position[slots[accepted]] = y_position[rows]
+        self.seen += len(X)
+
+def split_holdout(X, y_rotation, y_position, holdout_fraction, rng):
+    """Randomly split rows into (train, holdout) tuples of (X, y_rotation, y_position)."""
+    is_holdout = rng.random(len(X)) < holdout_fraction
+
+    def take(mask):
+        return X[mask], y_rotation[mask], y_position[mask] if y_position is not None else None
+
+    return take(~is_holdout), take(is_holdout)
+
+def score(model, scaler, X, y_rotation, y_position, device, has_position):
+    """Mean circular error (degrees) and position error of model on raw feature rows."""
+    _, circular_error, _, position_error = evaluate_model(
+        model, scaler.transform(X), y_rotation, y_position, device, has_position, results_file=None)
+    return float(circular_error), float(position_error) if position_error is not None else None
+
+def publish_decision(before, after, has_position):
+    """
+    Whether the fine-tuned model may replace the current one.
+
+    Args:
+        before, after: (circular error, position error) of the current and
+                       fine-tuned model on the held-out rows
+
+    Returns:
+        tuple: (publish, reason why not or None)
+    """
+    metrics = [('circular error', before[0], after[0])]
+    if has_position:
+        metrics.append(('position error', before[1], after[1]))
+    compared = 0
+    for name, old, new in metrics:
+        old_finite = old is not None and np.isfinite(old)
+        new_finite = new is not None and np.isfinite(new)
+        if not old_finite and not new_finite:
+            # e.g. no held-out row has a construction center
+            print(f"Held-out {name} is not finite for either model; not comparing it")
+            continue
+        if not new_finite:
+            return False, f"the fine-tuned model's held-out {name} is {new}"
+        if old_finite and new > old:
+            return False, f"the fine-tuned model's held-out {name} is worse"
+        compared += 1
+    if compared == 0:
+        return False, "no held-out metric could be compared"
+    return True, None
+
+def finite_or_none(value):
+    """value, or None if it is missing or not finite (for the JSON state file)"""
+    return float(value) if value is not None and np.isfinite(value) else None
+
+def publish(model, scaler):
+    """
+    Atomically replace the model weights, and the fused NumPy weights and
+    model bundle if they are deployed, so every backend serves the new model.
+    """
+    # Replace the model atomically so a running server never sees a partial file
+    tmp_path = model_path + '.tmp'
+    torch.save(model.state_dict(), tmp_path)
+    os.replace(tmp_path, model_path)
+    print(f"Published fine-tuned model to {model_path}")
+
+    if os.path.exists(fused_model_path):
+        from export_fused import fuse_model, save_fused_model
+        tmp_path = fused_model_path + '.tmp.npz'
+        save_fused_model(fuse_model(model.cpu().eval(), scaler), tmp_path)
+        os.replace(tmp_path, fused_model_path)
+        print(f"Rewrote the fused NumPy weights in {fused_model_path}")
+
+    bundle = resolve_artifact_path(os.environ['MODEL_BUNDLE']) if os.environ.get('MODEL_BUNDLE') else bundle_path
+    if os.path.exists(bundle):
+        from model_bundle import build_bundle, write_bundle
+        # Built from the artifacts just written, next to model_path
+        write_bundle(bundle, *build_bundle(os.path.dirname(os.path.abspath(model_path))))
+        print(f"Rewrote the model bundle {bundle}")
+
+def initialize(args, rng):
+    """
+    Record the watermark at the end of the CSV and seed the replay reservoir
+    from it (one full read). The current model was trained on these rows, so
+    the held-out reservoir starts empty and is filled from later rows only.
+    """
+    print(f"No {state_path} found; initializing from {args.csv}...")
+    df, offset = read_rows_after(args.csv, 0)
+    X, y_rotation, y_position = extract_training_arrays(df, verbose=False)
+    has_position = y_position is not None
+
+    replay = Reservoir.empty(args.replay_size, has_position)
+    replay.add(X, y_rotation, y_position, rng)
+    held_out = Reservoir.empty(args.holdout_size, has_position)
+    replay.save(replay_path)
+    held_out.save(holdout_path)
+
+    state = {
+        'csv': os.path.abspath(args.csv),
+        'row_watermark': len(df),
+        'byte_offset': offset,
+        'tail_hash': tail_hash(args.csv, offset),
+        'has_position': has_position,
+        'holdout_source': HOLDOUT_SOURCE,
+        'history': []
+    }
+    with open(state_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    print(f"Watermark set at row {len(df)} (byte {offset}); {len(replay.X)} replay rows")
+
+def main():
+    parser = argparse.ArgumentParser(description="Fine-tune the construction placement model on new samples")
+    parser.add_argument('--csv', default=csv_path, help="Samples CSV that new rows are appended to")
+    parser.add_argument('--epochs', type=int, default=20)
+    parser.add_argument('--lr', type=float, default=0.0003, help="Learning rate (lower than a full training run)")
+    parser.add_argument('--patience', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--position-weight', type=float, default=0.5)
+    parser.add_argument('--replay-ratio', type=float, default=1.0,
+                        help="Old rows mixed in per new training row (0 disables replay)")
+    parser.add_argument('--replay-size', type=int, default=50000, help="Rows kept in the replay reservoir")
+    parser.add_argument('--holdout-fraction', type=float, default=0.15, help="Share of new rows held out")
+    parser.add_argument('--holdout-size', type=int, default=20000, help="Rows kept in the held-out reservoir")
+    parser.add_argument('--min-rows', type=int, default=100, help="Skip the update below this many new rows")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    torch.manual_seed(args.seed)
+    if not os.path.exists(state_path):
+        initialize(args, np.random.default_rng(args.seed))
+        return
+
+    with open(state_path) as f:
+        state = json.load(f)
+    # A different but reproducible stream for every update
+    rng = np.random.default_rng([args.seed, state['row_watermark']])
+    if tail_hash(args.csv, state['byte_offset']) != state['tail_hash']:
+        raise SystemExit(f"{args.csv} changed before the watermark (row {state['row_watermark']}). "
+                         f"Retrain with train_model.py and delete {state_path} to start over.")
+
+    df, new_offset = read_rows_after(args.csv, state['byte_offset'])
+    if len(df) < args.min_rows:
+        print(f"{len(df)} new rows since row {state['row_watermark']}; nothing to do (--min-rows {args.min_rows})")
+        return
+    print(f"Fine-tuning on {len(df)} new rows after row {state['row_watermark']}")
+
+    has_position = state['has_position']
+    X, y_rotation, y_position = extract_training_arrays(df, verbose=False)
+    if has_position and y_position is None:
+        raise SystemExit("New rows have no construction center columns, but the model was trained with positions")
+    if not has_position:
+        y_position = None
+
+    replay = Reservoir.load(replay_path, args.replay_size)
+    held_out = Reservoir.load(holdout_path, args.holdout_size)
+    if state.get('holdout_source') != HOLDOUT_SOURCE:
+        # Seeded from the rows the current model was trained on, which flatters it
+        print(f"Discarding the {len(held_out.X)} held-out rows taken from the training CSV")
+        held_out = Reservoir.empty(args.holdout_size, has_position)
+        state['holdout_source'] = HOLDOUT_SOURCE
+    (X_new, y_new_rot, y_new_pos), (X_hold, y_hold_rot, y_hold_pos) = split_holdout(
+        X, y_rotation, y_position, args.holdout_fraction, rng)
+
+    # Training rows: the new rows plus a replay sample of old ones, so the
+    # update does not forget the rest of the distribution
+    num_replay = min(len(replay.X), int(len(X_new) * args.replay_ratio))
+    replay_rows = rng.choice(len(replay.X), size=num_replay, replace=False)
+    X_train = np.concatenate([X_new, replay.X[replay_rows]])
+    y_train_rot = np.concatenate([y_new_rot, replay.y_rotation[replay_rows]])
+    y_train_pos = np.concatenate([y_new_pos, replay.y_position[replay_rows]]) if has_position else None
+
+    # Gate on the old held-out rows plus the held-out share of the new ones;
+    # none of them has been trained on by a published model
+    X_gate = np.concatenate([held_out.X, X_hold])
+    y_gate_rot = np.concatenate([held_out.y_rotation, y_hold_rot])
+    y_gate_pos = np.concatenate([held_out.y_position, y_hold_pos]) if has_position else None
+    if len(X_gate) == 0:
+        print("No held-out rows to compare the models on yet; waiting for more rows")
+        return
+
+    # Current model and scaler
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    with open(scaler_path, 'rb') as f:
+        scaler = pickle.load(f)
+    model = ConstructionPlacementPredictor(X.shape[1])
+    model.load_state_dict(torch.load(model_path, map_location=device))
+    model.to(device)
+    before = score(model, scaler, X_gate, y_gate_rot, y_gate_pos, device, has_position)
+
+    # Early stopping uses a validation slice of the training rows
+    order = rng.permutation(len(X_train))
+    num_val = max(1, len(order) // 10)
+    val_idx, fit_idx = order[:num_val], order[num_val:]
+    X_train = scaler.transform(X_train)
+
+    def take(indices):
+        return X_train[indices], y_train_rot[indices], y_train_pos[indices] if has_position else None
+
+    train_loader = TensorBatchLoader(*take(fit_idx), batch_size=args.batch_size, shuffle=True)
+    val_loader = TensorBatchLoader(*take(val_idx), batch_size=args.batch_size)
+
+    started = time.perf_counter()
+    model, train_losses, _ = train_model(
+        model, train_loader, val_loader, device, has_position,
+        epochs=args.epochs, lr=args.lr, patience=args.patience,
+        position_weight=args.position_weight, verbose=False)
+    after = score(model, scaler, X_gate, y_gate_rot, y_gate_pos, device, has_position)
+    wall_seconds = time.perf_counter() - started
+
+    print(f"Held-out circular error: {before[0]:.2f} -> {after[0]:.2f} degrees ({len(X_gate)} rows)")
+    if has_position:
+        print(f"Held-out position error: {before[1]:.6f} -> {after[1]:.6f}")
+    published, reason = publish_decision(before, after, has_position)
+
+    if published:
+        publish(model, scaler)
+        replay.add(X_new, y_new_rot, y_new_pos, rng)
+        held_out.add(X_hold, y_hold_rot, y_hold_pos, rng)
+        replay.save(replay_path)
+        held_out.save(holdout_path)
+        state['row_watermark'] += len(df)
+        state['byte_offset'] = new_offset
+        state['tail_hash'] = tail_hash(args.csv, new_offset)
+        print(f"Watermark now at row {state['row_watermark']}")
+    else:
+        # Keep the watermark so these rows are retried together with the next batch
+        print(f"Keeping the current model: {reason}")
+
+    state['history'].append({
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'new_rows': len(df),
+        'replay_rows': num_replay,
+        'epochs_run': len(train_losses),
+        'wall_seconds': wall_seconds,
+        'circular_error_before': finite_or_none(before[0]),
+        'circular_error_after': finite_or_none(after[0]),
+        'position_error_before': finite_or_none(before[1]),
+        'position_error_after': finite_or_none(after[1]),
+        'published': published,
+        'rejected_because': reason
+    })
+    with open(state_path, 'w') as f:
+        json.dump(state, f, indent=2)
+
+if __name__ == "__main__":
+    main()
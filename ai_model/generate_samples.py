@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Construction Placement AI - Synthetic Sample Generator
+
+A headless, vectorized version of the "Generate 5000 Samples" button in the
+web application's training mode (generateSamples in
+js/construction-manager.js). For each sample it:
+
+1. Picks a random rotation (whole degrees) and moves the construction center
+   up to 30 m in a random direction from the map center
+2. Places the work area points at their saved distance/bearing from the
+   center, rotated by the sample rotation
+3. Moves every point except the reference point by up to its variance radius
+4. Orders the points: reference point first, then the others by angle
+
+Samples are generated in shards on a process pool. Every shard has its own
+deterministic seed, so the output only depends on --seed and the shard size.
+Each shard is written as a CSV in the format train_model.py reads.
+
+Constructions come from a JSON export of the application's saved
+constructions (the "savedConstructions" localStorage entry), or from a
+work area given on the command line.
+
+Usage:
+    python generate_samples.py --constructions constructions.json --name "LONG TERM RIGHT LANE CLOSURE ..." \\
+        --samples 5000000 --output-dir generated
+    python generate_samples.py --work-area 12.5:40,12.5:140,12.5:220,12.5:320 --name "TEST" --samples 100000
+"""
+
+import os
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS = 6371e3  # meters
+METERS_PER_DEGREE = 111000  # approximation used by the web application
+
+# Default map center (the area the sample CSVs were generated in)
+DEFAULT_CENTER = (49.8023, -97.0822)
+
+CSV_COLUMNS = ['construction_name', 'construction_rotation',
+               'construction_center_lat', 'construction_center_lng',
+               'reference_point_lat', 'reference_point_lng',
+               'point2_lat', 'point2_lng',
+               'point3_lat', 'point3_lng',
+               'point4_lat', 'point4_lng']
+
+def calculate_destination(lat, lng, distance, bearing):
+    """
+    Vectorized port of calculateDestination in js/utils.js.
+
+    Args:
+        lat, lng: Start coordinates in degrees (arrays or scalars)
+        distance: Distance in meters
+        bearing: Bearing in degrees (0 = North, 90 = East)
+
+    Returns:
+        tuple: Destination (lat, lng) arrays in degrees
+    """
+    angular_distance = distance / EARTH_RADIUS
+    theta = np.radians(bearing)
+    phi1 = np.radians(lat)
+    lambda1 = np.radians(lng)
+
+    phi2 = np.arcsin(np.sin(phi1) * np.cos(angular_distance) +
+                     np.cos(phi1) * np.sin(angular_distance) * np.cos(theta))
+    lambda2 = lambda1 + np.arctan2(np.sin(theta) * np.sin(angular_distance) * np.cos(phi1),
+                                   np.cos(angular_distance) - np.sin(phi1) * np.sin(phi2))
+    return np.degrees(phi2), np.degrees(lambda2)
+
+def generate_shard(spec, num_samples, seed_entropy):
+    """
+    Generate num_samples samples for one construction.
+
+    Args:
+        spec: Dict with name, work_area ([(distance, bearing)] * 4),
+              variance_radii, reference_index and center
+        num_samples: Number of rows to generate
+        seed_entropy: Entropy for this shard's random generator
+
+    Returns:
+        pandas.DataFrame in the training CSV format
+    """
+    rng = np.random.default_rng(np.random.SeedSequence(seed_entropy))
+    n = num_samples
+    work_area = np.asarray(spec['work_area'], dtype=np.float64)
+    num_points = len(work_area)
+    ref = spec['reference_index']
+    center_lat, center_lng = spec['center']
+
+    # 1. Random rotation and construction center offset
+    rotation = rng.integers(0, 360, size=n)
+    offset_distance = rng.random(n) * 30
+    offset_angle = rng.random(n) * 360
+    construction_lat, construction_lng = calculate_destination(center_lat, center_lng, offset_distance, offset_angle)
+
+    # 2. Work area points around the new center, rotated: (n, num_points)
+    lat, lng = calculate_destination(construction_lat[:, None], construction_lng[:, None],
+                                     work_area[None, :, 0], work_area[None, :, 1] + rotation[:, None])
+
+    # 3. Variance for every point except the reference point
+    radii = np.asarray(spec['variance_radii'], dtype=np.float64)
+    distance = rng.random((n, num_points)) * radii[None, :]
+    angle = rng.random((n, num_points)) * 2 * np.pi
+    distance[:, ref] = 0.0
+    dx = distance * np.cos(angle)
+    dy = distance * np.sin(angle)
+    varied_lat = lat + dy / METERS_PER_DEGREE
+    varied_lng = lng + dx / (METERS_PER_DEGREE * np.cos(np.radians(lat)))
+
+    # 4. Reference point first, then the rest sorted by angle from it
+    others = [i for i in range(num_points) if i != ref]
+    other_lat = varied_lat[:, others]
+    other_lng = varied_lng[:, others]
+    angles = np.arctan2(other_lat - varied_lat[:, ref:ref + 1], other_lng - varied_lng[:, ref:ref + 1])
+    order = np.argsort(angles, axis=1, kind='stable')
+    other_lat = np.take_along_axis(other_lat, order, axis=1)
+    other_lng = np.take_along_axis(other_lng, order, axis=1)
+
+    data = {
+        'construction_name': np.full(n, spec['name'], dtype=object),
+        'construction_rotation': rotation,
+        'construction_center_lat': construction_lat,
+        'construction_center_lng': construction_lng,
+        'reference_point_lat': varied_lat[:, ref],
+        'reference_point_lng': varied_lng[:, ref]
+    }
+    for k, prefix in enumerate(['point2', 'point3', 'point4']):
+        data[f'{prefix}_lat'] = other_lat[:, k]
+        data[f'{prefix}_lng'] = other_lng[:, k]
+    return pd.DataFrame(data, columns=CSV_COLUMNS)
+
+def _write_shard(task):
+    spec, num_samples, seed_entropy, path = task
+    generate_shard(spec, num_samples, seed_entropy).to_csv(path, index=False)
+    return path, num_samples
+
+def load_construction_spec(args):
+    """Build the generation spec from a constructions JSON file or --work-area."""
+    if args.work_area:
+        work_area = [tuple(float(v) for v in point.split(':')) for point in args.work_area.split(',')]
+        name = args.name or 'CUSTOM WORK AREA'
+    else:
+        with open(args.constructions) as f:
+            constructions = json.load(f)
+        matches = [c for c in constructions if args.name is None or c.get('name') == args.name]
+        if not matches:
+            raise SystemExit(f"No construction named {args.name!r} in {args.constructions}")
+        construction = matches[0]
+        if not construction.get('workArea') or len(construction['workArea']) < 4:
+            raise SystemExit(f"Construction {construction.get('name')!r} has no 4-point work area")
+        work_area = [(point['distance'], point['bearing']) for point in construction['workArea'][:4]]
+        name = construction['name']
+
+    if len(work_area) != 4:
+        raise SystemExit("A work area needs exactly 4 points")
+
+    return {
+        'name': name,
+        'work_area': work_area,
+        'variance_radii': [float(r) for r in args.variance_radii.split(',')],
+        'reference_index': args.reference_index,
+        'center': tuple(float(v) for v in args.center.split(','))
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic construction placement samples")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--constructions', help="JSON export of the saved constructions")
+    source.add_argument('--work-area', help="Work area as distance:bearing pairs, e.g. 12:40,12:140,12:220,12:320")
+    parser.add_argument('--name', default=None, help="Construction name (selects it from --constructions)")
+    parser.add_argument('--samples', type=int, default=5000, help="Total number of samples")
+    parser.add_argument('--shard-size', type=int, default=1000000, help="Samples per output CSV")
+    parser.add_argument('--variance-radii', default='10,10,10,10', help="Variance radius in meters per point")
+    parser.add_argument('--reference-index', type=int, default=0, help="Index of the fixed reference point")
+    parser.add_argument('--center', default=f'{DEFAULT_CENTER[0]},{DEFAULT_CENTER[1]}', help="Map center as lat,lng")
+    parser.add_argument('--seed', type=int, default=42, help="Base seed; shard i uses (seed, i)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--output-dir', default='generated_samples')
+    args = parser.parse_args()
+
+    spec = load_construction_spec(args)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    tasks = []
+    for shard, start in enumerate(range(0, args.samples, args.shard_size)):
+        num_samples = min(args.shard_size, args.samples - start)
+        path = os.path.join(args.output_dir, f'construction_samples_{args.seed}_{shard:05d}.csv')
+        tasks.append((spec, num_samples, [args.seed, shard], path))
+
+    print(f"Generating {args.samples} samples for {spec['name']!r} in {len(tasks)} shard(s)...")
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(tasks)))) as executor:
+        for path, num_samples in executor.map(_write_shard, tasks):
+            print(f"Wrote {num_samples} samples to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Construction Placement AI - Gunicorn Configuration
+
+Runs the Flask server (app.py) as a pre-fork server whose workers share one
+copy of the model: the app, and with it the model, is loaded once in the
+master (preload_app) and the workers are forked from it, so the model pages
+are shared copy-on-write instead of being loaded again by every worker.
+
+Sharing works best with MODEL_BUNDLE set (see model_bundle.py): the weights
+are then a read-only memory mapping of the bundle file, which the workers
+never write to. Weights unpickled from the separate artifacts are ordinary
+heap memory and stay shared only until something writes near them, such as
+the reference counts the garbage collector and the workers update; gc.freeze()
+below keeps the collector from touching the objects created before the fork.
+
+Hot reloads (MODEL_WATCH_INTERVAL, /api/admin/reload) only affect the worker
+that runs them, so the watcher is disabled here; roll out a new model with a
+graceful restart instead (kill -HUP <master pid>), which loads it in the
+master again and forks fresh workers.
+
+Usage:
+    MODEL_BUNDLE=model_bundle.bin gunicorn -c gunicorn.conf.py app:app
+    python process_memory.py <master pid>
+"""
+
+import gc
+import os
+
+# The model must be loaded before forking, and the watcher thread would not
+# exist in the workers
+os.environ['STARTUP_MODE'] = 'eager'
+os.environ['MODEL_WATCH_INTERVAL'] = '0'
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+preload_app = True
+
+# Intra-op threads per worker; the workers already use the cores in parallel
+WORKER_TORCH_THREADS = int(os.environ.get('WORKER_TORCH_THREADS', 1))
+
+def when_ready(server):
+    # Move everything allocated so far (the model included) to the permanent
+    # generation, so collections in the workers do not dirty its pages
+    gc.freeze()
+    server.log.info("Model loaded in the master; forking workers")
+
+def post_fork(server, worker):
+    import service
+    # The master's micro-batcher thread did not survive the fork; give the
+    # worker its own (only if MICRO_BATCHING is set)
+    service.start_micro_batching()
+    if service.INFERENCE_BACKEND == 'torch':
+        import torch
+        torch.set_num_threads(WORKER_TORCH_THREADS)
+
+def post_worker_init(worker):
+    import process_memory
+    usage = process_memory.memory_usage()
+    worker.log.info(f"Worker {usage.get('pid')} memory: {usage.get('rss_kb', 0) / 1024:.1f} MB RSS, "
+                    f"{usage.get('pss_kb', 0) / 1024:.1f} MB PSS, {usage.get('shared_kb', 0) / 1024:.1f} MB shared")
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Construction Placement AI - Sample Ingestion
+
+This script consolidates any number of sample CSV exports into one
+deduplicated, sharded training set that train_model.py (--data),
+dataset_cache.py and train_registry.py can read.
+
+- Files are read and checked in parallel. The required columns are
+  construction_name, construction_rotation and the four work area points;
+  construction_center_lat/lng are optional but must come as a pair. Rows with
+  missing, non-numeric or out-of-range values are dropped and counted.
+- A row is a duplicate when its construction name and its work area points,
+  rounded to --precision decimal places (6 = about 0.1 m), match a row seen
+  before, in any file and any earlier run. Only the first one is kept.
+- Rows are written to shards of at most --shard-rows rows, with and without
+  construction centers kept in separate shards so each shard has one schema.
+- manifest.json records every ingested file (by content hash) and shard;
+  row_hashes.npy holds the hashes of every kept row, in the order they were
+  kept, and the manifest how many of them it covers. Re-runs only read files
+  whose content has not been ingested yet, and append new shards.
+
+Usage:
+    python ingest.py --output ../training_data ../construction_samples_*.csv
+    python ingest.py --output ../training_data ../exports/
+"""
+
+import os
+import glob
+import json
+import time
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+FEATURE_COLUMNS = ['reference_point_lat', 'reference_point_lng',
+                   'point2_lat', 'point2_lng',
+                   'point3_lat', 'point3_lng',
+                   'point4_lat', 'point4_lng']
+POSITION_COLUMNS = ['construction_center_lat', 'construction_center_lng']
+REQUIRED_COLUMNS = ['construction_name', 'construction_rotation'] + FEATURE_COLUMNS
+
+MANIFEST_FILE = 'manifest.json'
+HASHES_FILE = 'row_hashes.npy'
+
+def expand_inputs(inputs):
+    """Sample CSV paths from a list of files, directories and glob patterns (sorted, unique)"""
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.update(glob.glob(os.path.join(item, '*.csv')))
+        else:
+            paths.update(glob.glob(item))
+    return sorted(os.path.abspath(path) for path in paths)
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def row_hashes(df, precision):
+    """uint64 hash of each row's construction name and quantized work area points"""
+    quantized = pd.DataFrame(np.round(df[FEATURE_COLUMNS].to_numpy() * 10 ** precision).astype(np.int64),
+                             columns=FEATURE_COLUMNS, index=df.index)
+    quantized['construction_name'] = df['construction_name'].astype(str)
+    return pd.util.hash_pandas_object(quantized, index=False).to_numpy(dtype=np.uint64)
+
+def check_schema(columns):
+    """Error message for an unusable header, or None"""
+    missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+    if missing:
+        return f"missing columns {missing}"
+    if sum(column in columns for column in POSITION_COLUMNS) == 1:
+        return f"only one of {POSITION_COLUMNS}"
+    return None
+
+def read_sample_file(path, precision):
+    """
+    Read, check and hash one sample CSV (runs in a worker process).
+
+    Returns:
+        dict: path, sha256, size, mtime_ns, and either error or the cleaned
+              DataFrame (df), its row hashes, has_position and row counts
+    """
+    stat = os.stat(path)
+    result = {'path': path, 'sha256': file_sha256(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    try:
+        df = pd.read_csv(path)
+    except Exception as e:
+        result['error'] = f"unreadable: {str(e)}"
+        return result
+    error = check_schema(df.columns)
+    if error is not None:
+        result['error'] = error
+        return result
+
+    has_position = all(column in df.columns for column in POSITION_COLUMNS)
+    numeric_columns = ['construction_rotation'] + FEATURE_COLUMNS + (POSITION_COLUMNS if has_position else [])
+    df = df[['construction_name'] + numeric_columns].copy()
+    for column in numeric_columns:
+        df[column] = pd.to_numeric(df[column], errors='coerce')
+
+    lat_columns = [column for column in numeric_columns if column.endswith('_lat')]
+    lng_columns = [column for column in numeric_columns if column.endswith('_lng')]
+    valid = df.notna().all(axis=1) & np.isfinite(df[numeric_columns]).all(axis=1)
+    valid &= df[lat_columns].abs().le(90).all(axis=1) & df[lng_columns].abs().le(180).all(axis=1)
+    clean = df[valid].reset_index(drop=True)
+    clean['construction_rotation'] = clean['construction_rotation'] % 360
+
+    result.update({
+        'df': clean,
+        'hashes': row_hashes(clean, precision),
+        'has_position': has_position,
+        'rows_read': len(df),
+        'rows_invalid': int((~valid).sum())
+    })
+    return result
+
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {'files': {}, 'shards': []}
+    with open(path) as f:
+        return json.load(f)
+
+def save_atomically(path, write):
+    tmp_path = path + '.tmp'
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+def write_shards(df, output_dir, kind, first_index, shard_rows):
+    """Write df to shards named samples-<kind>-<index>.csv; returns their manifest entries"""
+    shards = []
+    for i, start in enumerate(range(0, len(df), shard_rows)):
+        name = f"samples-{kind}-{first_index + i:05d}.csv"
+        part = df.iloc[start:start + shard_rows]
+        part.to_csv(os.path.join(output_dir, name), index=False)
+        shards.append({'file': name, 'rows': len(part), 'has_position': kind == 'position'})
+    return shards
+
+def ingest(inputs, output_dir, precision=6, shard_rows=100000, workers=None):
+    """
+    Ingest the sample CSVs not yet in output_dir's manifest.
+
+    Returns:
+        dict: The updated manifest
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+    if manifest['files'] and manifest.get('precision', precision) != precision:
+        raise SystemExit(f"{output_dir} was ingested with --precision {manifest['precision']}; "
+                         "use the same precision or a new output directory")
+    hashes_path = os.path.join(output_dir, HASHES_FILE)
+    seen = np.load(hashes_path) if os.path.exists(hashes_path) else np.empty(0, dtype=np.uint64)
+    # Hashes past hash_count were saved by a run that was interrupted before
+    # its manifest, so their rows are not in any recorded shard
+    seen = seen[:manifest.get('hash_count', len(seen))]
+
+    # Skip files whose path, size and mtime match the manifest without hashing them again
+    known_contents = {entry['sha256'] for entry in manifest['files'].values() if entry['status'] == 'ingested'}
+    candidates = []
+    for path in expand_inputs(inputs):
+        if os.path.commonpath([path, os.path.abspath(output_dir)]) == os.path.abspath(output_dir):
+            continue  # our own shards
+        entry = manifest['files'].get(path)
+        stat = os.stat(path)
+        if entry is not None and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            continue
+        candidates.append(path)
+    if not candidates:
+        print("No new files to ingest")
+        return manifest
+
+    print(f"Reading {len(candidates)} file(s)...")
+    with ProcessPoolExecutor(max_workers=max(1, min(workers or os.cpu_count() or 1, len(candidates)))) as executor:
+        results = list(executor.map(read_sample_file, candidates, [precision] * len(candidates)))
+
+    new_rows = {'position': [], 'rotation': []}
+    for result in results:
+        entry = {key: result[key] for key in ('sha256', 'size', 'mtime_ns')}
+        entry['ingested_at'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        name = os.path.basename(result['path'])
+        if result['sha256'] in known_contents:
+            # Same content as an ingested file (a copy, or only the mtime changed)
+            entry['status'] = 'duplicate_file'
+            manifest['files'][result['path']] = entry
+            print(f"{name}: already ingested")
+            continue
+        if 'error' in result:
+            entry.update({'status': 'rejected', 'error': result['error']})
+            manifest['files'][result['path']] = entry
+            print(f"{name}: rejected ({result['error']})")
+            continue
+
+        # Drop rows seen in earlier files or runs, then repeats within this file
+        hashes = result['hashes']
+        keep = ~np.isin(hashes, seen)
+        _, first = np.unique(hashes, return_index=True)
+        unique_in_file = np.zeros(len(hashes), dtype=bool)
+        unique_in_file[first] = True
+        keep &= unique_in_file
+        seen = np.concatenate([seen, hashes[keep]])
+
+        kind = 'position' if result['has_position'] else 'rotation'
+        new_rows[kind].append(result['df'][keep])
+        known_contents.add(result['sha256'])
+        entry.update({
+            'status': 'ingested',
+            'has_position': result['has_position'],
+            'rows_read': result['rows_read'],
+            'rows_invalid': result['rows_invalid'],
+            'rows_duplicate': int(len(hashes) - keep.sum()),
+            'rows_kept': int(keep.sum())
+        })
+        manifest['files'][result['path']] = entry
+        print(f"{name}: {entry['rows_kept']} kept, {entry['rows_duplicate']} duplicate, "
+              f"{entry['rows_invalid']} invalid of {entry['rows_read']} rows")
+
+    # Shards first, then the hashes, then the manifest: an interrupted run
+    # leaves the old manifest (and its hash_count), and the next run rewrites
+    # the same shard names
+    for kind, frames in new_rows.items():
+        if not frames:
+            continue
+        first_index = sum(1 for shard in manifest['shards'] if shard['file'].startswith(f'samples-{kind}-'))
+        manifest['shards'].extend(write_shards(pd.concat(frames, ignore_index=True), output_dir, kind,
+                                               first_index, shard_rows))
+    def write_hashes(tmp_path):
+        with open(tmp_path, 'wb') as f:
+            np.save(f, seen)
+    save_atomically(hashes_path, write_hashes)
+
+    manifest['precision'] = precision
+    manifest['hash_count'] = len(seen)
+    manifest['total_rows'] = sum(shard['rows'] for shard in manifest['shards'])
+    manifest['rows_with_position'] = sum(shard['rows'] for shard in manifest['shards'] if shard['has_position'])
+
+    def write_manifest(tmp_path):
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+    save_atomically(os.path.join(output_dir, MANIFEST_FILE), write_manifest)
+    return manifest
+
+def load_ingested(output_dir):
+    """All rows of an ingested training set as one DataFrame (see train_model.py --data)"""
+    manifest = load_manifest(output_dir)
+    if not manifest['shards']:
+        raise FileNotFoundError(f"No ingested shards in {output_dir}")
+    return pd.concat([pd.read_csv(os.path.join(output_dir, shard['file'])) for shard in manifest['shards']],
+                     ignore_index=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Consolidate sample CSVs into a deduplicated, sharded training set")
+    parser.add_argument('inputs', nargs='+', help="Sample CSV files, directories or glob patterns")
+    parser.add_argument('--output', default='training_data', help="Training set directory")
+    parser.add_argument('--precision', type=int, default=6,
+                        help="Decimal places of the coordinates compared for duplicates")
+    parser.add_argument('--shard-rows', type=int, default=100000, help="Rows per output shard")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    manifest = ingest(args.inputs, args.output, precision=args.precision,
+                      shard_rows=args.shard_rows, workers=args.workers)
+    print(f"\n{args.output}: {manifest.get('total_rows', 0)} rows in {len(manifest['shards'])} shard(s), "
+          f"{manifest.get('rows_with_position', 0)} with construction centers")
+
+if __name__ == "__main__":
+    main()
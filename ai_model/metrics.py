@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Construction Placement AI - Metrics
+
+Minimal Prometheus-style counters and latency histograms for the inference
+hot path, rendered in the Prometheus text exposition format by
+/api/metrics. Recording an observation is a bucket lookup and two additions
+under a lock, so it is cheap enough to leave on in production.
+
+Metrics recorded in other processes (the ASGI process executor) are moved
+into the serving process with drain_metrics() there and merge_metrics() here.
+"""
+
+import threading
+from bisect import bisect_left
+
+# Histogram bucket upper bounds in seconds (10 us to 2.5 s)
+DEFAULT_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+                   0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _format_labels(label_names, label_values, extra=None):
+    pairs = list(zip(label_names, label_values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    """A monotonically increasing count per label combination."""
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def drain(self):
+        """Return the counts recorded so far and start again from zero"""
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values):
+        """Add counts returned by drain() in another process"""
+        with self._lock:
+            for label_values, value in values.items():
+                self._values[label_values] = self._values.get(label_values, 0) + value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            lines.append(f'{self.name}{_format_labels(self.label_names, label_values)} {value}')
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram per label combination."""
+
+    def __init__(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def drain(self):
+        """Return the series recorded so far and start again from empty"""
+        with self._lock:
+            series, self._series = self._series, {}
+        return series
+
+    def merge(self, series):
+        """Add series returned by drain() in another process"""
+        with self._lock:
+            for label_values, (bucket_counts, total, count) in series.items():
+                own = self._series.get(label_values)
+                if own is None:
+                    own = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                own[0] = [a + b for a, b in zip(own[0], bucket_counts)]
+                own[1] += total
+                own[2] += count
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series_items = sorted((labels, [list(s[0]), s[1], s[2]]) for labels, s in self._series.items())
+        for label_values, (bucket_counts, total, count) in series_items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), bucket_counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.label_names, label_values, ('le', bound))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.label_names, label_values)
+            lines.append(f'{self.name}_sum{labels} {total}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+STAGE_LATENCY = Histogram(
+    'construction_ai_stage_seconds',
+    'Latency of each stage of a prediction request',
+    label_names=('stage',))
+
+RESPONSES = Counter(
+    'construction_ai_responses_total',
+    'Responses by endpoint and outcome (model, similar, rotation_fallback, geometric_fallback, '
+    'overload_fallback, shed, index, unavailable, invalid, error)',
+    label_names=('endpoint', 'outcome'))
+
+ADMISSION_REFUSED = Counter(
+    'construction_ai_admission_refused_total',
+    'Requests refused a model slot, by endpoint, reason (queue_full, deadline) and action (degraded, shed)',
+    label_names=('endpoint', 'reason', 'action'))
+
+ALL_METRICS = [STAGE_LATENCY, RESPONSES, ADMISSION_REFUSED]
+
+
+def drain_metrics():
+    """Everything recorded since the last call, per metric (picklable), resetting the metrics"""
+    return [metric.drain() for metric in ALL_METRICS]
+
+def merge_metrics(drained):
+    """Add the result of drain_metrics() in another process to this process's metrics"""
+    for metric, values in zip(ALL_METRICS, drained):
+        metric.merge(values)
+
+def observe_stages(timings):
+    """Record a dict of stage name -> seconds, as filled in by the prediction functions"""
+    for stage, seconds in timings.items():
+        STAGE_LATENCY.observe(seconds, stage)
+
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in ALL_METRICS:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
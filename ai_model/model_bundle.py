@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Construction Placement AI - Model Bundle
+
+Packs the trained weights, the feature scaler, the fused NumPy layers and
+the model info into a single file whose arrays can be memory-mapped, so
+pre-fork server workers (see gunicorn.conf.py) share one copy of the weights
+instead of each unpickling their own.
+
+File layout:
+    8 bytes   magic b'CPBUNDL1'
+    8 bytes   little-endian header length
+    header    JSON: {"metadata": {...}, "arrays": {name: {"dtype", "shape", "offset"}}}
+    data      raw arrays, each starting on a 64-byte boundary
+
+Arrays are mapped copy-on-write: pages are shared with the page cache and
+between processes until something writes to them, which inference never does.
+
+Usage:
+    python model_bundle.py --output model_bundle.bin
+"""
+
+import os
+import json
+import struct
+import argparse
+import numpy as np
+
+BUNDLE_MAGIC = b'CPBUNDL1'
+ALIGNMENT = 64
+
+# File paths
+bundle_path = 'model_bundle.bin'
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+def write_bundle(path, arrays, metadata):
+    """
+    Write named arrays and JSON metadata to a bundle file (atomically).
+
+    Args:
+        path: Output file
+        arrays: Dict of name -> numpy array
+        metadata: JSON-serializable dict
+    """
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset = _align(offset + array.nbytes)
+    header = json.dumps({'metadata': metadata, 'arrays': layout}).encode('utf-8')
+    data_start = _align(len(BUNDLE_MAGIC) + 8 + len(header))
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(BUNDLE_MAGIC)
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]['offset'])
+            f.write(array.tobytes())
+    os.replace(tmp_path, path)
+
+def read_bundle(path):
+    """
+    Map a bundle file.
+
+    Returns:
+        tuple: (dict of name -> copy-on-write memory-mapped array, metadata dict)
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(BUNDLE_MAGIC)) != BUNDLE_MAGIC:
+            raise ValueError(f"{path} is not a model bundle")
+        header_length, = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(header_length))
+    data_start = _align(len(BUNDLE_MAGIC) + 8 + header_length)
+
+    mapping = np.memmap(path, dtype=np.uint8, mode='c')
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape'], dtype=np.int64))
+        start = data_start + spec['offset']
+        arrays[name] = mapping[start:start + count * dtype.itemsize].view(dtype).reshape(spec['shape'])
+    return arrays, header['metadata']
+
+def build_bundle(model_dir=None):
+    """
+    Collect the arrays and metadata of the trained model in model_dir.
+
+    Returns:
+        tuple: (arrays, metadata) for write_bundle
+    """
+    from predict import load_trained_model
+    from placement import resolve_artifact_path
+    from export_fused import fuse_model
+
+    model, scaler, _ = load_trained_model(model_dir)
+    if model is None or scaler is None:
+        raise SystemExit("The trained model and scaler are needed to build a bundle")
+    model = model.cpu().eval()
+
+    arrays = {f'state/{name}': tensor.detach().cpu().numpy() for name, tensor in model.state_dict().items()}
+    for attribute in ('mean_', 'scale_', 'var_'):
+        arrays[f'scaler/{attribute}'] = np.asarray(getattr(scaler, attribute), dtype=np.float64)
+    fused = fuse_model(model, scaler)
+    for i, (w, b) in enumerate(zip(fused.weights, fused.biases)):
+        arrays[f'fused/w{i}'] = w
+        arrays[f'fused/b{i}'] = b
+
+    metadata = {'input_dim': int(arrays['scaler/mean_'].shape[0]),
+                'fused_layers': len(fused.weights),
+                'scaler_samples_seen': int(np.max(scaler.n_samples_seen_))}
+    model_info_file = resolve_artifact_path('model_info.json', model_dir)
+    if os.path.exists(model_info_file):
+        with open(model_info_file) as f:
+            metadata['model_info'] = json.load(f)
+    return arrays, metadata
+
+def load_torch_model(arrays, metadata):
+    """(model, scaler, device) whose weights are views of the bundle arrays"""
+    import torch
+    from sklearn.preprocessing import StandardScaler
+    from predict import ConstructionPlacementPredictor
+
+    device = torch.device('cpu')
+    model = ConstructionPlacementPredictor(input_dim=metadata['input_dim'])
+    state = {name[len('state/'):]: torch.from_numpy(array)
+             for name, array in arrays.items() if name.startswith('state/')}
+    # Point each parameter and buffer at the mapped tensor rather than copying
+    # into it (load_state_dict would give every process a private copy)
+    for name, tensor in model.state_dict(keep_vars=True).items():
+        if tuple(state[name].shape) != tuple(tensor.shape):
+            raise ValueError(f"{name} has shape {tuple(state[name].shape)} in the bundle, expected {tuple(tensor.shape)}")
+        tensor.data = state[name]
+    model.eval()
+
+    scaler = StandardScaler()
+    scaler.mean_ = arrays['scaler/mean_']
+    scaler.scale_ = arrays['scaler/scale_']
+    scaler.var_ = arrays['scaler/var_']
+    scaler.n_features_in_ = metadata['input_dim']
+    scaler.n_samples_seen_ = metadata['scaler_samples_seen']
+    return model, scaler, device
+
+def load_fused_model(arrays, metadata):
+    """(model, None, None) for numpy_engine, with the fused layers as views of the bundle arrays"""
+    from numpy_engine import FusedPlacementModel
+    num_layers = metadata['fused_layers']
+    model = FusedPlacementModel([arrays[f'fused/w{i}'] for i in range(num_layers)],
+                                [arrays[f'fused/b{i}'] for i in range(num_layers)])
+    return model, None, None
+
+def load_bundle(path, backend='torch'):
+    """Load a bundle for the 'torch' or 'numpy' inference backend. Returns (model, scaler, device)."""
+    try:
+        arrays, metadata = read_bundle(path)
+        if backend == 'numpy':
+            return load_fused_model(arrays, metadata)
+        return load_torch_model(arrays, metadata)
+    except Exception as e:
+        print(f"Error loading model bundle {path}: {e}")
+        return None, None, None
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack the trained model into a memory-mappable bundle")
+    parser.add_argument('--model-dir', default=None, help="Directory with the trained artifacts")
+    parser.add_argument('--output', default=bundle_path, help="Bundle file to write")
+    args = parser.parse_args()
+
+    arrays, metadata = build_bundle(args.model_dir)
+    write_bundle(args.output, arrays, metadata)
+    size = os.path.getsize(args.output)
+    print(f"Wrote {len(arrays)} arrays ({size / 1024:.1f} KB) to {args.output}")
+
+if __name__ == "__main__":
+    main()
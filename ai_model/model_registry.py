@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Construction Placement AI - Model Registry
+
+Serves one model per construction type from a registry directory written by
+train_registry.py:
+
+    MODEL_REGISTRY_DIR/
+        registry.json                 {"constructions": {"<construction name>": "<subdirectory>", ...}}
+        <subdirectory>/construction_placement_model.pt
+        <subdirectory>/feature_scaler.pkl
+        <subdirectory>/construction_placement_fused.npz   (numpy backend)
+        <subdirectory>/model_info.json
+
+Models are loaded on first use and kept in an LRU; once more than max_models
+are loaded the least recently used one is dropped, so a server can host many
+more construction types than it keeps in memory. registry.json is re-read
+when it changes, so newly trained types are picked up without a restart.
+"""
+
+import os
+import json
+import threading
+from collections import OrderedDict
+
+INDEX_FILE = 'registry.json'
+
+
+class ModelRegistry:
+    """
+    Thread-safe, lazily loading LRU of per-construction models.
+
+    Args:
+        root_dir: Registry directory containing registry.json
+        load_fn: Called with a model directory; returns the loaded model or None
+        max_models: Largest number of models kept in memory at once
+    """
+
+    def __init__(self, root_dir, load_fn, max_models=32):
+        self.root_dir = root_dir
+        self.load_fn = load_fn
+        self.max_models = max_models
+        self._models = OrderedDict()
+        self._load_locks = {}
+        self._lock = threading.Lock()
+        self._index = {}
+        self._index_mtime = None
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def _refresh_index(self):
+        """Re-read registry.json if it changed (caller holds the lock)"""
+        path = os.path.join(self.root_dir, INDEX_FILE)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            self._index, self._index_mtime = {}, None
+            return
+        if mtime != self._index_mtime:
+            with open(path) as f:
+                self._index = json.load(f).get('constructions', {})
+            self._index_mtime = mtime
+
+    def names(self):
+        """Construction names available in the registry"""
+        with self._lock:
+            self._refresh_index()
+            return sorted(self._index)
+
+    def get(self, name):
+        """
+        Return the model for a construction name, loading it on first use.
+
+        Raises:
+            KeyError: If the registry has no model for name
+            RuntimeError: If the model files could not be loaded
+        """
+        with self._lock:
+            loaded = self._models.get(name)
+            if loaded is not None:
+                self._models.move_to_end(name)
+                self.hits += 1
+                return loaded
+            self._refresh_index()
+            directory = self._index.get(name)
+            if directory is None:
+                raise KeyError(name)
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        # Load outside the registry lock so other types keep serving; the
+        # per-name lock makes concurrent first requests share one load
+        with load_lock:
+            with self._lock:
+                loaded = self._models.get(name)
+                if loaded is not None:
+                    self._models.move_to_end(name)
+                    self.hits += 1
+                    return loaded
+            loaded = self.load_fn(os.path.join(self.root_dir, directory))
+            if loaded is None:
+                raise RuntimeError(f"Model for construction type {name!r} could not be loaded")
+            with self._lock:
+                self._models[name] = loaded
+                self.loads += 1
+                while len(self._models) > self.max_models:
+                    evicted, _ = self._models.popitem(last=False)
+                    self._load_locks.pop(evicted, None)
+                    self.evictions += 1
+        return loaded
+
+    def clear(self):
+        """Drop every loaded model; they are loaded again on next use"""
+        with self._lock:
+            self._models.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'available': len(self._index),
+                'loaded': len(self._models),
+                'max_models': self.max_models,
+                'hits': self.hits,
+                'loads': self.loads,
+                'evictions': self.evictions
+            }
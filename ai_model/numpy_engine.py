@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Construction Placement AI - NumPy Inference Engine
+
+This module runs the construction placement model with plain NumPy, using the
+fused weight file written by export_fused.py. The StandardScaler and every
+BatchNorm1d layer are already folded into the Linear weights, so a prediction
+is four matrix multiplies with no sklearn validation and no torch import.
+
+It exposes the same functions as predict.py so app.py can use either module
+as its inference backend.
+"""
+
+import os
+import time
+import numpy as np
+from placement import resolve_artifact_path, work_areas_to_points, postprocess_placement
+
+# Artifact file name (resolved against MODEL_DIR by load_trained_model)
+fused_model_path = 'construction_placement_fused.npz'
+
+# Files that make up one model version (watched by the server for hot reload)
+artifact_files = [fused_model_path]
+
+class FusedPlacementModel:
+    """
+    Scaler + MLP with BatchNorm folded into four dense layers.
+
+    The two 16-unit heads are stacked into a single 32-unit layer, and the
+    final layer is block-diagonal, producing [rotation, lat offset, lng offset].
+    Weights are kept in float64 because folding the scaler divides by the
+    small coordinate spread, which float32 would not represent accurately.
+    """
+
+    def __init__(self, weights, biases):
+        self.weights = [np.ascontiguousarray(w, dtype=np.float64) for w in weights]
+        self.biases = [np.ascontiguousarray(b, dtype=np.float64) for b in biases]
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            num_layers = int(data['num_layers'])
+            weights = [data[f'w{i}'] for i in range(num_layers)]
+            biases = [data[f'b{i}'] for i in range(num_layers)]
+        return cls(weights, biases)
+
+    def forward(self, features):
+        """
+        Run the fused network on raw (unscaled) features.
+
+        Args:
+            features: (N, 8) array of work area coordinates
+
+        Returns:
+            tuple: (N,) normalized rotations and (N, 2) position offsets
+        """
+        h = np.asarray(features, dtype=np.float64)
+        last = len(self.weights) - 1
+        for i, (w, b) in enumerate(zip(self.weights, self.biases)):
+            h = h @ w + b
+            if i < last:
+                np.maximum(h, 0.0, out=h)
+        return h[:, 0], h[:, 1:3]
+
+def load_trained_model(model_dir=None):
+    """Load the fused model. Returns (model, scaler, device) like predict.py."""
+    fused_file = resolve_artifact_path(fused_model_path, model_dir)
+    try:
+        if not os.path.exists(fused_file):
+            print(f"Fused model file {fused_file} not found, run export_fused.py first")
+            return None, None, None
+        model = FusedPlacementModel.load(fused_file)
+        print(f"Successfully loaded fused model from {fused_file}")
+        return model, None, None
+    except Exception as e:
+        print(f"Error loading fused model: {e}")
+        return None, None, None
+
+def predict_construction_placement_batch(model, scaler, device, work_areas, timings=None):
+    """
+    Predict rotation and position for N work areas with the fused model.
+
+    scaler and device are ignored; they are accepted so this has the same
+    signature as predict.predict_construction_placement_batch. The scaler is
+    folded into the first layer, so timings has no scaler_transform stage.
+    """
+    if len(work_areas) == 0:
+        return []
+
+    t0 = time.perf_counter()
+    points = work_areas_to_points(work_areas)
+    t1 = time.perf_counter()
+    rotation_pred, position_pred = model.forward(points.reshape(-1, 8))
+    t2 = time.perf_counter()
+    results = postprocess_placement(points, rotation_pred, position_pred)
+
+    if timings is not None:
+        timings['feature_assembly'] = t1 - t0
+        timings['forward'] = t2 - t1
+        timings['postprocess'] = time.perf_counter() - t2
+
+    return results
+
+def predict_construction_placement(model, scaler, device, work_area_points, timings=None):
+    """Predict rotation and position for a single work area with the fused model."""
+    return predict_construction_placement_batch(model, scaler, device, [work_area_points], timings)[0]
+
+def predict_construction_rotation(model, scaler, device, work_area_points):
+    """Rotation-only prediction, matching predict.predict_construction_rotation."""
+    return predict_construction_placement(model, scaler, device, work_area_points)["rotation"]
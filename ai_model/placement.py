@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Construction Placement AI - Placement Helpers
+
+Artifact lookup, input validation and output post-processing shared by
+every inference backend. This module only depends on NumPy so it can be used
+without torch.
+"""
+
+import os
+import numpy as np
+
+def resolve_artifact_path(filename, model_dir=None):
+    """
+    Resolve a model artifact filename to a path.
+    
+    Artifacts are looked up in model_dir, then the MODEL_DIR environment
+    variable, then the directory of this file, so loading does not depend on
+    the current working directory. Absolute filenames are returned unchanged.
+    """
+    if model_dir is None:
+        model_dir = os.environ.get('MODEL_DIR', os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(model_dir, filename)
+
+def validate_work_area_points(work_area_points):
+    """
+    Check that a work area is 4 numeric [lat, lng] points.
+
+    Returns:
+        str: An error message, or None if the work area is valid
+    """
+    if not isinstance(work_area_points, (list, tuple)) or len(work_area_points) != 4:
+        return 'Expected exactly 4 work area points'
+    for point in work_area_points:
+        if not isinstance(point, (list, tuple)) or len(point) != 2:
+            return 'Each work area point must be a [lat, lng] pair'
+        for value in point:
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                return 'Work area coordinates must be numbers'
+    return None
+
+def work_areas_to_points(work_areas):
+    """
+    Stack work areas into an (N, 4, 2) array.
+    
+    Reshaping to (N, 8) gives the model features in reference, point2,
+    point3, point4 order.
+    """
+    return np.asarray(work_areas, dtype=np.float64).reshape(-1, 4, 2)
+
+def work_area_centroids(features):
+    """
+    Centroid of each work area from an (N, 8) feature matrix.
+    
+    Returns:
+        (N, 2) array of [lat, lng] centroids
+    """
+    features = np.asarray(features, dtype=np.float64)
+    return np.column_stack([features[:, 0::2].sum(axis=1) / 4,   # average of all lats
+                            features[:, 1::2].sum(axis=1) / 4])  # average of all lngs
+
+def postprocess_placement(points, rotation_pred, position_pred):
+    """
+    Turn raw model outputs into degrees and absolute [lat, lng] positions.
+    
+    Args:
+        points: (N, 4, 2) array of work area points
+        rotation_pred: (N,) normalized rotation predictions
+        position_pred: (N, 2) position offset predictions
+    
+    Returns:
+        list: N dicts with "rotation" and "position"
+    """
+    # Convert normalized rotation prediction back to degrees
+    predicted_angles = (rotation_pred * 360.0) % 360
+    
+    # Position predictions are offsets relative to the centroid of the work
+    # area, scaled by half the lat/lng spread of its points
+    centroids = points.sum(axis=1) / 4
+    spreads = points.max(axis=1) - points.min(axis=1)
+    predicted_positions = centroids + position_pred * spreads * 0.5  # Scale factor can be adjusted
+    
+    return [
+        {
+            "rotation": predicted_angles[i],
+            "position": [predicted_positions[i, 0], predicted_positions[i, 1]]
+        }
+        for i in range(len(predicted_angles))
+    ]
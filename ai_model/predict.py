@@ -6,46 +6,53 @@ This script loads a trained model and demonstrates how to use it
 to predict the optimal rotation angle for a construction.
 """
 
-import numpy as np
 import torch
-from torch.nn import Module
 import pickle
+import json
 import os
+import time
+from placement import resolve_artifact_path, work_areas_to_points, postprocess_placement
 
-# File paths
+# Artifact file names (resolved against MODEL_DIR by load_trained_model)
 model_path = 'construction_placement_model.pt'
 scaler_path = 'feature_scaler.pkl'
+model_info_path = 'model_info.json'
+
+# Files that make up one model version (watched by the server for hot reload)
+artifact_files = [model_path, scaler_path]
 
 # Neural network model definition (needs to match the training model)
 class ConstructionPlacementPredictor(torch.nn.Module):
-    def __init__(self, input_dim):
+    def __init__(self, input_dim, hidden_dims=(64, 32, 16)):
         super(ConstructionPlacementPredictor, self).__init__()
+        # Widths of the two shared layers and of each head's hidden layer
+        shared_dim1, shared_dim2, head_dim = hidden_dims
         self.shared_network = torch.nn.Sequential(
-            torch.nn.Linear(input_dim, 64),
-            torch.nn.BatchNorm1d(64),
+            torch.nn.Linear(input_dim, shared_dim1),
+            torch.nn.BatchNorm1d(shared_dim1),
             torch.nn.ReLU(),
             torch.nn.Dropout(0.2),
             
-            torch.nn.Linear(64, 32),
-            torch.nn.BatchNorm1d(32),
+            torch.nn.Linear(shared_dim1, shared_dim2),
+            torch.nn.BatchNorm1d(shared_dim2),
             torch.nn.ReLU(),
             torch.nn.Dropout(0.2)
         )
         
         # Branch for rotation prediction
         self.rotation_network = torch.nn.Sequential(
-            torch.nn.Linear(32, 16),
-            torch.nn.BatchNorm1d(16),
+            torch.nn.Linear(shared_dim2, head_dim),
+            torch.nn.BatchNorm1d(head_dim),
             torch.nn.ReLU(),
-            torch.nn.Linear(16, 1)  # Output: rotation (normalized 0-1)
+            torch.nn.Linear(head_dim, 1)  # Output: rotation (normalized 0-1)
         )
         
         # Branch for position prediction
         self.position_network = torch.nn.Sequential(
-            torch.nn.Linear(32, 16),
-            torch.nn.BatchNorm1d(16),
+            torch.nn.Linear(shared_dim2, head_dim),
+            torch.nn.BatchNorm1d(head_dim),
             torch.nn.ReLU(),
-            torch.nn.Linear(16, 2)  # Output: [lat, lng] (normalized)
+            torch.nn.Linear(head_dim, 2)  # Output: [lat, lng] (normalized)
         )
         
     def forward(self, x):
@@ -54,63 +61,98 @@ class ConstructionPlacementPredictor(torch.nn.Module):
         position = self.position_network(shared_features)
         return rotation, position
 
-def load_trained_model():
-    """Load the trained model and scaler."""
+def quantize_model(model):
+    """
+    Int8 dynamic-quantized copy of a trained float model for CPU inference.
+    
+    Linear weights are stored as int8 and activations are quantized on the
+    fly for each call; BatchNorm stays in float. The result only runs on CPU.
+    """
+    return torch.ao.quantization.quantize_dynamic(model.cpu(), {torch.nn.Linear}, dtype=torch.qint8)
+
+def load_trained_model(model_dir=None, quantized=False):
+    """
+    Load the trained model and scaler from model_dir (default: MODEL_DIR or this directory).
+    
+    With quantized=True the Linear layers are quantized to int8 after loading
+    (see quantize_model) and the model runs on the CPU.
+    """
+    model_file = resolve_artifact_path(model_path, model_dir)
+    scaler_file = resolve_artifact_path(scaler_path, model_dir)
     try:
         # Load scaler
-        if os.path.exists(scaler_path):
-            with open(scaler_path, 'rb') as f:
+        if os.path.exists(scaler_file):
+            with open(scaler_file, 'rb') as f:
                 scaler = pickle.load(f)
-            print(f"Successfully loaded scaler from {scaler_path}")
+            print(f"Successfully loaded scaler from {scaler_file}")
         else:
-            print(f"Scaler file {scaler_path} not found, will use default normalization")
+            print(f"Scaler file {scaler_file} not found, will use default normalization")
             scaler = None
         
         # Load model
-        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        model = ConstructionPlacementPredictor(input_dim=8)
+        if quantized:
+            device = torch.device('cpu')
+        else:
+            device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        # Input size from the model info written at training time (8 for 4 work area points)
+        input_dim = 8
+        model_info_file = resolve_artifact_path(model_info_path, model_dir)
+        if os.path.exists(model_info_file):
+            with open(model_info_file) as f:
+                input_dim = json.load(f).get('input_dim', input_dim)
+        model = ConstructionPlacementPredictor(input_dim=input_dim)
         
-        if os.path.exists(model_path):
-            model.load_state_dict(torch.load(model_path, map_location=device))
+        if os.path.exists(model_file):
+            model.load_state_dict(torch.load(model_file, map_location=device))
             model.to(device)
             model.eval()
-            print(f"Successfully loaded model from {model_path}")
+            if quantized:
+                model = quantize_model(model)
+            print(f"Successfully loaded {'int8 quantized ' if quantized else ''}model from {model_file}")
         else:
-            print(f"Model file {model_path} not found, please train the model first")
-            return None, scaler
+            print(f"Model file {model_file} not found, please train the model first")
+            return None, scaler, device
             
         return model, scaler, device
     except Exception as e:
         print(f"Error loading model: {e}")
         return None, None, None
 
-def predict_construction_placement(model, scaler, device, work_area_points):
+def predict_construction_placement_batch(model, scaler, device, work_areas, timings=None):
     """
-    Predict the optimal rotation angle and position for a construction.
+    Predict the optimal rotation angle and position for many constructions at once.
+    
+    All work areas go through a single scaler transform and a single forward
+    pass over an (N, 8) tensor, so scoring a whole corridor costs one call
+    instead of N.
     
     Args:
         model: The trained model
         scaler: The feature scaler (if available)
         device: The device to run inference on
-        work_area_points: List of 4 points, each with lat/lng coordinates
-                         [[lat1, lng1], [lat2, lng2], [lat3, lng3], [lat4, lng4]]
+        work_areas: List of N work areas, each a list of 4 [lat, lng] points
+        timings: Optional dict that receives the seconds spent in each stage
+                 (feature_assembly, scaler_transform, forward, postprocess)
     
     Returns:
-        dict: Contains:
+        list: N dicts, each containing:
             - rotation: The predicted optimal rotation angle in degrees
             - position: The predicted optimal position [lat, lng]
     """
-    # Convert points to the expected format
-    features = np.array([
-        work_area_points[0][0], work_area_points[0][1],  # reference point
-        work_area_points[1][0], work_area_points[1][1],  # point 2
-        work_area_points[2][0], work_area_points[2][1],  # point 3
-        work_area_points[3][0], work_area_points[3][1]   # point 4
-    ]).reshape(1, -1)
+    if len(work_areas) == 0:
+        return []
+    
+    t0 = time.perf_counter()
+    
+    # (N, 4, 2) points -> (N, 8) features in reference, point2, point3, point4 order
+    points = work_areas_to_points(work_areas)
+    features = points.reshape(-1, 8)
+    t1 = time.perf_counter()
     
     # Normalize features if scaler is available
     if scaler is not None:
         features = scaler.transform(features)
+    t2 = time.perf_counter()
     
     # Convert to PyTorch tensor
     features_tensor = torch.tensor(features, dtype=torch.float32).to(device)
@@ -118,33 +160,39 @@ def predict_construction_placement(model, scaler, device, work_area_points):
     # Make prediction
     with torch.no_grad():
         rotation_pred, position_pred = model(features_tensor)
-        rotation_pred = rotation_pred.cpu().numpy()[0, 0]
-        position_pred = position_pred.cpu().numpy()[0]
-    
-    # Convert normalized rotation prediction back to degrees
-    predicted_angle = rotation_pred * 360.0
-    predicted_angle = predicted_angle % 360
-    
-    # Calculate predicted center
-    # This depends on how position was normalized in training
-    # For now, we'll use a simple approach assuming the position predictions
-    # are relative to the centroid of the work area points
-    centroid_lat = sum(point[0] for point in work_area_points) / 4
-    centroid_lng = sum(point[1] for point in work_area_points) / 4
-    
-    # Scale the position prediction based on the size of the work area
-    # Here we're assuming position_pred[0] is lat offset and position_pred[1] is lng offset
-    # The actual implementation would depend on how you normalized the data during training
-    lat_spread = max(point[0] for point in work_area_points) - min(point[0] for point in work_area_points)
-    lng_spread = max(point[1] for point in work_area_points) - min(point[1] for point in work_area_points)
-    
-    predicted_lat = centroid_lat + position_pred[0] * lat_spread * 0.5  # Scale factor can be adjusted
-    predicted_lng = centroid_lng + position_pred[1] * lng_spread * 0.5  # Scale factor can be adjusted
-    
-    return {
-        "rotation": predicted_angle,
-        "position": [predicted_lat, predicted_lng]
-    }
+        rotation_pred = rotation_pred.cpu().numpy()[:, 0]
+        position_pred = position_pred.cpu().numpy()
+    t3 = time.perf_counter()
+    
+    results = postprocess_placement(points, rotation_pred, position_pred)
+    
+    if timings is not None:
+        timings['feature_assembly'] = t1 - t0
+        timings['scaler_transform'] = t2 - t1
+        timings['forward'] = t3 - t2
+        timings['postprocess'] = time.perf_counter() - t3
+    
+    return results
+
+def predict_construction_placement(model, scaler, device, work_area_points, timings=None):
+    """
+    Predict the optimal rotation angle and position for a construction.
+    
+    Args:
+        model: The trained model
+        scaler: The feature scaler (if available)
+        device: The device to run inference on
+        work_area_points: List of 4 points, each with lat/lng coordinates
+                         [[lat1, lng1], [lat2, lng2], [lat3, lng3], [lat4, lng4]]
+        timings: Optional dict that receives the seconds spent in each stage
+    
+    Returns:
+        dict: Contains:
+            - rotation: The predicted optimal rotation angle in degrees
+            - position: The predicted optimal position [lat, lng]
+    """
+    # A batch of one, so single and batch predictions always agree
+    return predict_construction_placement_batch(model, scaler, device, [work_area_points], timings)[0]
 
 # Keep this function for backward compatibility
 def predict_construction_rotation(model, scaler, device, work_area_points):
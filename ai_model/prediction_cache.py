@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Construction Placement AI - Prediction Cache
+
+An in-process LRU cache for placement predictions. Work areas are keyed on
+their four lat/lng points rounded to a fixed number of decimal places, so the
+near-identical requests a planner sends while adjusting a layout share one
+model call. An optional namespace (e.g. the construction type) keeps the
+predictions of different models apart.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """
+    Thread-safe LRU cache with an optional time-to-live.
+
+    Args:
+        max_size: Maximum number of cached predictions
+        precision: Decimal places kept when quantizing coordinates
+                   (6 places is roughly 0.1 m of latitude)
+        ttl_seconds: Entries older than this are treated as misses (None = no expiry)
+    """
+
+    def __init__(self, max_size=10000, precision=6, ttl_seconds=None):
+        self.max_size = max_size
+        self.precision = precision
+        self.ttl_seconds = ttl_seconds
+        self._scale = 10 ** precision
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def make_key(self, work_area_points, namespace=None):
+        """Quantize the four [lat, lng] points into a hashable key."""
+        scale = self._scale
+        return (namespace,) + tuple(int(round(value * scale)) for point in work_area_points for value in point)
+
+    def get(self, work_area_points, namespace=None):
+        """Return the cached prediction, or None on a miss."""
+        key = self.make_key(work_area_points, namespace)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if self.ttl_seconds is None or time.monotonic() - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, work_area_points, value, namespace=None):
+        key = self.make_key(work_area_points, namespace)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, work_area_points, compute, namespace=None):
+        """Return the cached prediction, calling compute(work_area_points) on a miss."""
+        value = self.get(work_area_points, namespace)
+        if value is None:
+            value = compute(work_area_points)
+            self.put(work_area_points, value, namespace)
+        return value
+
+    def clear(self):
+        """Drop every entry, e.g. after the model has been reloaded."""
+        with self._lock:
+            self._entries.clear()
+
+    def clear_namespaced(self):
+        """Drop the entries stored under a namespace, keeping those of the default (None) namespace."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] is not None]:
+                del self._entries[key]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'precision': self.precision,
+            'ttl_seconds': self.ttl_seconds,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
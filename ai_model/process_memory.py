@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Construction Placement AI - Process Memory Report
+
+Reports the memory of the API server processes from /proc (Linux), to check
+how much of it pre-fork workers share with the master (see gunicorn.conf.py
+and model_bundle.py):
+
+- rss_kb: resident memory, counting shared pages in full in every process
+- pss_kb: proportional share, i.e. shared pages divided among their users;
+  the sum of pss_kb over all workers is the real memory cost of the server
+- shared_kb / private_kb: resident pages shared with other processes, or not
+
+Usage:
+    python process_memory.py <master pid>
+"""
+
+import os
+import sys
+
+SMAPS_FIELDS = {
+    'Pss': 'pss_kb',
+    'Shared_Clean': 'shared_clean_kb',
+    'Shared_Dirty': 'shared_dirty_kb',
+    'Private_Clean': 'private_clean_kb',
+    'Private_Dirty': 'private_dirty_kb'
+}
+
+def _read_kb_fields(path, fields):
+    values = {}
+    with open(path) as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            if key in fields:
+                values[fields[key]] = int(rest.split()[0])
+    return values
+
+def memory_usage(pid='self'):
+    """
+    Memory of one process in KB.
+
+    Returns:
+        dict: pid, rss_kb and, where /proc/<pid>/smaps_rollup is readable,
+              pss_kb, shared_kb and private_kb (empty if /proc is not available)
+    """
+    base = f'/proc/{pid}'
+    try:
+        usage = _read_kb_fields(f'{base}/status', {'VmRSS': 'rss_kb'})
+    except OSError:
+        return {}
+    usage['pid'] = os.getpid() if pid == 'self' else int(pid)
+    try:
+        rollup = _read_kb_fields(f'{base}/smaps_rollup', SMAPS_FIELDS)
+    except OSError:
+        return usage
+    usage['pss_kb'] = rollup.get('pss_kb', 0)
+    usage['shared_kb'] = rollup.get('shared_clean_kb', 0) + rollup.get('shared_dirty_kb', 0)
+    usage['private_kb'] = rollup.get('private_clean_kb', 0) + rollup.get('private_dirty_kb', 0)
+    return usage
+
+def child_pids(pid):
+    """Direct children of a process (the workers of a pre-fork master)"""
+    children = []
+    task_dir = f'/proc/{pid}/task'
+    for tid in os.listdir(task_dir):
+        try:
+            with open(f'{task_dir}/{tid}/children') as f:
+                children.extend(int(child) for child in f.read().split())
+        except OSError:
+            continue
+    return sorted(set(children))
+
+def main():
+    if len(sys.argv) != 2:
+        raise SystemExit(f"Usage: {sys.argv[0]} <master pid>")
+    master = int(sys.argv[1])
+    rows = [('master', memory_usage(master))]
+    rows += [('worker', memory_usage(pid)) for pid in child_pids(master)]
+
+    print(f"{'role':>8} {'pid':>8} {'rss (MB)':>10} {'pss (MB)':>10} {'shared (MB)':>12} {'private (MB)':>13}")
+    for role, usage in rows:
+        if not usage:
+            continue
+        print(f"{role:>8} {usage['pid']:>8} {usage['rss_kb'] / 1024:>10.1f} {usage.get('pss_kb', 0) / 1024:>10.1f} "
+              f"{usage.get('shared_kb', 0) / 1024:>12.1f} {usage.get('private_kb', 0) / 1024:>13.1f}")
+    total_rss = sum(usage.get('rss_kb', 0) for _, usage in rows)
+    total_pss = sum(usage.get('pss_kb', 0) for _, usage in rows)
+    print(f"\nTotal: {total_rss / 1024:.1f} MB RSS, {total_pss / 1024:.1f} MB PSS "
+          f"({(total_rss - total_pss) / 1024:.1f} MB counted more than once in RSS is shared)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Construction Placement AI - Request Profiling
+
+On-demand cProfile of API requests, for looking inside a misbehaving replica
+without redeploying it. A RequestProfiler is switched on with a sample rate
+(profile that fraction of requests) and/or a count (profile the next N
+requests); each profiled request writes:
+
+    PROFILE_DIR/<time>-<n>-<endpoint>.prof   cProfile dump (pstats / snakeviz)
+    PROFILE_DIR/combined.prof                all profiled requests so far
+    PROFILE_DIR/flamegraph.folded            collapsed stacks of combined.prof
+
+Only the newest max_dumps per-request dumps are kept. The files are written
+by a background thread, so a profiled request only pays for the profiling
+itself; profiles that arrive while the writer is max_pending behind are
+dropped (and counted).
+
+flamegraph.folded is in the format read by flamegraph.pl and speedscope, in
+microseconds. cProfile records caller -> callee edges rather than whole
+stacks, so the stacks are rebuilt by splitting each function's time among its
+callers in proportion; deep shared helpers may be attributed approximately.
+
+When switched off, requests only pay for one attribute check. One request is
+profiled at a time (a second concurrent one runs unprofiled), and only the
+request's own thread is profiled, so with micro-batching the model forward,
+which runs on the batcher thread, does not show up.
+
+Usage:
+    python profiling.py profiles/combined.prof > flamegraph.folded
+"""
+
+import os
+import sys
+import time
+import queue
+import random
+import pstats
+import cProfile
+import logging
+import threading
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+MAX_STACK_DEPTH = 64
+
+
+def _function_label(func):
+    filename, line, name = func
+    if filename == '~':
+        # Built-ins such as torch's C operators: "<built-in method torch._C._nn.linear>"
+        return name.strip('<>')
+    return f"{os.path.basename(filename)}:{name}:{line}"
+
+def collapsed_stacks(stats):
+    """
+    Rebuild collapsed stacks from a pstats.Stats call graph.
+
+    Returns:
+        Counter: "root;caller;function" -> self time in microseconds
+    """
+    entries = stats.stats
+    children = {}
+    for func, (_, _, _, _, callers) in entries.items():
+        for caller, edge in callers.items():
+            # edge = (primitive calls, calls, self time, cumulative time) of func when called from caller
+            children.setdefault(caller, []).append((func, edge[3]))
+    # Top-level calls, without the profiler's own disable() call
+    roots = [func for func, entry in entries.items() if not entry[4] and '_lsprof' not in func[2]]
+
+    folded = Counter()
+
+    def walk(func, path, seconds):
+        _, _, self_time, cumulative_time, _ = entries[func]
+        path = path + [_function_label(func)]
+        if cumulative_time <= 0 or len(path) > MAX_STACK_DEPTH:
+            folded[';'.join(path)] += int(seconds * 1e6)
+            return
+        share = seconds / cumulative_time
+        folded[';'.join(path)] += int(self_time * share * 1e6)
+        for child, edge_time in children.get(func, ()):
+            if child == func or _function_label(child) in path:
+                continue  # recursion: already counted in the caller's cumulative time
+            walk(child, path, edge_time * share)
+
+    for root in roots:
+        walk(root, [], entries[root][3])
+    return Counter({stack: us for stack, us in folded.items() if us > 0})
+
+def write_collapsed(stats, path):
+    """Write the collapsed stacks of stats to path (atomically)"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        for stack, microseconds in sorted(collapsed_stacks(stats).items()):
+            f.write(f"{stack} {microseconds}\n")
+    os.replace(tmp_path, path)
+
+
+class RequestProfiler:
+    """
+    Profiles a sampled fraction of requests and/or the next N requests.
+
+    Args:
+        output_dir: Directory the profiles are written to
+        sample_rate: Fraction of requests to profile (0 = none)
+        next_requests: Number of upcoming requests to profile (0 = none)
+        max_dumps: Per-request dumps kept in output_dir; older ones are deleted
+        max_pending: Profiles waiting for the writer thread before new ones are dropped
+    """
+
+    def __init__(self, output_dir, sample_rate=0.0, next_requests=0, max_dumps=100, max_pending=16):
+        self.output_dir = output_dir
+        self.max_dumps = max_dumps
+        self._lock = threading.Lock()
+        self._running = threading.Lock()
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._writer = None
+        self._combined = None
+        self._dumps = []
+        self.profiled = 0
+        self.dropped = 0
+        self.configure(sample_rate, next_requests)
+
+    def configure(self, sample_rate=0.0, next_requests=0):
+        """Change what is profiled; both 0 switches profiling off"""
+        with self._lock:
+            self.sample_rate = min(max(float(sample_rate), 0.0), 1.0)
+            self.next_requests = max(int(next_requests), 0)
+            # The only thing checked on the request path
+            self.enabled = self.sample_rate > 0 or self.next_requests > 0
+
+    def _claim(self):
+        """Whether to profile this request"""
+        with self._lock:
+            if self.next_requests > 0:
+                self.next_requests -= 1
+                self.enabled = self.sample_rate > 0 or self.next_requests > 0
+                return True
+            return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def run(self, endpoint, fn, *args):
+        """Call fn(*args), profiling the call if it is selected; returns fn's result"""
+        # Only one profiler can be active per process; a concurrent request
+        # runs unprofiled and does not use up one of the next N
+        if not self._running.acquire(blocking=False):
+            return fn(*args)
+        if not self._claim():
+            self._running.release()
+            return fn(*args)
+        try:
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                return fn(*args)
+            finally:
+                profile.disable()
+                self._submit(endpoint, profile)
+        finally:
+            self._running.release()
+
+    def _submit(self, endpoint, profile):
+        """Hand a finished profile to the writer thread (never blocks the request)"""
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_profiles, name='profile-writer', daemon=True)
+                self._writer.start()
+            try:
+                self._pending.put_nowait((time.time(), endpoint, profile))
+            except queue.Full:
+                self.dropped += 1
+
+    def _write_profiles(self):
+        while True:
+            try:
+                self._save(*self._pending.get())
+                # Rebuild the combined files once the backlog is written, not per profile
+                if self._pending.empty():
+                    self._combined.dump_stats(os.path.join(self.output_dir, 'combined.prof'))
+                    write_collapsed(self._combined, os.path.join(self.output_dir, 'flamegraph.folded'))
+            except Exception as e:
+                logger.error(f"Could not write request profile: {str(e)}")
+
+    def _save(self, finished_at, endpoint, profile):
+        os.makedirs(self.output_dir, exist_ok=True)
+        with self._lock:
+            self.profiled += 1
+            number = self.profiled
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(finished_at))
+        name = f"{stamp}-{number:05d}-{endpoint.strip('/').replace('/', '_')}.prof"
+        profile.dump_stats(os.path.join(self.output_dir, name))
+        self._dumps.append(name)
+        while len(self._dumps) > self.max_dumps:
+            try:
+                os.remove(os.path.join(self.output_dir, self._dumps.pop(0)))
+            except OSError:
+                pass
+
+        if self._combined is None:
+            self._combined = pstats.Stats(profile)
+        else:
+            self._combined.add(profile)
+
+    def status(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'sample_rate': self.sample_rate,
+                'next_requests': self.next_requests,
+                'profiled': self.profiled,
+                'dropped': self.dropped,
+                'max_dumps': self.max_dumps,
+                'output_dir': self.output_dir
+            }
+
+def main():
+    if len(sys.argv) < 2:
+        raise SystemExit(f"Usage: {sys.argv[0]} <profile.prof> [...]")
+    stats = pstats.Stats(*sys.argv[1:])
+    for stack, microseconds in sorted(collapsed_stacks(stats).items()):
+        print(f"{stack} {microseconds}")
+
+if __name__ == "__main__":
+    main()
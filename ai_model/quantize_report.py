@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Construction Placement AI - Int8 Quantization Report
+
+This script compares the int8 dynamic-quantized model (predict.quantize_model)
+with the float model it was produced from, on the test split returned by
+preprocess_data in train_model.py:
+
+- Mean circular error (degrees) and mean position error
+- Per-call latency (one work area) and batched latency (the whole test split)
+- Serialized model size
+
+The report is printed and saved as JSON, to decide whether serving with
+QUANTIZE_INT8=1 is worth the accuracy cost.
+
+Usage:
+    python quantize_report.py
+    python quantize_report.py --repeats 2000 --output quantization_report.json
+"""
+
+import io
+import json
+import argparse
+import pandas as pd
+import torch
+from predict import load_trained_model, quantize_model
+from train_model import csv_path, preprocess_data, evaluate_model
+from export_fused import time_per_call
+
+# File paths
+report_path = 'quantization_report.json'
+
+def serialized_size(model):
+    """Size in bytes of the model's saved state dict"""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.getbuffer().nbytes
+
+def measure(model, X_test, y_test_rot, y_test_pos, has_position_data, repeats):
+    """Accuracy and latency of one model on the (already scaled) test split"""
+    device = torch.device('cpu')
+    _, circular_error, _, position_error = evaluate_model(
+        model, X_test, y_test_rot, y_test_pos, device, has_position_data, results_file=None)
+
+    single = torch.tensor(X_test[:1], dtype=torch.float32)
+    batch = torch.tensor(X_test, dtype=torch.float32)
+    with torch.no_grad():
+        single_ms = time_per_call(lambda: model(single), repeats)
+        batch_ms = time_per_call(lambda: model(batch), max(1, repeats // 100))
+
+    return {
+        'mean_circular_error': float(circular_error),
+        'mean_position_error': float(position_error) if position_error is not None else None,
+        'single_call_ms': single_ms,
+        'batch_ms': batch_ms,
+        'batch_size': len(X_test),
+        'model_bytes': serialized_size(model)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the int8 quantized model with the float model")
+    parser.add_argument('--csv', default=csv_path, help="Samples CSV (split as in train_model.py)")
+    parser.add_argument('--repeats', type=int, default=1000, help="Timed single-item calls per model")
+    parser.add_argument('--threads', type=int, default=1, help="torch threads, as on a small serving box")
+    parser.add_argument('--output', default=report_path, help="JSON report to write")
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    float_model, _, _ = load_trained_model()
+    if float_model is None:
+        raise SystemExit("Model could not be loaded; train it first")
+    float_model = float_model.cpu().eval()
+    int8_model = quantize_model(float_model)
+
+    df = pd.read_csv(args.csv)
+    _, _, X_test, _, _, y_test_rot, _, _, y_test_pos, _, has_position_data = preprocess_data(df, save_scaler=False)
+
+    report = {
+        'csv': args.csv,
+        'threads': args.threads,
+        'float32': measure(float_model, X_test, y_test_rot, y_test_pos, has_position_data, args.repeats),
+        'int8': measure(int8_model, X_test, y_test_rot, y_test_pos, has_position_data, args.repeats)
+    }
+    fp, q = report['float32'], report['int8']
+    report['speedup'] = {
+        'single_call': fp['single_call_ms'] / q['single_call_ms'],
+        'batch': fp['batch_ms'] / q['batch_ms']
+    }
+    report['circular_error_change'] = q['mean_circular_error'] - fp['mean_circular_error']
+
+    print(f"\nTest split: {len(X_test)} samples, {args.threads} torch thread(s)")
+    print(f"{'':>10} {'circ err (deg)':>15} {'pos err':>12} {'1 call (ms)':>12} {'batch (ms)':>12} {'size (KB)':>10}")
+    for name in ('float32', 'int8'):
+        m = report[name]
+        position = f"{m['mean_position_error']:.3e}" if m['mean_position_error'] is not None else 'n/a'
+        print(f"{name:>10} {m['mean_circular_error']:>15.3f} {position:>12} {m['single_call_ms']:>12.4f} "
+              f"{m['batch_ms']:>12.3f} {m['model_bytes'] / 1024:>10.1f}")
+    print(f"\nSpeedup: {report['speedup']['single_call']:.2f}x per call, {report['speedup']['batch']:.2f}x batched; "
+          f"circular error change {report['circular_error_change']:+.3f} degrees")
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
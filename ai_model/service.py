@@ -0,0 +1,1042 @@
+#!/usr/bin/env python3
+"""
+Construction Placement AI - Prediction Service
+
+This module holds the loaded model, the prediction cache and the optional
+micro-batcher, and implements the /api/predict, /api/predict/batch and
+/api/health request handling independently of the web framework. The Flask
+server (app.py) and the ASGI server (asgi_app.py) are thin wrappers around it.
+
+Handlers take the decoded JSON request body and return (payload, status_code).
+Servers call start() once to load and warm up the model.
+
+The active model can be replaced while serving: reload_model() loads the
+artifacts again in the calling thread, checks them with a smoke prediction
+and swaps them in with a single assignment, so in-flight requests finish on
+the model they started with. It runs on POST /api/admin/reload and, with
+MODEL_WATCH_INTERVAL set, whenever the artifact files change.
+"""
+
+import os
+import json
+import hashlib
+import hmac
+import threading
+import time
+from collections import namedtuple
+import numpy as np
+from placement import resolve_artifact_path, validate_work_area_points
+from batching import MicroBatcher
+from prediction_cache import PredictionCache
+from model_registry import ModelRegistry
+from admission import AdmissionController, Overloaded
+from metrics import RESPONSES, ADMISSION_REFUSED, observe_stages
+from profiling import RequestProfiler
+import process_memory
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Select the inference backend: 'torch' (predict.py) or 'numpy'
+# (numpy_engine.py, which needs the fused weights from export_fused.py and
+# never imports torch). Both modules expose the same prediction functions.
+# The backend module is imported lazily by load_model, so importing this
+# module stays cheap and /api/health can answer before torch is loaded.
+INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'torch').lower()
+
+# Serve an int8 dynamic-quantized copy of the torch model (torch backend only,
+# CPU; see quantize_report.py for its accuracy and latency)
+QUANTIZE_INT8 = os.environ.get('QUANTIZE_INT8', '0') == '1'
+
+# Directory holding the model artifacts (None = MODEL_DIR or this directory)
+MODEL_DIR = os.environ.get('MODEL_DIR')
+
+# Load the default model from one memory-mapped bundle file (model_bundle.py)
+# instead of the separate artifacts, so pre-fork workers share its pages
+# (relative paths are resolved like the other artifacts)
+MODEL_BUNDLE = os.environ.get('MODEL_BUNDLE')
+
+# 'eager' loads and warms up the model before serving; 'background' starts
+# serving immediately (with the geometric fallback) and loads in a thread
+STARTUP_MODE = os.environ.get('STARTUP_MODE', 'eager').lower()
+WARMUP_ITERATIONS = int(os.environ.get('WARMUP_ITERATIONS', 3))
+
+# Sample work area used for warmup forwards
+WARMUP_WORK_AREA = [
+    [49.80141461742608, -97.07760782579732],
+    [49.80136329624377, -97.07778716334005],
+    [49.80134099917904, -97.07764262455791],
+    [49.80142306447984, -97.07768519166763]
+]
+
+# Cache of recent predictions keyed on quantized work area points
+# (PREDICTION_CACHE_SIZE=0 disables it, PREDICTION_CACHE_TTL=0 means no expiry)
+PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 10000))
+PREDICTION_CACHE_PRECISION = int(os.environ.get('PREDICTION_CACHE_PRECISION', 6))
+PREDICTION_CACHE_TTL = float(os.environ.get('PREDICTION_CACHE_TTL', 0))
+
+def _new_cache():
+    if PREDICTION_CACHE_SIZE <= 0:
+        return None
+    return PredictionCache(max_size=PREDICTION_CACHE_SIZE,
+                           precision=PREDICTION_CACHE_PRECISION,
+                           ttl_seconds=PREDICTION_CACHE_TTL or None)
+
+cache = _new_cache()
+
+# Seconds between checks of the artifact files for changes (0 = no watching)
+MODEL_WATCH_INTERVAL = float(os.environ.get('MODEL_WATCH_INTERVAL', 0))
+
+# The admin endpoints (POST /api/admin/*) require this value in the
+# X-Admin-Token header; they are disabled when it is not set
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+def check_admin_token(token):
+    """Error response for an admin request with a missing or wrong token, or None if it may proceed"""
+    if not ADMIN_TOKEN:
+        return {
+            'error': 'Admin endpoints are disabled (ADMIN_TOKEN is not set)',
+            'success': False
+        }, 403
+    if not token or not hmac.compare_digest(token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8')):
+        return {
+            'error': 'Invalid admin token',
+            'success': False
+        }, 403
+    return None
+
+# On-demand cProfile of requests (see profiling.py): a sampled fraction
+# and/or the next N, written to PROFILE_DIR. Also set by POST /api/admin/profile.
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+PROFILE_NEXT_REQUESTS = int(os.environ.get('PROFILE_NEXT_REQUESTS', 0))
+# Newest per-request dumps kept in PROFILE_DIR
+PROFILE_MAX_DUMPS = int(os.environ.get('PROFILE_MAX_DUMPS', 100))
+# Largest count accepted for "next" from the admin endpoint
+PROFILE_MAX_NEXT = 10000
+
+profiler = RequestProfiler(PROFILE_DIR, PROFILE_SAMPLE_RATE, PROFILE_NEXT_REQUESTS, max_dumps=PROFILE_MAX_DUMPS)
+
+backend = None
+
+# The model, scaler and device are published together and replaced with one
+# assignment, so a request never combines a new model with an old scaler.
+# version is a content hash of the artifact files.
+LoadedModel = namedtuple('LoadedModel', ['model', 'scaler', 'device', 'version', 'loaded_at', 'load_seconds'])
+active = None
+
+# Optional per-construction-type models (see model_registry.py), selected by
+# the constructionName field of a request; other requests use the default model
+MODEL_REGISTRY_DIR = os.environ.get('MODEL_REGISTRY_DIR')
+MODEL_REGISTRY_MAX_MODELS = int(os.environ.get('MODEL_REGISTRY_MAX_MODELS', 32))
+
+registry = None
+if MODEL_REGISTRY_DIR:
+    registry = ModelRegistry(MODEL_REGISTRY_DIR, lambda model_dir: _load_candidate(model_dir),
+                             max_models=MODEL_REGISTRY_MAX_MODELS)
+    logger.info(f"Serving per-construction models from {MODEL_REGISTRY_DIR} "
+                f"(at most {MODEL_REGISTRY_MAX_MODELS} in memory)")
+
+# Called with the new LoadedModel after every swap (e.g. to restart forked workers)
+model_swapped_callbacks = []
+
+# Outcome of the most recent reload_model call, reported by /api/health
+last_reload = {}
+_reload_lock = threading.Lock()
+
+# Set once the model is loaded and warmed up; reported by /api/ready
+ready = threading.Event()
+startup_timings = {}
+_startup_thread = None
+
+def import_backend():
+    """Import the inference backend module on first use"""
+    global backend
+    if backend is None:
+        if INFERENCE_BACKEND == 'numpy':
+            import numpy_engine as backend_module
+        else:
+            import predict as backend_module
+        backend = backend_module
+    return backend
+
+def artifact_paths(model_dir=None):
+    """Paths of the files the active backend loads from model_dir (default: MODEL_DIR or MODEL_BUNDLE)"""
+    if MODEL_BUNDLE and model_dir is None:
+        return [resolve_artifact_path(MODEL_BUNDLE, MODEL_DIR)]
+    return [resolve_artifact_path(name, model_dir or MODEL_DIR) for name in import_backend().artifact_files]
+
+def artifact_version(model_dir=None):
+    """Short content hash of the artifact files, identifying a model version"""
+    digest = hashlib.sha256()
+    for path in artifact_paths(model_dir):
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+    return digest.hexdigest()[:12]
+
+def _load_candidate(model_dir=None):
+    """Load the artifacts into a LoadedModel without activating it (None if loading failed)"""
+    started = time.perf_counter()
+    use_bundle = MODEL_BUNDLE and model_dir is None
+    model_dir = None if use_bundle else model_dir or MODEL_DIR
+    version = artifact_version(model_dir)
+    if use_bundle:
+        from model_bundle import load_bundle
+        model, scaler, device = load_bundle(artifact_paths()[0], INFERENCE_BACKEND)
+        if model is not None and QUANTIZE_INT8 and INFERENCE_BACKEND == 'torch':
+            # Quantizing copies the weights, so this gives up the page sharing
+            model = import_backend().quantize_model(model)
+    elif QUANTIZE_INT8 and INFERENCE_BACKEND == 'torch':
+        model, scaler, device = import_backend().load_trained_model(model_dir, quantized=True)
+    else:
+        model, scaler, device = import_backend().load_trained_model(model_dir)
+    if model is None:
+        return None
+    # A deploy that was still writing files when we started loading
+    if artifact_version(model_dir) != version:
+        raise RuntimeError("Model artifacts changed while loading")
+    return LoadedModel(model, scaler, device, version, time.time(), time.perf_counter() - started)
+
+def _activate(candidate):
+    """Make candidate the active model and drop predictions cached from the old one"""
+    global active, cache
+    # Swap the model first: a request that still reads the old cache can at
+    # worst get an answer from the old model, never cache one in the new cache
+    active = candidate
+    cache = _new_cache()
+    for callback in model_swapped_callbacks:
+        callback(candidate)
+
+def load_model():
+    """Load the model artifacts and make them active"""
+    logger.info(f"Loading trained model ({INFERENCE_BACKEND} backend)...")
+    candidate = _load_candidate()
+    if candidate is None:
+        logger.error("Failed to load model. Using fallback logic.")
+        return
+    _activate(candidate)
+    logger.info(f"Model {candidate.version} loaded successfully")
+
+def warmup_model(iterations=WARMUP_ITERATIONS, loaded=None):
+    """Run a few forwards so the first real request does not pay for lazy initialization"""
+    current = loaded or active
+    for _ in range(iterations):
+        backend.predict_construction_placement_batch(current.model, current.scaler, current.device,
+                                                     [WARMUP_WORK_AREA])
+        backend.predict_construction_placement_batch(current.model, current.scaler, current.device,
+                                                     [WARMUP_WORK_AREA] * 32)
+
+def smoke_test(candidate):
+    """Raise if candidate does not produce a finite prediction for the sample work area"""
+    prediction = backend.predict_construction_placement_batch(
+        candidate.model, candidate.scaler, candidate.device, [WARMUP_WORK_AREA])[0]
+    values = [prediction['rotation']] + list(prediction['position'])
+    if not np.all(np.isfinite(np.asarray(values, dtype=np.float64))):
+        raise ValueError(f"Smoke prediction is not finite: {prediction}")
+
+def reload_model(reason='admin', force=False):
+    """
+    Load the artifacts again and swap them in if they pass a smoke prediction.
+
+    Loading, the smoke prediction and warmup run in the calling thread while
+    the current model keeps serving. If any of them fails, the current model
+    stays active (rolled back). Unless force is set, artifacts with the same
+    version as the active model are not reloaded.
+
+    Args:
+        reason: Why the reload was requested ('admin', 'watch', ...)
+        force: Reload even if the artifact version is unchanged
+
+    Returns:
+        dict: The outcome, also kept in last_reload
+    """
+    with _reload_lock:
+        started = time.perf_counter()
+        previous = active
+        outcome = {
+            'reason': reason,
+            'requested_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'previous_version': previous.version if previous is not None else None
+        }
+        try:
+            if not force and previous is not None and artifact_version() == previous.version:
+                outcome['status'] = 'unchanged'
+            else:
+                candidate = _load_candidate()
+                if candidate is None:
+                    raise RuntimeError("Model could not be loaded")
+                smoke_test(candidate)
+                warmup_model(loaded=candidate)
+                _activate(candidate)
+                ready.set()
+                outcome['status'] = 'swapped'
+                outcome['version'] = candidate.version
+        except Exception as e:
+            outcome['status'] = 'rolled_back' if previous is not None else 'failed'
+            outcome['error'] = str(e)
+            logger.error(f"Model reload failed ({reason}): {str(e)}; keeping the current model")
+        outcome['seconds'] = time.perf_counter() - started
+        if outcome['status'] == 'swapped':
+            logger.info(f"Model reloaded ({reason}): {outcome['previous_version']} -> {outcome['version']} "
+                        f"in {outcome['seconds'] * 1000:.1f} ms")
+        last_reload.clear()
+        last_reload.update(outcome)
+        return outcome
+
+def _artifact_signature():
+    signature = []
+    for path in artifact_paths():
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            signature.append(None)
+    return signature
+
+def _watch_artifacts():
+    """Reload the model whenever the artifact files change and then stay unchanged for one interval"""
+    signature = _artifact_signature()
+    while True:
+        time.sleep(MODEL_WATCH_INTERVAL)
+        current = _artifact_signature()
+        if current == signature:
+            continue
+        # Wait for the deploy to finish writing before loading
+        time.sleep(MODEL_WATCH_INTERVAL)
+        if _artifact_signature() != current:
+            continue
+        signature = current
+        reload_model(reason='watch')
+
+def _timed_phase(name, fn):
+    started = time.perf_counter()
+    result = fn()
+    startup_timings[name] = time.perf_counter() - started
+    logger.info(f"Startup phase '{name}' took {startup_timings[name] * 1000:.1f} ms")
+    return result
+
+# Index of historical placements for /api/similar, built once the model is
+# ready from the sample CSVs (SIMILAR_INDEX_CSV glob) or a binary dataset
+# cache (SIMILAR_INDEX_CACHE). With SIMILAR_PREDICT_MAX_DISTANCE > 0 (meters),
+# /api/predict answers from the nearest past placement when it is that close.
+# The index is only built with SIMILAR_INDEX=1 or that shortcut enabled.
+SIMILAR_INDEX_CSV = os.environ.get(
+    'SIMILAR_INDEX_CSV', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'construction_samples_*.csv'))
+SIMILAR_INDEX_CACHE = os.environ.get('SIMILAR_INDEX_CACHE')
+SIMILAR_MAX_K = int(os.environ.get('SIMILAR_MAX_K', 100))
+SIMILAR_PREDICT_MAX_DISTANCE = float(os.environ.get('SIMILAR_PREDICT_MAX_DISTANCE', 0))
+SIMILAR_INDEX = os.environ.get('SIMILAR_INDEX', '0') == '1' or SIMILAR_PREDICT_MAX_DISTANCE > 0
+
+similar_index = None
+
+def build_similar_index():
+    """Build the similar placement index; failures only disable /api/similar"""
+    global similar_index
+    try:
+        # pandas and scipy are only imported when the index is wanted
+        from similar_index import SimilarPlacementIndex
+        if SIMILAR_INDEX_CACHE:
+            similar_index = SimilarPlacementIndex.from_dataset_cache(SIMILAR_INDEX_CACHE)
+        elif SIMILAR_INDEX_CSV:
+            similar_index = SimilarPlacementIndex.from_csvs(SIMILAR_INDEX_CSV)
+        else:
+            return
+        logger.info(f"Similar placement index built over {len(similar_index)} placements")
+    except Exception as e:
+        logger.warning(f"Similar placement index not available: {str(e)}")
+
+def _startup():
+    started = time.perf_counter()
+    try:
+        _timed_phase('import_backend', import_backend)
+        _timed_phase('load_artifacts', load_model)
+        if active is not None:
+            _timed_phase('warmup', warmup_model)
+            ready.set()
+    except Exception as e:
+        logger.error(f"Startup error: {str(e)}")
+    finally:
+        startup_timings['total'] = time.perf_counter() - started
+        logger.info(f"Startup finished in {startup_timings['total'] * 1000:.1f} ms (ready: {ready.is_set()})")
+    # Not in the way of readiness: until the index is built, /api/similar
+    # answers 503 and /api/predict runs the model
+    if SIMILAR_INDEX:
+        _timed_phase('similar_index', build_similar_index)
+
+def start(background=None):
+    """
+    Load and warm up the model.
+
+    With background=True (default: STARTUP_MODE=background) this returns
+    immediately and the work runs in a daemon thread; until it finishes
+    predictions use the geometric fallback and /api/ready reports not ready.
+    """
+    global _startup_thread
+    if background is None:
+        background = STARTUP_MODE == 'background'
+    if MODEL_WATCH_INTERVAL > 0:
+        threading.Thread(target=_watch_artifacts, name='model-watch', daemon=True).start()
+        logger.info(f"Watching the model artifacts every {MODEL_WATCH_INTERVAL} s")
+    if not background:
+        _startup()
+        return
+    _startup_thread = threading.Thread(target=_startup, name='model-startup', daemon=True)
+    _startup_thread.start()
+
+# Optional micro-batching of concurrent /api/predict calls
+MICRO_BATCHING = os.environ.get('MICRO_BATCHING', '0') == '1'
+MICRO_BATCH_MAX_SIZE = int(os.environ.get('MICRO_BATCH_MAX_SIZE', 32))
+MICRO_BATCH_MAX_WAIT_MS = float(os.environ.get('MICRO_BATCH_MAX_WAIT_MS', 2.0))
+
+batcher = None
+
+def start_micro_batching():
+    """
+    Start a new batcher if MICRO_BATCHING is set, e.g. in a forked worker,
+    where the master's batcher thread does not exist.
+    """
+    global batcher
+    if not MICRO_BATCHING:
+        return
+    batcher = MicroBatcher(
+        lambda work_areas: predict_batch(work_areas),
+        max_batch_size=MICRO_BATCH_MAX_SIZE,
+        max_wait_ms=MICRO_BATCH_MAX_WAIT_MS)
+    logger.info(f"Micro-batching enabled (max size {MICRO_BATCH_MAX_SIZE}, max wait {MICRO_BATCH_MAX_WAIT_MS} ms)")
+
+start_micro_batching()
+
+def disable_micro_batching():
+    """Drop the batcher, e.g. in a forked worker where its thread does not exist"""
+    global batcher
+    batcher = None
+
+# Admission control (see admission.py): at most ADMISSION_MAX_CONCURRENT
+# requests run the model and at most ADMISSION_MAX_QUEUE wait for it. Requests
+# beyond that, or that cannot finish by their deadline (X-Request-Deadline-Ms
+# header, else REQUEST_DEADLINE_MS; 0 = none), are answered per OVERLOAD_ACTION:
+# 'fallback' (the geometric rotation, marked fallback: true) or 'reject' (503
+# with Retry-After). With micro-batching, allow at least MICRO_BATCH_MAX_SIZE
+# concurrent requests, since each holds its slot while its batch runs.
+ADMISSION_CONTROL = os.environ.get('ADMISSION_CONTROL', '0') == '1'
+ADMISSION_MAX_CONCURRENT = int(os.environ.get('ADMISSION_MAX_CONCURRENT', os.cpu_count() or 1))
+ADMISSION_MAX_QUEUE = int(os.environ.get('ADMISSION_MAX_QUEUE', 4 * ADMISSION_MAX_CONCURRENT))
+REQUEST_DEADLINE_MS = float(os.environ.get('REQUEST_DEADLINE_MS', 0))
+OVERLOAD_ACTION = os.environ.get('OVERLOAD_ACTION', 'fallback').lower()
+
+admission = None
+if ADMISSION_CONTROL:
+    admission = AdmissionController(ADMISSION_MAX_CONCURRENT, ADMISSION_MAX_QUEUE)
+    logger.info(f"Admission control enabled ({ADMISSION_MAX_CONCURRENT} concurrent, {ADMISSION_MAX_QUEUE} queued, "
+                f"default deadline {REQUEST_DEADLINE_MS or 'none'} ms, overload action '{OVERLOAD_ACTION}')")
+
+# Passed as the deadline of a request that must not wait for a slot, because
+# the server already holds as many requests as admission control can queue
+# (asgi_app.py checks this before handing requests to its executor)
+QUEUE_FULL = object()
+
+def request_deadline(header_value=None):
+    """
+    Deadline of a request, from its X-Request-Deadline-Ms header (a budget in
+    milliseconds from now) or REQUEST_DEADLINE_MS.
+
+    Returns:
+        float: time.monotonic() deadline, or None for no deadline
+    """
+    budget_ms = REQUEST_DEADLINE_MS
+    if header_value:
+        try:
+            budget_ms = float(header_value)
+        except ValueError:
+            pass
+    return time.monotonic() + budget_ms / 1000.0 if budget_ms > 0 else None
+
+def admitted(fn, deadline, kind):
+    """fn wrapped to run in an admission slot (fn itself without admission control)"""
+    if admission is None:
+        return fn
+    def run(*args):
+        if deadline is QUEUE_FULL:
+            raise admission.refuse('queue_full', kind)
+        with admission.slot(deadline, kind):
+            return fn(*args)
+    return run
+
+def overload_response(endpoint, error, degraded):
+    """
+    Response for a request refused by admission control.
+
+    Args:
+        endpoint: Endpoint name for the metrics
+        error: The Overloaded exception
+        degraded: Geometric fallback payload, returned with OVERLOAD_ACTION=fallback
+    """
+    if OVERLOAD_ACTION == 'reject':
+        ADMISSION_REFUSED.inc(endpoint, error.reason, 'shed')
+        RESPONSES.inc(endpoint, 'shed')
+        return {
+            'error': 'Server overloaded, retry later',
+            'reason': error.reason,
+            'retryAfter': error.retry_after,
+            'success': False
+        }, 503
+    ADMISSION_REFUSED.inc(endpoint, error.reason, 'degraded')
+    RESPONSES.inc(endpoint, 'overload_fallback')
+    return dict(degraded, fallback=True, fallbackReason=error.reason, success=True), 200
+
+def predict_batch(work_areas, loaded=None):
+    """Run a model (default: the active one) on a list of work areas, recording the latency of each stage"""
+    timings = {}
+    current = loaded or active
+    predictions = backend.predict_construction_placement_batch(
+        current.model, current.scaler, current.device, work_areas, timings)
+    observe_stages(timings)
+    return predictions
+
+def predict_single(work_area_points):
+    """Run one model prediction, through the micro-batcher if it is enabled"""
+    if batcher is not None:
+        return batcher.predict(work_area_points)
+    return predict_batch([work_area_points])[0]
+
+# Largest number of work areas accepted by /api/predict/batch in one call
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', 1000))
+
+# /api/predict/stream: work areas per model call, and the longest accepted input line
+STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', 256))
+STREAM_MAX_LINE_BYTES = int(os.environ.get('STREAM_MAX_LINE_BYTES', 65536))
+
+def resolve_model(data, endpoint):
+    """
+    Pick the model for a request: the registry model named by constructionName,
+    or the active default model.
+
+    Returns:
+        tuple: (LoadedModel or None, cache namespace, error response or None)
+    """
+    construction_name = data.get('constructionName')
+    if construction_name is None or registry is None:
+        return active, None, None
+    try:
+        return registry.get(construction_name), construction_name, None
+    except KeyError:
+        RESPONSES.inc(endpoint, 'invalid')
+        return None, None, ({
+            'error': f'Unknown construction type: {construction_name}',
+            'success': False
+        }, 404)
+
+def calculate_angle_between_points(p1, p2):
+    return np.arctan2(p2[0] - p1[0], p2[1] - p1[1]) * 180 / np.pi
+
+def fallback_rotation(work_area_points):
+    """Simple geometric rotation (same as in JavaScript version)"""
+    # Get a base angle from the first two points
+    reference_point = work_area_points[0]
+    point2 = work_area_points[1]
+    
+    base_angle = calculate_angle_between_points(reference_point, point2)
+    suggested_rotation = (base_angle + 90) % 360
+    if suggested_rotation < 0:
+        suggested_rotation += 360
+    return suggested_rotation
+
+def handle_predict(data, deadline=None):
+    """
+    Predict optimal rotation (and position) from the /api/predict request body.
+
+    deadline is the time.monotonic() by which the model must have answered
+    (see request_deadline); it only matters with admission control.
+    """
+    try:
+        if not data or 'workAreaPoints' not in data:
+            RESPONSES.inc('predict', 'invalid')
+            return {
+                'error': 'Missing work area points',
+                'success': False
+            }, 400
+            
+        work_area_points = data['workAreaPoints']
+        
+        # Validate input format (before it can join a shared batch)
+        error = validate_work_area_points(work_area_points)
+        if error is not None:
+            RESPONSES.inc('predict', 'invalid')
+            return {
+                'error': error,
+                'success': False
+            }, 400
+        
+        current, namespace, error_response = resolve_model(data, 'predict')
+        if error_response is not None:
+            return error_response
+        
+        # A past placement of (nearly) the same work area answers directly
+        index = similar_index
+        if SIMILAR_PREDICT_MAX_DISTANCE > 0 and index is not None and namespace is None:
+            nearest = index.query(work_area_points, k=1)
+            if nearest and nearest[0]['distance'] <= SIMILAR_PREDICT_MAX_DISTANCE and 'position' in nearest[0]:
+                RESPONSES.inc('predict', 'similar')
+                return {
+                    'rotation': nearest[0]['rotation'],
+                    'position': nearest[0]['position'],
+                    'similar': True,
+                    'distance': nearest[0]['distance'],
+                    'success': True
+                }, 200
+        
+        # Make prediction using the trained model if available
+        if current is not None:
+            try:
+                # Registry models bypass the micro-batcher, which only batches the default model
+                if namespace is None:
+                    compute = predict_single
+                else:
+                    compute = lambda points: predict_batch([points], current)[0]
+                compute = admitted(compute, deadline, 'predict')
+                
+                # Try using the new prediction function first
+                if cache is not None:
+                    predictions = cache.get_or_compute(work_area_points, compute, namespace)
+                else:
+                    predictions = compute(work_area_points)
+                predicted_angle = predictions["rotation"]
+                predicted_position = predictions["position"]
+                logger.info(f"Predicted angle: {predicted_angle}")
+                logger.info(f"Predicted position: {predicted_position}")
+                
+                RESPONSES.inc('predict', 'model')
+                return {
+                    'rotation': float(predicted_angle),
+                    'position': [float(predicted_position[0]), float(predicted_position[1])],
+                    'success': True
+                }, 200
+            except Overloaded as e:
+                return overload_response('predict', e, {'rotation': float(fallback_rotation(work_area_points))})
+            except Exception as e:
+                # Fall back to the older function if there's an error
+                logger.warning(f"Error using new prediction function: {str(e)}. Falling back to rotation-only prediction.")
+                predicted_angle = backend.predict_construction_rotation(
+                    current.model, current.scaler, current.device, work_area_points)
+                logger.info(f"Predicted angle: {predicted_angle}")
+                
+                RESPONSES.inc('predict', 'rotation_fallback')
+                return {
+                    'rotation': float(predicted_angle),
+                    'success': True
+                }, 200
+        else:
+            # Fallback to simple algorithm if model isn't available
+            logger.warning("Using fallback prediction algorithm")
+            
+            suggested_rotation = fallback_rotation(work_area_points)
+            
+            RESPONSES.inc('predict', 'geometric_fallback')
+            return {
+                'rotation': float(suggested_rotation),
+                'fallback': True,
+                'success': True
+            }, 200
+            
+    except Exception as e:
+        logger.error(f"Prediction error: {str(e)}")
+        RESPONSES.inc('predict', 'error')
+        return {
+            'error': str(e),
+            'success': False
+        }, 500
+
+class LineSplitter:
+    """
+    Split a byte stream into lines as chunks arrive.
+
+    Lines longer than max_line_bytes are not buffered; they are returned as
+    None so the caller can report them, and the rest of the line is skipped.
+    """
+
+    def __init__(self, max_line_bytes=STREAM_MAX_LINE_BYTES):
+        self.max_line_bytes = max_line_bytes
+        self._buffer = bytearray()
+        self._too_long = False
+
+    def feed(self, chunk):
+        """Return the lines completed by chunk"""
+        lines = []
+        start = 0
+        while True:
+            end = chunk.find(b'\n', start)
+            if end < 0:
+                break
+            lines.append(self._take(chunk[start:end]))
+            start = end + 1
+        self._append(chunk[start:])
+        return lines
+
+    def finish(self):
+        """Return the last line if the stream did not end with a newline"""
+        if self._buffer or self._too_long:
+            return [self._take(b'')]
+        return []
+
+    def _append(self, data):
+        if self._too_long:
+            return
+        if len(self._buffer) + len(data) > self.max_line_bytes:
+            self._too_long = True
+            self._buffer.clear()
+        else:
+            self._buffer += data
+
+    def _take(self, data):
+        self._append(data)
+        line = None if self._too_long else bytes(self._buffer)
+        self._buffer.clear()
+        self._too_long = False
+        return line
+
+def parse_stream_line(line):
+    """
+    Parse one NDJSON input line: a list of 4 [lat, lng] points, or an object
+    with workAreaPoints (and an optional id echoed in the result).
+
+    Returns:
+        tuple: (work_area_points, id, error); error is None for a valid line
+    """
+    if line is None:
+        return None, None, f'Line longer than {STREAM_MAX_LINE_BYTES} bytes'
+    try:
+        item = json.loads(line)
+    except ValueError as e:
+        return None, None, f'Invalid JSON: {str(e)}'
+    item_id = None
+    if isinstance(item, dict):
+        item_id = item.get('id')
+        if 'workAreaPoints' not in item:
+            return None, item_id, 'Missing work area points'
+        item = item['workAreaPoints']
+    return item, item_id, validate_work_area_points(item)
+
+def predict_stream_chunk(entries):
+    """
+    Predict a chunk of parsed stream lines with one model call.
+
+    Args:
+        entries: List of (line_number, work_area_points, id, error) tuples
+
+    Returns:
+        bytes: One NDJSON result line per entry, in input order
+    """
+    valid = [entry for entry in entries if entry[3] is None]
+    current = active
+    if current is not None and valid:
+        predictions = iter(predict_batch([entry[1] for entry in valid], current))
+    else:
+        predictions = None
+
+    out = []
+    for line_number, work_area_points, item_id, error in entries:
+        result = {'line': line_number}
+        if item_id is not None:
+            result['id'] = item_id
+        if error is not None:
+            result.update(error=error, success=False)
+        elif predictions is not None:
+            prediction = next(predictions)
+            result.update(rotation=float(prediction['rotation']),
+                          position=[float(prediction['position'][0]), float(prediction['position'][1])],
+                          success=True)
+        else:
+            result.update(rotation=float(fallback_rotation(work_area_points)), fallback=True, success=True)
+        out.append(json.dumps(result))
+    return ('\n'.join(out) + '\n').encode('utf-8') if out else b''
+
+class StreamParser:
+    """
+    Incrementally parse an NDJSON request body into chunks of at most
+    chunk_size entries for predict_stream_chunk.
+
+    Blank lines are skipped but still counted in the line numbers; invalid
+    lines become entries with an error instead of ending the stream.
+    """
+
+    def __init__(self, chunk_size=STREAM_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.lines = 0
+        self.invalid = 0
+        self._splitter = LineSplitter()
+        self._entries = []
+        self._line_number = 0
+
+    def feed(self, data):
+        """Return the full chunks completed by data"""
+        return self._add(self._splitter.feed(data))
+
+    def finish(self):
+        """Return the remaining (possibly partial) chunk at the end of the body"""
+        chunks = self._add(self._splitter.finish())
+        if self._entries:
+            chunks.append(self._entries)
+            self._entries = []
+        return chunks
+
+    def _add(self, lines):
+        chunks = []
+        for line in lines:
+            self._line_number += 1
+            if line is not None and not line.strip():
+                continue
+            work_area_points, item_id, error = parse_stream_line(line)
+            self.lines += 1
+            self.invalid += error is not None
+            self._entries.append((self._line_number, work_area_points, item_id, error))
+            if len(self._entries) >= self.chunk_size:
+                chunks.append(self._entries)
+                self._entries = []
+        return chunks
+
+def stream_error_line(error):
+    """NDJSON line reporting an error that ended the stream"""
+    return (json.dumps({'error': error, 'success': False}) + '\n').encode('utf-8')
+
+def record_stream(parser, error=None):
+    """Count a finished /api/predict/stream request"""
+    if error is not None:
+        logger.error(f"Stream prediction error: {error}")
+        RESPONSES.inc('predict_stream', 'error')
+        return
+    RESPONSES.inc('predict_stream', 'model' if active is not None else 'geometric_fallback')
+    logger.info(f"Streamed predictions for {parser.lines} lines ({parser.invalid} invalid)")
+
+def stream_predictions(chunks, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Turn an iterable of request body chunks (NDJSON work areas) into NDJSON
+    result chunks for /api/predict/stream.
+
+    At most chunk_size work areas are held at a time, so memory stays flat
+    however long the stream is.
+    """
+    parser = StreamParser(chunk_size)
+    try:
+        for data in chunks:
+            for entries in parser.feed(data):
+                yield predict_stream_chunk(entries)
+        for entries in parser.finish():
+            yield predict_stream_chunk(entries)
+        record_stream(parser)
+    except Exception as e:
+        record_stream(parser, str(e))
+        yield stream_error_line(str(e))
+
+def handle_predict_batch(data, deadline=None):
+    """Predict rotation and position for the work areas in a /api/predict/batch request body (deadline as for handle_predict)"""
+    try:
+        if not data or 'workAreas' not in data:
+            RESPONSES.inc('predict_batch', 'invalid')
+            return {
+                'error': 'Missing work areas',
+                'success': False
+            }, 400
+        
+        work_areas = data['workAreas']
+        
+        if not isinstance(work_areas, list) or len(work_areas) == 0:
+            RESPONSES.inc('predict_batch', 'invalid')
+            return {
+                'error': 'Expected a non-empty list of work areas',
+                'success': False
+            }, 400
+        
+        if len(work_areas) > MAX_BATCH_SIZE:
+            RESPONSES.inc('predict_batch', 'invalid')
+            return {
+                'error': f'At most {MAX_BATCH_SIZE} work areas per batch',
+                'success': False
+            }, 400
+        
+        # Check every work area before running anything
+        for i, work_area_points in enumerate(work_areas):
+            error = validate_work_area_points(work_area_points)
+            if error is not None:
+                RESPONSES.inc('predict_batch', 'invalid')
+                return {
+                    'error': f'Work area {i}: {error}',
+                    'index': i,
+                    'success': False
+                }, 400
+        
+        current, _, error_response = resolve_model(data, 'predict_batch')
+        if error_response is not None:
+            return error_response
+        
+        if current is not None:
+            try:
+                predictions = admitted(predict_batch, deadline, 'predict_batch')(work_areas, current)
+            except Overloaded as e:
+                return overload_response('predict_batch', e,
+                                         {'results': [{'rotation': float(fallback_rotation(w))} for w in work_areas]})
+            logger.info(f"Predicted placements for {len(predictions)} work areas")
+            results = [{
+                'rotation': float(p["rotation"]),
+                'position': [float(p["position"][0]), float(p["position"][1])]
+            } for p in predictions]
+            
+            RESPONSES.inc('predict_batch', 'model')
+            return {
+                'results': results,
+                'success': True
+            }, 200
+        else:
+            logger.warning("Using fallback prediction algorithm for batch")
+            results = [{'rotation': float(fallback_rotation(w))} for w in work_areas]
+            
+            RESPONSES.inc('predict_batch', 'geometric_fallback')
+            return {
+                'results': results,
+                'fallback': True,
+                'success': True
+            }, 200
+    
+    except Exception as e:
+        logger.error(f"Batch prediction error: {str(e)}")
+        RESPONSES.inc('predict_batch', 'error')
+        return {
+            'error': str(e),
+            'success': False
+        }, 500
+
+def handle_similar(data):
+    """Return the k historical placements nearest to the work area in a /api/similar request body"""
+    try:
+        if not data or 'workAreaPoints' not in data:
+            RESPONSES.inc('similar', 'invalid')
+            return {
+                'error': 'Missing work area points',
+                'success': False
+            }, 400
+        
+        work_area_points = data['workAreaPoints']
+        error = validate_work_area_points(work_area_points)
+        if error is None:
+            k = data.get('k', 5)
+            if isinstance(k, bool) or not isinstance(k, int) or not 1 <= k <= SIMILAR_MAX_K:
+                error = f'k must be an integer between 1 and {SIMILAR_MAX_K}'
+        if error is not None:
+            RESPONSES.inc('similar', 'invalid')
+            return {
+                'error': error,
+                'success': False
+            }, 400
+        
+        index = similar_index
+        if index is None:
+            RESPONSES.inc('similar', 'unavailable')
+            return {
+                'error': 'Similar placement index not available',
+                'success': False
+            }, 503
+        
+        started = time.perf_counter()
+        results = index.query(work_area_points, k)
+        observe_stages({'similar_lookup': time.perf_counter() - started})
+        
+        RESPONSES.inc('similar', 'index')
+        return {
+            'results': results,
+            'success': True
+        }, 200
+    
+    except Exception as e:
+        logger.error(f"Similar placement lookup error: {str(e)}")
+        RESPONSES.inc('similar', 'error')
+        return {
+            'error': str(e),
+            'success': False
+        }, 500
+
+def handle_reload(data, token=None):
+    """Reload the model for POST /api/admin/reload; the body may contain {"force": true}"""
+    error_response = check_admin_token(token)
+    if error_response is not None:
+        return error_response
+    force = bool(data.get('force')) if isinstance(data, dict) else False
+    outcome = reload_model(reason='admin', force=force)
+    if registry is not None:
+        # Per-construction models are loaded again from disk on next use, so
+        # their cached predictions (namespaced by construction name) go too
+        registry.clear()
+        current_cache = cache
+        if current_cache is not None:
+            current_cache.clear_namespaced()
+    succeeded = outcome['status'] in ('swapped', 'unchanged')
+    return dict(outcome, success=succeeded), 200 if succeeded else 500
+
+def handle_profile(data, token=None):
+    """
+    Configure request profiling for POST /api/admin/profile.
+
+    The body may contain sampleRate (fraction of requests) and next (number
+    of upcoming requests, at most PROFILE_MAX_NEXT); {} or both 0 switches
+    profiling off.
+    """
+    error_response = check_admin_token(token)
+    if error_response is not None:
+        return error_response
+    data = data if isinstance(data, dict) else {}
+    try:
+        sample_rate = float(data.get('sampleRate', 0))
+        next_requests = int(data.get('next', 0))
+        if not 0 <= sample_rate <= 1 or not 0 <= next_requests <= PROFILE_MAX_NEXT:
+            raise ValueError(f"sampleRate must be within [0, 1] and next within [0, {PROFILE_MAX_NEXT}]")
+    except (TypeError, ValueError, OverflowError) as e:
+        return {
+            'error': f"Invalid profiling settings: {str(e)}",
+            'success': False
+        }, 400
+    profiler.configure(sample_rate, next_requests)
+    logger.info(f"Request profiling: sample rate {profiler.sample_rate}, next {profiler.next_requests} requests")
+    return dict(profiler.status(), success=True), 200
+
+def health_status():
+    """Status reported by the /api/health endpoint"""
+    current = active
+    status = {
+        'status': 'healthy',
+        'model_loaded': current is not None,
+        'ready': ready.is_set(),
+        'backend': INFERENCE_BACKEND,
+        'quantized': QUANTIZE_INT8 and INFERENCE_BACKEND == 'torch',
+        'process': process_memory.memory_usage()
+    }
+    if current is not None:
+        status['model'] = {
+            'version': current.version,
+            'loaded_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(current.loaded_at)),
+            'load_seconds': current.load_seconds
+        }
+    if last_reload:
+        status['last_reload'] = dict(last_reload)
+    if profiler.enabled or profiler.profiled:
+        status['profiling'] = profiler.status()
+    if registry is not None:
+        status['model_registry'] = registry.stats()
+    if similar_index is not None:
+        status['similar_index'] = {'placements': len(similar_index)}
+    if cache is not None:
+        status['prediction_cache'] = cache.stats()
+    if batcher is not None:
+        status['micro_batching'] = batcher.stats()
+    if admission is not None:
+        status['admission'] = dict(admission.stats(), overload_action=OVERLOAD_ACTION)
+    return status
+
+def ready_status():
+    """Status reported by the /api/ready endpoint, with its HTTP status code"""
+    is_ready = ready.is_set()
+    status = {
+        'ready': is_ready,
+        'model_loaded': active is not None,
+        'startup_seconds': dict(startup_timings)
+    }
+    return status, 200 if is_ready else 503
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Construction Placement AI - Similar Placement Index
+
+An in-memory KD-tree over historical placements (work areas with a known
+construction rotation and, where recorded, center), for answering "what did
+we do last time at this spot?" in well under a millisecond.
+
+Each work area is projected to local meters around the data's mean latitude,
+so the distance between two work areas is the root-mean-square distance in
+meters between their corresponding points. That combines where the work area
+is (its centroid) and its shape in one number that is easy to threshold.
+"""
+
+import glob
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+METERS_PER_DEGREE = 111000
+
+FEATURE_COLUMNS = ['reference_point_lat', 'reference_point_lng',
+                   'point2_lat', 'point2_lng',
+                   'point3_lat', 'point3_lng',
+                   'point4_lat', 'point4_lng']
+POSITION_COLUMNS = ['construction_center_lat', 'construction_center_lng']
+
+
+class SimilarPlacementIndex:
+    """
+    Nearest-neighbour lookup of historical placements.
+
+    Args:
+        features: (N, 8) work area coordinates (4 [lat, lng] points each)
+        rotations: (N,) construction rotations in degrees
+        positions: (N, 2) construction centers, NaN for rows without one, or None if not recorded
+        names: (N,) construction names, or None
+    """
+
+    def __init__(self, features, rotations, positions=None, names=None):
+        features = np.asarray(features, dtype=np.float64)
+        self.rotations = np.asarray(rotations, dtype=np.float64)
+        self.positions = None if positions is None else np.asarray(positions, dtype=np.float64)
+        self._has_position = None if positions is None else ~np.isnan(self.positions).any(axis=1)
+        self.names = None if names is None else np.asarray(names, dtype=object)
+
+        # Local equirectangular projection: meters per degree of lat and lng
+        reference_lat = float(np.mean(features[:, 0::2])) if len(features) else 0.0
+        self._scale = np.tile([METERS_PER_DEGREE, METERS_PER_DEGREE * np.cos(np.radians(reference_lat))], 4)
+        self._tree = cKDTree(features * self._scale)
+
+    def __len__(self):
+        return len(self.rotations)
+
+    @classmethod
+    def from_csvs(cls, pattern):
+        """Build the index from every sample CSV matching a glob pattern"""
+        frames = [pd.read_csv(path) for path in sorted(glob.glob(pattern))]
+        if not frames:
+            raise FileNotFoundError(f"No sample CSVs match {pattern}")
+        df = pd.concat(frames, ignore_index=True).dropna(subset=FEATURE_COLUMNS + ['construction_rotation'])
+        # Exports without construction centers leave NaN in these columns after the concat
+        positions = None
+        if set(POSITION_COLUMNS) <= set(df.columns):
+            positions = df[POSITION_COLUMNS].to_numpy(dtype=np.float64)
+        names = df['construction_name'].to_numpy() if 'construction_name' in df.columns else None
+        return cls(df[FEATURE_COLUMNS].to_numpy(), df['construction_rotation'].to_numpy(), positions, names)
+
+    @classmethod
+    def from_dataset_cache(cls, cache_dir):
+        """Build the index from a binary dataset cache (see dataset_cache.py)"""
+        from dataset_cache import CachedDataset
+        from placement import work_area_centroids
+        dataset = CachedDataset(cache_dir)
+        features = np.asarray(dataset.features)
+        positions = None
+        if dataset.has_position:
+            # The cache stores centers as offsets from the work area centroid
+            positions = np.asarray(dataset.position) + work_area_centroids(features)
+        return cls(features, np.asarray(dataset.rotation) * 360.0, positions)
+
+    def query(self, work_area_points, k=5):
+        """
+        Find the k historical placements closest to a work area.
+
+        Args:
+            work_area_points: List of 4 [lat, lng] points
+            k: Number of neighbours to return
+
+        Returns:
+            list: Dicts with rotation, position (if recorded for that placement), constructionName
+                  (if recorded) and distance (RMS point distance in meters),
+                  nearest first
+        """
+        k = min(k, len(self))
+        if k == 0:
+            return []
+        point = np.asarray(work_area_points, dtype=np.float64).reshape(8) * self._scale
+        distances, indices = self._tree.query(point, k=k)
+        distances, indices = np.atleast_1d(distances), np.atleast_1d(indices)
+
+        results = []
+        for distance, index in zip(distances, indices):
+            result = {
+                'rotation': float(self.rotations[index]),
+                # Euclidean distance over 4 points -> RMS distance per point
+                'distance': float(distance) / 2.0
+            }
+            if self.positions is not None and self._has_position[index]:
+                result['position'] = [float(self.positions[index, 0]), float(self.positions[index, 1])]
+            if self.names is not None:
+                result['constructionName'] = str(self.names[index])
+            results.append(result)
+        return results
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Construction Placement AI - Hyperparameter Sweep
+
+This script trains many model configurations in parallel and ranks them by
+mean circular error. It reuses preprocess_data, ConstructionPlacementPredictor
+and train_model from train_model.py, and never overwrites the saved model or
+scaler.
+
+Each configuration is trained on a process pool that uses all CPU cores,
+with the torch thread count divided between the workers. With --folds K,
+every configuration is scored by K-fold cross-validation; otherwise it is
+scored on the test split from preprocess_data.
+
+Usage:
+    python sweep.py --lr 0.0003 0.001 0.003 --batch-size 32 128 --folds 5
+    python sweep.py --search random --num-configs 20 --lr 0.0001 0.01
+"""
+
+import os
+import json
+import time
+import random
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+import torch
+from sklearn.model_selection import KFold, train_test_split
+from sklearn.preprocessing import StandardScaler
+from train_model import (csv_path, preprocess_data, extract_training_arrays, TensorBatchLoader,
+                         ConstructionPlacementPredictor, train_model, evaluate_model)
+
+# File paths
+leaderboard_path = 'sweep_leaderboard.json'
+
+# Data shared by every task in a worker process, set by _init_worker
+_worker_data = None
+
+def _init_worker(data, num_threads):
+    global _worker_data
+    _worker_data = data
+    torch.set_num_threads(num_threads)
+
+def _fold_arrays(fold):
+    """Scaled train/val/test arrays for one fold (or the fixed split when fold is None)."""
+    data = _worker_data
+    if fold is None:
+        return data['split']
+
+    X, y_rotation, y_position = data['X'], data['y_rotation'], data['y_position']
+    train_idx, test_idx = data['folds'][fold]
+
+    # Hold out part of the training folds for early stopping
+    fit_idx, val_idx = train_test_split(train_idx, test_size=0.15, random_state=42)
+    scaler = StandardScaler().fit(X[fit_idx])
+
+    def take(indices):
+        return (scaler.transform(X[indices]), y_rotation[indices],
+                y_position[indices] if y_position is not None else None)
+
+    return take(fit_idx), take(val_idx), take(test_idx)
+
+def run_trial(config, fold):
+    """Train and evaluate one configuration on one fold. Runs in a worker process."""
+    started = time.perf_counter()
+    torch.manual_seed(config['seed'])
+
+    (X_train, y_train_rot, y_train_pos), (X_val, y_val_rot, y_val_pos), (X_test, y_test_rot, y_test_pos) = \
+        _fold_arrays(fold)
+    has_position_data = y_train_pos is not None
+
+    train_loader = TensorBatchLoader(X_train, y_train_rot, y_train_pos, batch_size=config['batch_size'], shuffle=True)
+    val_loader = TensorBatchLoader(X_val, y_val_rot, y_val_pos, batch_size=config['batch_size'])
+
+    device = torch.device('cpu')
+    model = ConstructionPlacementPredictor(X_train.shape[1], hidden_dims=tuple(config['hidden_dims']))
+    model, train_losses, val_losses = train_model(
+        model, train_loader, val_loader, device, has_position_data,
+        epochs=config['epochs'], lr=config['lr'], patience=config['patience'],
+        position_weight=config['position_weight'], verbose=False)
+
+    mae, circular_error, position_mse, position_mae = evaluate_model(
+        model, X_test, y_test_rot, y_test_pos, device, has_position_data, results_file=None)
+
+    return {
+        'circular_error': float(circular_error),
+        'mae': float(mae),
+        'position_mae': float(position_mae) if position_mae is not None else None,
+        'epochs_run': len(train_losses),
+        'wall_seconds': time.perf_counter() - started
+    }
+
+def build_configs(args):
+    """Expand the command-line value lists into configurations."""
+    space = {
+        'lr': args.lr,
+        'batch_size': args.batch_size,
+        'patience': args.patience,
+        'epochs': args.epochs,
+        'position_weight': args.position_weight,
+        'hidden_dims': [[int(width) for width in dims.split(',')] for dims in args.hidden_dims]
+    }
+
+    if args.search == 'grid':
+        keys = list(space)
+        configs = [dict(zip(keys, values)) for values in itertools.product(*(space[k] for k in keys))]
+    else:
+        # Random search: lr is sampled log-uniformly between its smallest and
+        # largest value, everything else is picked from the given values
+        rng = random.Random(args.seed)
+        low, high = np.log(min(args.lr)), np.log(max(args.lr))
+        configs = []
+        for _ in range(args.num_configs):
+            config = {key: rng.choice(values) for key, values in space.items()}
+            config['lr'] = float(np.exp(rng.uniform(low, high)))
+            configs.append(config)
+
+    for config in configs:
+        config['seed'] = args.seed
+    return configs
+
+def summarize(config, trials):
+    circular_errors = [t['circular_error'] for t in trials]
+    position_errors = [t['position_mae'] for t in trials if t['position_mae'] is not None]
+    return {
+        'config': config,
+        'mean_circular_error': float(np.mean(circular_errors)),
+        'std_circular_error': float(np.std(circular_errors)),
+        'mean_position_error': float(np.mean(position_errors)) if position_errors else None,
+        'mean_epochs_run': float(np.mean([t['epochs_run'] for t in trials])),
+        'wall_seconds': float(sum(t['wall_seconds'] for t in trials)),
+        'folds': len(trials)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel hyperparameter sweep for the construction placement model")
+    parser.add_argument('--csv', default=csv_path, help="Samples CSV to train on")
+    parser.add_argument('--search', choices=['grid', 'random'], default='grid')
+    parser.add_argument('--num-configs', type=int, default=20, help="Configurations to sample in random search")
+    parser.add_argument('--lr', type=float, nargs='+', default=[0.001])
+    parser.add_argument('--batch-size', type=int, nargs='+', default=[32])
+    parser.add_argument('--patience', type=int, nargs='+', default=[30])
+    parser.add_argument('--epochs', type=int, nargs='+', default=[100])
+    parser.add_argument('--position-weight', type=float, nargs='+', default=[0.5])
+    parser.add_argument('--hidden-dims', nargs='+', default=['64,32,16'],
+                        help="Layer widths as shared1,shared2,head (e.g. 128,64,32)")
+    parser.add_argument('--folds', type=int, default=1, help="K-fold cross-validation (1 = fixed test split)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Parallel training processes")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=leaderboard_path, help="Leaderboard JSON file to write")
+    args = parser.parse_args()
+
+    configs = build_configs(args)
+    df = pd.read_csv(args.csv)
+    print(f"Loaded {len(df)} samples; sweeping {len(configs)} configurations x {args.folds} fold(s)")
+
+    if args.folds > 1:
+        X, y_rotation, y_position = extract_training_arrays(df)
+        kfold = KFold(n_splits=args.folds, shuffle=True, random_state=args.seed)
+        data = {'X': X, 'y_rotation': y_rotation, 'y_position': y_position,
+                'folds': list(kfold.split(X))}
+        folds = list(range(args.folds))
+    else:
+        X_train, X_val, X_test, y_train_rot, y_val_rot, y_test_rot, y_train_pos, y_val_pos, y_test_pos, _, _ = \
+            preprocess_data(df, save_scaler=False)
+        data = {'split': ((X_train, y_train_rot, y_train_pos),
+                          (X_val, y_val_rot, y_val_pos),
+                          (X_test, y_test_rot, y_test_pos))}
+        folds = [None]
+
+    # Split the cores between workers so they do not oversubscribe the CPU
+    workers = max(1, min(args.workers, len(configs) * len(folds)))
+    threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+    print(f"Using {workers} worker processes with {threads_per_worker} torch thread(s) each")
+
+    started = time.perf_counter()
+    trials = {i: [] for i in range(len(configs))}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(data, threads_per_worker)) as executor:
+        futures = {executor.submit(run_trial, config, fold): i
+                   for i, config in enumerate(configs) for fold in folds}
+        for done, future in enumerate(as_completed(futures), start=1):
+            index = futures[future]
+            result = future.result()
+            trials[index].append(result)
+            print(f"[{done}/{len(futures)}] config {index}: circular error {result['circular_error']:.2f} "
+                  f"in {result['wall_seconds']:.1f}s")
+
+    leaderboard = sorted((summarize(configs[i], trials[i]) for i in trials),
+                         key=lambda entry: entry['mean_circular_error'])
+    for rank, entry in enumerate(leaderboard, start=1):
+        entry['rank'] = rank
+
+    with open(args.output, 'w') as f:
+        json.dump({'total_wall_seconds': time.perf_counter() - started,
+                   'folds': args.folds,
+                   'leaderboard': leaderboard}, f, indent=2)
+
+    print("\nLeaderboard (by mean circular error):")
+    for entry in leaderboard[:10]:
+        config = entry['config']
+        print(f"{entry['rank']:>3}. {entry['mean_circular_error']:.2f} deg (+/- {entry['std_circular_error']:.2f}) "
+              f"lr={config['lr']:.5g} batch={config['batch_size']} patience={config['patience']} "
+              f"epochs={config['epochs']} pos_w={config['position_weight']} dims={config['hidden_dims']} "
+              f"[{entry['wall_seconds']:.1f}s]")
+    print(f"\nLeaderboard saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
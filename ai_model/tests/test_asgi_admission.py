@@ -0,0 +1,98 @@
+"""Admission control in front of the ASGI server's executor (asgi_app.run_admitted)"""
+
+import os
+import json
+import time
+import asyncio
+import tempfile
+
+import pytest
+
+pytest.importorskip('numpy')
+
+# Start without a model; the test installs a slow stand-in model below
+os.environ['STARTUP_MODE'] = 'eager'
+os.environ['INFERENCE_BACKEND'] = 'numpy'
+os.environ['MODEL_DIR'] = tempfile.mkdtemp()
+os.environ['INFERENCE_EXECUTOR'] = 'thread'
+
+import service
+import asgi_app
+from admission import AdmissionController
+
+WORK_AREA = [
+    [49.80141461742608, -97.07760782579732],
+    [49.80136329624377, -97.07778716334005],
+    [49.80134099917904, -97.07764262455791],
+    [49.80142306447984, -97.07768519166763]
+]
+
+
+async def post_predict(body):
+    messages = []
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if requested:
+            await asyncio.sleep(3600)
+        requested = True
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {'type': 'http', 'path': '/api/predict', 'method': 'POST', 'headers': []}
+    await asgi_app.app(scope, receive, send)
+    status = messages[0]['status']
+    payload = json.loads(b''.join(m.get('body', b'') for m in messages[1:]))
+    return status, payload
+
+
+@pytest.fixture
+def slow_model(monkeypatch):
+    def predict_single(work_area_points):
+        time.sleep(0.3)
+        return {'rotation': 90.0, 'position': [49.8, -97.0]}
+
+    monkeypatch.setattr(service, 'active', service.LoadedModel(None, None, None, 'test', time.time(), 0.0))
+    monkeypatch.setattr(service, 'predict_single', predict_single)
+    monkeypatch.setattr(service, 'cache', None)
+    monkeypatch.setattr(service, 'batcher', None)
+    monkeypatch.setattr(service, 'similar_index', None)
+    monkeypatch.setattr(service, 'admission', AdmissionController(max_concurrent=1, max_queue=1))
+    monkeypatch.setattr(service, 'OVERLOAD_ACTION', 'reject')
+    executor = asgi_app.create_executor()
+    monkeypatch.setattr(asgi_app, 'executor', executor)
+    yield service.admission
+    executor.shutdown(wait=True)
+
+
+def test_requests_beyond_concurrent_plus_queue_are_refused(slow_model):
+    body = json.dumps({'workAreaPoints': WORK_AREA}).encode('utf-8')
+
+    async def spike():
+        return await asyncio.gather(*(post_predict(body) for _ in range(6)))
+
+    responses = asyncio.run(spike())
+    statuses = sorted(status for status, _ in responses)
+
+    # One request runs, one waits for the slot, the other four are shed at once
+    assert statuses == [200, 200, 503, 503, 503, 503]
+    assert all(payload['reason'] == 'queue_full' for status, payload in responses if status == 503)
+    assert slow_model.stats()['refused']['queue_full'] == 4
+    assert asgi_app.admission_backlog == 0
+
+
+def test_fallback_action_answers_refused_requests(slow_model, monkeypatch):
+    monkeypatch.setattr(service, 'OVERLOAD_ACTION', 'fallback')
+    body = json.dumps({'workAreaPoints': WORK_AREA}).encode('utf-8')
+
+    async def spike():
+        return await asyncio.gather(*(post_predict(body) for _ in range(4)))
+
+    responses = asyncio.run(spike())
+    assert all(status == 200 for status, _ in responses)
+    refused = [payload for _, payload in responses if payload.get('fallback')]
+    assert len(refused) == 2
+    assert all(payload['fallbackReason'] == 'queue_full' for payload in refused)
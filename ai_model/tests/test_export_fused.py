@@ -0,0 +1,51 @@
+"""Parity of the fused NumPy export (export_fused.py) with the torch forward pass"""
+
+import pytest
+
+np = pytest.importorskip('numpy')
+torch = pytest.importorskip('torch')
+pytest.importorskip('pandas')
+preprocessing = pytest.importorskip('sklearn.preprocessing')
+
+import numpy_engine
+from predict import ConstructionPlacementPredictor
+from export_fused import fuse_model, save_fused_model
+
+INPUT_DIM = 8
+
+@pytest.fixture
+def trained():
+    """A small eval-mode model with non-trivial BatchNorm statistics and a fitted scaler"""
+    torch.manual_seed(0)
+    rng = np.random.default_rng(0)
+    model = ConstructionPlacementPredictor(INPUT_DIM)
+    with torch.no_grad():
+        for module in model.modules():
+            if isinstance(module, torch.nn.BatchNorm1d):
+                module.running_mean.uniform_(-0.5, 0.5)
+                module.running_var.uniform_(0.5, 2.0)
+                module.weight.uniform_(0.5, 1.5)
+                module.bias.uniform_(-0.2, 0.2)
+    model.eval()
+
+    # Coordinates like the training data: a tight cluster far from the origin
+    features = np.array([49.8, -97.07] * 4) + rng.normal(scale=1e-3, size=(256, INPUT_DIM))
+    scaler = preprocessing.StandardScaler().fit(features)
+    return model, scaler, features
+
+def test_fused_export_matches_torch_forward(trained, tmp_path):
+    model, scaler, features = trained
+    path = str(tmp_path / numpy_engine.fused_model_path)
+    save_fused_model(fuse_model(model, scaler), path)
+
+    fused, _, _ = numpy_engine.load_trained_model(str(tmp_path))
+    assert fused is not None
+    fused_rotation, fused_position = fused.forward(features)
+
+    with torch.no_grad():
+        scaled = torch.tensor(scaler.transform(features), dtype=torch.float32)
+        torch_rotation, torch_position = model(scaled)
+
+    # The torch forward pass runs in float32, the fused one in float64
+    assert np.allclose(fused_rotation, torch_rotation.numpy()[:, 0], atol=1e-5)
+    assert np.allclose(fused_position, torch_position.numpy(), atol=1e-5)
@@ -8,16 +8,22 @@ two specialized output branches for position and rotation prediction.
 """
 
 import os
+import copy
+import time
+import random
+import argparse
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 import torch
 import torch.nn as nn
 import torch.optim as optim
-from torch.utils.data import Dataset, DataLoader
+from torch.utils.data import Dataset
 import pickle
+from placement import work_area_centroids
+from dataset_cache import CachedDataset, fit_scaler
+from training_telemetry import TelemetryLog, telemetry_file, peak_rss_mb
 
 # Set seeds for reproducibility
 np.random.seed(42)
@@ -52,38 +58,110 @@ class ConstructionDataset(Dataset):
         else:
             return self.features[idx], self.rotation_targets[idx]
 
+# Batches sliced from in-memory tensors. Unlike DataLoader over
+# ConstructionDataset, which indexes and collates one sample at a time in
+# Python, this permutes the whole tensors once per epoch and yields
+# contiguous slices, so each batch costs a couple of tensor views.
+class TensorBatchLoader:
+    def __init__(self, features, rotation_targets, position_targets=None, batch_size=32, shuffle=False):
+        self.features = torch.as_tensor(features, dtype=torch.float32)
+        self.rotation_targets = torch.as_tensor(rotation_targets, dtype=torch.float32).reshape(-1, 1)
+        self.has_position = position_targets is not None
+        if self.has_position:
+            self.position_targets = torch.as_tensor(position_targets, dtype=torch.float32)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+    
+    def __len__(self):
+        return -(-len(self.features) // self.batch_size)
+    
+    def __iter__(self):
+        features = self.features
+        rotation_targets = self.rotation_targets
+        position_targets = self.position_targets if self.has_position else None
+        
+        if self.shuffle:
+            permutation = torch.randperm(len(features))
+            features = features[permutation]
+            rotation_targets = rotation_targets[permutation]
+            if self.has_position:
+                position_targets = position_targets[permutation]
+        
+        for start in range(0, len(features), self.batch_size):
+            end = start + self.batch_size
+            if self.has_position:
+                yield features[start:end], (rotation_targets[start:end], position_targets[start:end])
+            else:
+                yield features[start:end], rotation_targets[start:end]
+
+# Batches streamed from a binary dataset cache (see dataset_cache.py), keeping
+# only one chunk of rows in memory at a time
+class StreamingBatchLoader:
+    def __init__(self, dataset, indices, scaler, batch_size=32, chunk_rows=1000000, shuffle=False, seed=42):
+        self.dataset = dataset
+        self.indices = indices
+        self.scaler = scaler
+        self.batch_size = batch_size
+        self.chunk_rows = chunk_rows
+        self.shuffle = shuffle
+        self.rng = np.random.default_rng(seed)
+        self.has_position = dataset.has_position
+    
+    def __len__(self):
+        # Every chunk is full except possibly the last one
+        full_chunks, last_chunk = divmod(len(self.indices), self.chunk_rows)
+        batches_per_chunk = -(-self.chunk_rows // self.batch_size)
+        return full_chunks * batches_per_chunk + -(-last_chunk // self.batch_size)
+    
+    def __iter__(self):
+        rng = self.rng if self.shuffle else None
+        for X, y_rotation, y_position in self.dataset.iter_chunks(self.indices, self.chunk_rows, rng):
+            features = torch.tensor(self.scaler.transform(X), dtype=torch.float32)
+            rotation_targets = torch.tensor(y_rotation, dtype=torch.float32).unsqueeze(1)
+            if self.has_position:
+                position_targets = torch.tensor(y_position, dtype=torch.float32)
+            
+            for start in range(0, len(features), self.batch_size):
+                end = start + self.batch_size
+                if self.has_position:
+                    yield features[start:end], (rotation_targets[start:end], position_targets[start:end])
+                else:
+                    yield features[start:end], rotation_targets[start:end]
+
 # Define the neural network model with two heads for rotation and position
 class ConstructionPlacementPredictor(nn.Module):
-    def __init__(self, input_dim):
+    def __init__(self, input_dim, hidden_dims=(64, 32, 16)):
         super(ConstructionPlacementPredictor, self).__init__()
+        # Widths of the two shared layers and of each head's hidden layer
+        shared_dim1, shared_dim2, head_dim = hidden_dims
         
         # Shared feature extraction network
         self.shared_network = nn.Sequential(
-            nn.Linear(input_dim, 64),
-            nn.BatchNorm1d(64),
+            nn.Linear(input_dim, shared_dim1),
+            nn.BatchNorm1d(shared_dim1),
             nn.ReLU(),
             nn.Dropout(0.2),
             
-            nn.Linear(64, 32),
-            nn.BatchNorm1d(32),
+            nn.Linear(shared_dim1, shared_dim2),
+            nn.BatchNorm1d(shared_dim2),
             nn.ReLU(),
             nn.Dropout(0.2)
         )
         
         # Branch for rotation prediction
         self.rotation_network = nn.Sequential(
-            nn.Linear(32, 16),
-            nn.BatchNorm1d(16),
+            nn.Linear(shared_dim2, head_dim),
+            nn.BatchNorm1d(head_dim),
             nn.ReLU(),
-            nn.Linear(16, 1)  # Output: rotation (normalized 0-1)
+            nn.Linear(head_dim, 1)  # Output: rotation (normalized 0-1)
         )
         
         # Branch for position prediction
         self.position_network = nn.Sequential(
-            nn.Linear(32, 16),
-            nn.BatchNorm1d(16),
+            nn.Linear(shared_dim2, head_dim),
+            nn.BatchNorm1d(head_dim),
             nn.ReLU(),
-            nn.Linear(16, 2)  # Output: [lat, lng] (normalized)
+            nn.Linear(head_dim, 2)  # Output: [lat, lng] (normalized)
         )
         
     def forward(self, x):
@@ -107,10 +185,27 @@ def angle_loss(pred, target):
     
     return loss.mean()
 
-def preprocess_data(df):
-    """Preprocess the data for model training."""
-    print("Preprocessing data...")
-    
+def masked_position_loss(pred, target):
+    """
+    Mean squared error over the rows whose position target is known.
+    
+    Rows without a construction center have NaN targets (see
+    extract_training_arrays); they add nothing to the loss or its gradient.
+    A batch without any known center has a loss of 0.
+    """
+    known = torch.isfinite(target).all(dim=1, keepdim=True)
+    squared_error = torch.where(known, pred - torch.nan_to_num(target), torch.zeros_like(pred)) ** 2
+    return squared_error.sum() / (known.sum() * target.shape[1]).clamp(min=1)
+
+def extract_training_arrays(df, verbose=True):
+    """
+    Extract features and targets from a samples DataFrame.
+    
+    Returns:
+        tuple: (X, y_rotation, position_offsets) where y_rotation is normalized
+               to 0-1 and position_offsets is None if the CSV has no position data;
+               rows without a construction center have NaN offsets
+    """
     # Extract features (work area points)
     X = df[['reference_point_lat', 'reference_point_lng', 
            'point2_lat', 'point2_lng', 
@@ -124,23 +219,38 @@ def preprocess_data(df):
     y_rotation = y_rotation / 360.0
     
     # Extract position targets
-    if 'construction_center_lat' in df.columns and 'construction_center_lng' in df.columns:
-        print("Found position data in dataset. Training for both rotation and position.")
-        has_position_data = True
-        
-        # Get position data
-        position_data = df[['construction_center_lat', 'construction_center_lng']].values
+    if 'construction_center_lat' in df.columns and 'construction_center_lng' in df.columns and \
+            df[['construction_center_lat', 'construction_center_lng']].notna().all(axis=1).any():
+        # Get position data (NaN for samples from exports without construction centers)
+        position_data = df[['construction_center_lat', 'construction_center_lng']].values.astype(np.float64)
+        known = np.isfinite(position_data).all(axis=1)
+        if verbose:
+            print("Found position data in dataset. Training for both rotation and position.")
+            if not known.all():
+                print(f"{int(known.sum())} of {len(known)} samples have a construction center; "
+                      "the position loss only uses those.")
         
         # Calculate centroid of each work area for normalization reference
-        centroids = np.zeros((len(df), 2))
-        for i in range(len(df)):
-            centroids[i, 0] = (X[i, 0] + X[i, 2] + X[i, 4] + X[i, 6]) / 4  # average of all lats
-            centroids[i, 1] = (X[i, 1] + X[i, 3] + X[i, 5] + X[i, 7]) / 4  # average of all lngs
+        centroids = work_area_centroids(X)
         
         # Calculate the difference between position and centroid
         # This normalizes the position relative to the work area centroid
         position_offsets = position_data - centroids
-        
+    else:
+        if verbose:
+            print("No position data found in dataset. Training for rotation only.")
+        position_offsets = None
+    
+    return X, y_rotation, position_offsets
+
+def preprocess_data(df, save_scaler=True):
+    """Preprocess the data for model training."""
+    print("Preprocessing data...")
+    
+    X, y_rotation, position_offsets = extract_training_arrays(df)
+    has_position_data = position_offsets is not None
+    
+    if has_position_data:
         # Split data maintaining the relationship between X, rotation and position
         X_train, X_temp, y_train_rot, y_temp_rot, y_train_pos, y_temp_pos = train_test_split(
             X, y_rotation, position_offsets, test_size=0.3, random_state=42)
@@ -148,9 +258,6 @@ def preprocess_data(df):
         X_val, X_test, y_val_rot, y_test_rot, y_val_pos, y_test_pos = train_test_split(
             X_temp, y_temp_rot, y_temp_pos, test_size=0.5, random_state=42)
     else:
-        print("No position data found in dataset. Training for rotation only.")
-        has_position_data = False
-        
         # Split the data (rotation only)
         X_train, X_temp, y_train_rot, y_temp_rot = train_test_split(X, y_rotation, test_size=0.3, random_state=42)
         X_val, X_test, y_val_rot, y_test_rot = train_test_split(X_temp, y_temp_rot, test_size=0.5, random_state=42)
@@ -165,19 +272,105 @@ def preprocess_data(df):
     X_test = scaler.transform(X_test)
     
     # Save the scaler for later use
+    if save_scaler:
+        with open(scaler_path, 'wb') as f:
+            pickle.dump(scaler, f)
+    
+    return X_train, X_val, X_test, y_train_rot, y_val_rot, y_test_rot, y_train_pos, y_val_pos, y_test_pos, scaler, has_position_data
+
+def load_cached_data(cache_dir, batch_size=32, chunk_rows=1000000):
+    """
+    Prepare streaming loaders for the splits of a binary dataset cache.
+    
+    The scaler is fitted on the training split chunk by chunk, and the test
+    split is evaluated chunk by chunk (see evaluate_loader), so the full
+    dataset is never loaded into memory.
+    """
+    print(f"Loading dataset cache from {cache_dir}...")
+    dataset = CachedDataset(cache_dir)
+    has_position_data = dataset.has_position
+    print(f"Found {dataset.num_rows} samples ({'rotation and position' if has_position_data else 'rotation only'})")
+    
+    train_indices = dataset.split_indices('train')
+    val_indices = dataset.split_indices('val')
+    test_indices = dataset.split_indices('test')
+    
+    # Normalize features with statistics from the training split only
+    scaler = fit_scaler(dataset, train_indices, chunk_rows)
     with open(scaler_path, 'wb') as f:
         pickle.dump(scaler, f)
     
-    return X_train, X_val, X_test, y_train_rot, y_val_rot, y_test_rot, y_train_pos, y_val_pos, y_test_pos, scaler, has_position_data
+    train_loader = StreamingBatchLoader(dataset, train_indices, scaler, batch_size, chunk_rows, shuffle=True)
+    val_loader = StreamingBatchLoader(dataset, val_indices, scaler, batch_size, chunk_rows)
+    # One forward per chunk
+    test_loader = StreamingBatchLoader(dataset, test_indices, scaler, chunk_rows, chunk_rows)
+    
+    return train_loader, val_loader, test_loader, scaler, has_position_data
+
+# Checkpoint files written to a run directory by train_model
+checkpoint_file = 'checkpoint.pt'
+best_model_file = 'best_model.pt'
+
+def save_atomically(obj, path):
+    """torch.save to a temporary file and rename it, so a kill never leaves a partial file"""
+    tmp_path = path + '.tmp'
+    torch.save(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+def capture_rng_state(train_loader):
+    """Every random number generator that affects the next epoch"""
+    state = {
+        'python': random.getstate(),
+        'numpy': np.random.get_state(),
+        'torch': torch.get_rng_state()
+    }
+    if torch.cuda.is_available():
+        state['cuda'] = torch.cuda.get_rng_state_all()
+    # StreamingBatchLoader shuffles with its own generator
+    if getattr(train_loader, 'rng', None) is not None:
+        state['loader'] = train_loader.rng.bit_generator.state
+    return state
+
+def restore_rng_state(state, train_loader):
+    random.setstate(state['python'])
+    np.random.set_state(state['numpy'])
+    torch.set_rng_state(state['torch'])
+    if 'cuda' in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda'])
+    if 'loader' in state and getattr(train_loader, 'rng', None) is not None:
+        train_loader.rng.bit_generator.state = state['loader']
 
-def train_model(model, train_loader, val_loader, device, has_position_data=False, epochs=100):
-    """Train the model."""
-    print("Training model...")
+def train_model(model, train_loader, val_loader, device, has_position_data=False, epochs=100,
+                lr=0.001, patience=30, position_weight=0.5, verbose=True, val_every=1, throughput=None,
+                checkpoint_dir=None, checkpoint_every=1, resume=False, telemetry=None):
+    """
+    Train the model.
+    
+    position_weight scales the position loss relative to the rotation loss,
+    and training stops early after patience epochs without a lower
+    validation loss. Validation runs every val_every epochs (and after the
+    last one); skipped epochs have NaN in val_losses. If a throughput dict is
+    given, it receives the epoch count, mean epoch seconds and training
+    samples/sec.
+    
+    With a checkpoint_dir, the full training state (model, optimizer, epoch,
+    early-stopping counters, loss history and RNG state) is saved there every
+    checkpoint_every epochs, and the best model so far is saved to
+    best_model.pt whenever it improves. resume=True continues from the
+    checkpoint in checkpoint_dir, if there is one.
+    
+    With a telemetry TelemetryLog, one record per epoch is written with its
+    timing breakdown, throughput, peak RSS and loss components (see
+    training_telemetry.py). On CUDA, kernels run asynchronously, so part of
+    the compute time shows up as data loading time.
+    """
+    if verbose:
+        print("Training model...")
     
     # Optimizer and loss functions
-    optimizer = optim.Adam(model.parameters(), lr=0.001)
+    optimizer = optim.Adam(model.parameters(), lr=lr)
     rotation_criterion = nn.MSELoss()
-    position_criterion = nn.MSELoss() if has_position_data else None
+    position_criterion = masked_position_loss if has_position_data else None
     
     # Lists to store training history
     train_losses = []
@@ -185,17 +378,77 @@ def train_model(model, train_loader, val_loader, device, has_position_data=False
     
     # Variables for early stopping
     best_val_loss = float('inf')
-    patience = 30
     patience_counter = 0
     best_model_state = None
-    
-    for epoch in range(epochs):
+    epoch_seconds = []
+    samples_seen = 0
+    start_epoch = 0
+    stopped = False
+    
+    # A compiled model wraps the original module; checkpoints hold the original's weights
+    base_model = getattr(model, '_orig_mod', model)
+    if checkpoint_dir is not None:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        checkpoint_path = os.path.join(checkpoint_dir, checkpoint_file)
+        best_model_path = os.path.join(checkpoint_dir, best_model_file)
+        
+        if resume and os.path.exists(checkpoint_path):
+            checkpoint = torch.load(checkpoint_path, map_location=device, weights_only=False)
+            base_model.load_state_dict(checkpoint['model'])
+            optimizer.load_state_dict(checkpoint['optimizer'])
+            start_epoch = checkpoint['epoch']
+            stopped = checkpoint['stopped']
+            best_val_loss = checkpoint['best_val_loss']
+            patience_counter = checkpoint['patience_counter']
+            train_losses = checkpoint['train_losses']
+            val_losses = checkpoint['val_losses']
+            epoch_seconds = checkpoint['epoch_seconds']
+            samples_seen = checkpoint['samples_seen']
+            restore_rng_state(checkpoint['rng'], train_loader)
+            if os.path.exists(best_model_path):
+                best_model_state = torch.load(best_model_path, map_location=device)
+            if verbose:
+                print(f"Resuming from {checkpoint_path} after epoch {start_epoch}"
+                      f"{' (training had already stopped)' if stopped else ''}")
+        elif resume and verbose:
+            print(f"No checkpoint in {checkpoint_dir}; starting from scratch")
+    
+    def save_checkpoint(epochs_done):
+        save_atomically({
+            'model': base_model.state_dict(),
+            'optimizer': optimizer.state_dict(),
+            'epoch': epochs_done,
+            'stopped': stopped,
+            'best_val_loss': best_val_loss,
+            'patience_counter': patience_counter,
+            'train_losses': train_losses,
+            'val_losses': val_losses,
+            'epoch_seconds': epoch_seconds,
+            'samples_seen': samples_seen,
+            'rng': capture_rng_state(train_loader)
+        }, checkpoint_path)
+    
+    for epoch in range(start_epoch, epochs):
+        if stopped:
+            break
+
         # Training
+        epoch_started = time.perf_counter()
         model.train()
-        train_loss = 0.0
+        # Accumulated as tensors so there is no sync per batch
+        train_loss = torch.zeros((), device=device)
+        train_rotation_loss = torch.zeros((), device=device)
+        train_position_loss = torch.zeros((), device=device)
+        epoch_samples = 0
+        data_seconds = compute_seconds = 0.0
+        batch_requested = time.perf_counter()
         
         for batch_features, batch_targets in train_loader:
+            batch_received = time.perf_counter()
+            data_seconds += batch_received - batch_requested
             batch_features = batch_features.to(device)
+            epoch_samples += batch_features.shape[0]
+            samples_seen += batch_features.shape[0]
             
             # Different handling based on whether we have position data
             if has_position_data:
@@ -212,7 +465,8 @@ def train_model(model, train_loader, val_loader, device, has_position_data=False
                 position_loss = position_criterion(position_outputs, batch_position_targets)
                 
                 # Combine losses (with position having lower weight)
-                loss = rotation_loss + 0.5 * position_loss
+                loss = rotation_loss + position_weight * position_loss
+                train_position_loss += position_loss.detach()
             else:
                 # Only rotation targets
                 batch_targets = batch_targets.to(device)
@@ -222,20 +476,55 @@ def train_model(model, train_loader, val_loader, device, has_position_data=False
                 
                 # Calculate loss
                 loss = rotation_criterion(rotation_outputs, batch_targets)
+                rotation_loss = loss
             
             # Backward pass and optimize
             optimizer.zero_grad()
             loss.backward()
             optimizer.step()
             
-            train_loss += loss.item()
+            train_loss += loss.detach()
+            train_rotation_loss += rotation_loss.detach()
+            batch_requested = time.perf_counter()
+            compute_seconds += batch_requested - batch_received
         
-        train_loss /= len(train_loader)
+        train_loss = train_loss.item() / len(train_loader)
         train_losses.append(train_loss)
+        epoch_seconds.append(time.perf_counter() - epoch_started)
         
-        # Validation
+        def log_epoch(validation_seconds=0.0, val_loss=None, val_rotation_loss=None, val_position_loss=None):
+            if telemetry is None:
+                return
+            training_seconds = epoch_seconds[-1]
+            telemetry.write(
+                'epoch',
+                epoch=epoch + 1,
+                wall_seconds=training_seconds + validation_seconds,
+                data_seconds=data_seconds,
+                compute_seconds=compute_seconds,
+                validation_seconds=validation_seconds,
+                samples=epoch_samples,
+                samples_per_sec=epoch_samples / training_seconds if training_seconds else 0.0,
+                peak_rss_mb=peak_rss_mb(),
+                train_loss=train_loss,
+                train_rotation_loss=train_rotation_loss.item() / len(train_loader),
+                train_position_loss=train_position_loss.item() / len(train_loader) if has_position_data else None,
+                val_loss=val_loss,
+                val_rotation_loss=val_rotation_loss,
+                val_position_loss=val_position_loss)
+        
+        # Validation (every val_every epochs and after the last one)
+        if (epoch + 1) % val_every != 0 and epoch + 1 < epochs:
+            val_losses.append(float('nan'))
+            log_epoch()
+            if checkpoint_dir is not None and (epoch + 1) % checkpoint_every == 0:
+                save_checkpoint(epoch + 1)
+            continue
+        validation_started = time.perf_counter()
         model.eval()
         val_loss = 0.0
+        val_rotation_loss = 0.0
+        val_position_loss = 0.0
         
         with torch.no_grad():
             for batch_features, batch_targets in val_loader:
@@ -256,7 +545,8 @@ def train_model(model, train_loader, val_loader, device, has_position_data=False
                     position_loss = position_criterion(position_outputs, batch_position_targets)
                     
                     # Combine losses (with position having lower weight)
-                    loss = rotation_loss + 0.5 * position_loss
+                    loss = rotation_loss + position_weight * position_loss
+                    val_position_loss += position_loss.item()
                 else:
                     # Only rotation targets
                     batch_targets = batch_targets.to(device)
@@ -266,69 +556,108 @@ def train_model(model, train_loader, val_loader, device, has_position_data=False
                     
                     # Calculate loss
                     loss = rotation_criterion(rotation_outputs, batch_targets)
+                    rotation_loss = loss
                 
                 val_loss += loss.item()
+                val_rotation_loss += rotation_loss.item()
         
         val_loss /= len(val_loader)
         val_losses.append(val_loss)
+        log_epoch(time.perf_counter() - validation_started, val_loss, val_rotation_loss / len(val_loader),
+                  val_position_loss / len(val_loader) if has_position_data else None)
         
         # Print progress
-        if (epoch + 1) % 10 == 0:
-            print(f"Epoch {epoch+1}/{epochs}, Train Loss: {train_loss:.6f}, Val Loss: {val_loss:.6f}")
+        if verbose and (epoch + 1) % max(10, val_every) == 0:
+            print(f"Epoch {epoch+1}/{epochs}, Train Loss: {train_loss:.6f}, Val Loss: {val_loss:.6f}, "
+                  f"{epoch_seconds[-1]:.2f}s/epoch")
         
-        # Early stopping
+        # Early stopping (keep a real copy: state_dict() returns live references)
         if val_loss < best_val_loss:
             best_val_loss = val_loss
             patience_counter = 0
-            best_model_state = model.state_dict()
+            best_model_state = copy.deepcopy(base_model.state_dict())
+            if checkpoint_dir is not None:
+                save_atomically(best_model_state, best_model_path)
         else:
-            patience_counter += 1
-            if patience_counter >= patience:
+            patience_counter += val_every
+            stopped = patience_counter >= patience
+        
+        if checkpoint_dir is not None and ((epoch + 1) % checkpoint_every == 0 or stopped or epoch + 1 == epochs):
+            save_checkpoint(epoch + 1)
+        if stopped:
+            if verbose:
                 print(f"Early stopping at epoch {epoch+1}")
-                break
+            break
     
     # Load best model
     if best_model_state is not None:
-        model.load_state_dict(best_model_state)
+        base_model.load_state_dict(best_model_state)
+    
+    if throughput is not None:
+        total_seconds = sum(epoch_seconds)
+        throughput['epochs'] = len(epoch_seconds)
+        throughput['mean_epoch_seconds'] = total_seconds / len(epoch_seconds) if epoch_seconds else 0.0
+        throughput['samples_per_sec'] = samples_seen / total_seconds if total_seconds else 0.0
     
     return model, train_losses, val_losses
 
-def evaluate_model(model, X_test, y_test_rot, y_test_pos, device, has_position_data=False):
-    """Evaluate the model on the test set."""
-    print("Evaluating model...")
-    
-    # Convert to PyTorch tensors
-    X_test_tensor = torch.tensor(X_test, dtype=torch.float32).to(device)
+def evaluate_model(model, X_test, y_test_rot, y_test_pos, device, has_position_data=False, results_file=results_path,
+                   chunk_rows=100000):
+    """Evaluate the model on an in-memory test set, chunk_rows rows per forward (see evaluate_loader)."""
+    test_loader = TensorBatchLoader(X_test, y_test_rot, y_test_pos if has_position_data else None, batch_size=chunk_rows)
+    return evaluate_loader(model, test_loader, device, has_position_data, results_file)
+
+def evaluate_loader(model, test_loader, device, has_position_data=False, results_file=results_path):
+    """
+    Evaluate the model on the batches of a test loader, accumulating the
+    errors batch by batch so the test set never has to be in memory at once.
+    With results_file=None, nothing is printed or written.
+    """
+    if results_file is not None:
+        print("Evaluating model...")
+    evaluate_position = has_position_data and test_loader.has_position
+    
+    absolute_error_sum = circular_error_sum = 0.0
+    squared_distance_sum = distance_sum = 0.0
+    num_samples = num_positions = 0
     
-    # Get predictions
     model.eval()
     with torch.no_grad():
-        y_pred_rot, y_pred_pos = model(X_test_tensor)
-        y_pred_rot = y_pred_rot.cpu().numpy().flatten()
-        if has_position_data:
-            y_pred_pos = y_pred_pos.cpu().numpy()
-    
-    # Convert normalized rotation predictions back to degrees
-    y_pred_degrees = y_pred_rot * 360.0
-    y_test_degrees = y_test_rot * 360.0
-    
-    # Calculate mean absolute error in degrees for rotation
-    mae_degrees = np.mean(np.abs(y_pred_degrees - y_test_degrees))
-    
-    # Calculate circular error (accounting for the circular nature of angles)
-    circular_error = []
-    for true, pred in zip(y_test_degrees, y_pred_degrees):
-        # Calculate the minimum angle between the two
-        err = np.abs(((true - pred) + 180) % 360 - 180)
-        circular_error.append(err)
-    
-    mean_circular_error = np.mean(circular_error)
+        for batch_features, batch_targets in test_loader:
+            y_pred_rot, y_pred_pos = model(batch_features.to(device))
+            if test_loader.has_position:
+                batch_rotation_targets, batch_position_targets = batch_targets
+            else:
+                batch_rotation_targets = batch_targets
+            
+            # Convert normalized rotation predictions back to degrees
+            y_pred_degrees = y_pred_rot.cpu().numpy().astype(np.float64).flatten() * 360.0
+            y_test_degrees = batch_rotation_targets.numpy().astype(np.float64).flatten() * 360.0
+            
+            # Absolute error, and circular error (accounting for the circular nature of angles:
+            # the minimum angle between the true and predicted rotation)
+            absolute_error_sum += np.sum(np.abs(y_pred_degrees - y_test_degrees))
+            circular_error_sum += np.sum(np.abs(((y_test_degrees - y_pred_degrees) + 180) % 360 - 180))
+            num_samples += len(y_test_degrees)
+            
+            # Position errors, on the samples that have a construction center
+            if evaluate_position:
+                y_pred_pos = y_pred_pos.cpu().numpy().astype(np.float64)
+                y_test_pos = batch_position_targets.numpy().astype(np.float64)
+                known = np.isfinite(y_test_pos).all(axis=1)
+                squared_distance = np.sum((y_pred_pos[known] - y_test_pos[known]) ** 2, axis=1)
+                squared_distance_sum += np.sum(squared_distance)
+                distance_sum += np.sum(np.sqrt(squared_distance))
+                num_positions += int(known.sum())
+    
+    mae_degrees = absolute_error_sum / num_samples
+    mean_circular_error = circular_error_sum / num_samples
     
     # Evaluate position if available
-    if has_position_data and y_test_pos is not None:
-        # Calculate mean squared error for position
-        position_mse = np.mean(np.sum((y_pred_pos - y_test_pos) ** 2, axis=1))
-        position_mae = np.mean(np.sqrt(np.sum((y_pred_pos - y_test_pos) ** 2, axis=1)))
+    if evaluate_position:
+        # Mean squared error and mean distance error for position
+        position_mse = squared_distance_sum / num_positions if num_positions else float('nan')
+        position_mae = distance_sum / num_positions if num_positions else float('nan')
         
         # Print and save results with position metrics
         results = f"""
@@ -360,24 +689,31 @@ def evaluate_model(model, X_test, y_test_rot, y_test_pos, device, has_position_d
         with an average error of {mean_circular_error:.2f} degrees.
         """
     
-    print(results)
-    
-    with open(results_path, 'w') as f:
-        f.write(results)
+    if results_file is not None:
+        print(results)
+        
+        with open(results_file, 'w') as f:
+            f.write(results)
     
     # Return metrics
-    if has_position_data and y_test_pos is not None:
+    if evaluate_position:
         return mae_degrees, mean_circular_error, position_mse, position_mae
     else:
         return mae_degrees, mean_circular_error, None, None
 
 def plot_training_history(train_losses, val_losses):
-    """Plot and save the training history."""
+    """Plot and save the training history (matplotlib is only imported here)."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
     print("Plotting training history...")
     
     plt.figure(figsize=(10, 6))
     plt.plot(train_losses, label='Training Loss')
-    plt.plot(val_losses, label='Validation Loss')
+    # Validation may only run every few epochs (NaN in between)
+    val_epochs = [i for i, loss in enumerate(val_losses) if not np.isnan(loss)]
+    plt.plot(val_epochs, [val_losses[i] for i in val_epochs], label='Validation Loss',
+             marker='o' if len(val_epochs) < len(val_losses) else None)
     plt.title('Model Loss')
     plt.ylabel('Loss')
     plt.xlabel('Epoch')
@@ -388,76 +724,168 @@ def plot_training_history(train_losses, val_losses):
     plt.savefig(plot_path)
     plt.close()
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Train the construction placement model")
+    parser.add_argument('--dataset-cache', default=None,
+                        help="Train from a binary dataset cache directory (see dataset_cache.py) instead of the CSV")
+    parser.add_argument('--data', default=None,
+                        help="Train on an ingested training set directory (see ingest.py) instead of the CSV")
+    parser.add_argument('--batch-size', type=int, default=32, help="Training and validation batch size")
+    parser.add_argument('--chunk-rows', type=int, default=1000000,
+                        help="Rows loaded into memory at a time when streaming from the dataset cache, "
+                             "and rows per forward when evaluating the test split")
+    parser.add_argument('--epochs', type=int, default=100)
+    parser.add_argument('--patience', type=int, default=30, help="Epochs without improvement before stopping")
+    
+    # CPU performance mode
+    parser.add_argument('--device', choices=['auto', 'cpu', 'cuda'], default='auto',
+                        help="Training device (auto: CUDA if available)")
+    parser.add_argument('--threads', type=int, default=None, help="Intra-op threads (torch.set_num_threads)")
+    parser.add_argument('--interop-threads', type=int, default=None,
+                        help="Inter-op threads (torch.set_num_interop_threads)")
+    parser.add_argument('--compile', action='store_true', help="Compile the model with torch.compile")
+    parser.add_argument('--lr', type=float, default=0.001, help="Learning rate at batch size 32")
+    parser.add_argument('--lr-scaling', choices=['none', 'linear', 'sqrt'], default='none',
+                        help="Scale --lr with --batch-size / 32 (sqrt suits Adam)")
+    parser.add_argument('--val-every', type=int, default=1, help="Run validation every N epochs")
+    
+    # Checkpointing
+    parser.add_argument('--run-dir', default=None,
+                        help="Save checkpoints and the best model so far to this directory (default: no checkpoints)")
+    parser.add_argument('--checkpoint-every', type=int, default=1, help="Save a checkpoint every N epochs (with --run-dir)")
+    parser.add_argument('--resume', action='store_true', help="Continue from the checkpoint in --run-dir")
+    
+    # Telemetry and plotting
+    parser.add_argument('--telemetry', default=None,
+                        help=f"Per-epoch JSONL telemetry log (default: {telemetry_file} in --run-dir, "
+                             "or in the working directory)")
+    parser.add_argument('--no-plot', action='store_true', help=f"Skip drawing {plot_path} after training")
+    args = parser.parse_args(argv)
+    if args.resume and args.run_dir is None:
+        parser.error("--resume needs the --run-dir of the run to continue")
+    return args
+
+def scaled_learning_rate(lr, batch_size, scaling, base_batch_size=32):
+    """Learning rate for batch_size, scaled from one tuned at base_batch_size"""
+    ratio = batch_size / base_batch_size
+    if scaling == 'linear':
+        return lr * ratio
+    if scaling == 'sqrt':
+        return lr * ratio ** 0.5
+    return lr
+
+def main(args=None):
     """Main function to run the training pipeline."""
+    if args is None:
+        args = parse_args([])
     print("Starting construction placement AI training...")
     
-    # Determine device (use GPU if available)
-    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-    print(f"Using device: {device}")
-    
-    # Check if the CSV file exists
-    if not os.path.exists(csv_path):
-        print(f"CSV file not found: {csv_path}")
-        print("Please generate samples first by using the 'Generate 5000 Samples' button in the application.")
-        return None, None, None, None
-    
-    # Load and explore the data
-    df = pd.read_csv(csv_path)
-    print(f"Loaded {len(df)} samples from the CSV file.")
-    print("Sample data:")
-    print(df.head())
-    print("\nColumns in dataset:")
-    print(df.columns.tolist())
-    
-    # Preprocess the data
-    # This returns both rotation and position data if available
-    X_train, X_val, X_test, y_train_rot, y_val_rot, y_test_rot, y_train_pos, y_val_pos, y_test_pos, scaler, has_position_data = preprocess_data(df)
-    
-    # Create datasets and data loaders
-    if has_position_data:
-        print("Creating datasets with both rotation and position targets")
-        train_dataset = ConstructionDataset(X_train, y_train_rot, y_train_pos)
-        val_dataset = ConstructionDataset(X_val, y_val_rot, y_val_pos)
-    else:
-        print("Creating datasets with rotation targets only")
-        train_dataset = ConstructionDataset(X_train, y_train_rot)
-        val_dataset = ConstructionDataset(X_val, y_val_rot)
+    # Thread counts must be set before torch starts any parallel work
+    if args.interop_threads:
+        torch.set_num_interop_threads(args.interop_threads)
+    if args.threads:
+        torch.set_num_threads(args.threads)
     
-    train_loader = DataLoader(train_dataset, batch_size=32, shuffle=True)
-    val_loader = DataLoader(val_dataset, batch_size=32)
+    # Determine device (use GPU if available, unless --device is given)
+    if args.device == 'auto':
+        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    else:
+        device = torch.device(args.device)
+    print(f"Using device: {device} ({torch.get_num_threads()} intra-op, "
+          f"{torch.get_num_interop_threads()} inter-op threads)")
+    
+    if args.dataset_cache:
+        # Stream from the binary cache instead of loading the whole CSV
+        train_loader, val_loader, test_loader, scaler, has_position_data = load_cached_data(
+            args.dataset_cache, batch_size=args.batch_size, chunk_rows=args.chunk_rows)
+    else:
+        if args.data:
+            from ingest import load_ingested
+            df = load_ingested(args.data)
+            # Shards from exports without construction centers have NaN centers,
+            # which the position loss skips (see masked_position_loss)
+            print(f"Loaded {len(df)} samples from {args.data}.")
+        # Check if the CSV file exists
+        elif not os.path.exists(csv_path):
+            print(f"CSV file not found: {csv_path}")
+            print("Please generate samples first by using the 'Generate 5000 Samples' button in the application.")
+            return None, None, None, None
+        else:
+            # Load and explore the data
+            df = pd.read_csv(csv_path)
+            print(f"Loaded {len(df)} samples from the CSV file.")
+        print("Sample data:")
+        print(df.head())
+        print("\nColumns in dataset:")
+        print(df.columns.tolist())
+        
+        # Preprocess the data
+        # This returns both rotation and position data if available
+        X_train, X_val, X_test, y_train_rot, y_val_rot, y_test_rot, y_train_pos, y_val_pos, y_test_pos, scaler, has_position_data = preprocess_data(df)
+        
+        # Create data loaders
+        if has_position_data:
+            print("Creating data loaders with both rotation and position targets")
+        else:
+            print("Creating data loaders with rotation targets only")
+        train_loader = TensorBatchLoader(X_train, y_train_rot, y_train_pos, batch_size=args.batch_size, shuffle=True)
+        val_loader = TensorBatchLoader(X_val, y_val_rot, y_val_pos, batch_size=args.batch_size)
+        test_loader = TensorBatchLoader(X_test, y_test_rot, y_test_pos, batch_size=args.chunk_rows)
     
     # Build and initialize the model
-    input_dim = X_train.shape[1]
+    input_dim = len(scaler.mean_)
     model = ConstructionPlacementPredictor(input_dim).to(device)
     print(model)
     
+    # The compiled module shares its parameters with model, which is what gets saved
+    train_net = torch.compile(model) if args.compile else model
+    lr = scaled_learning_rate(args.lr, args.batch_size, args.lr_scaling)
+    print(f"Batch size {args.batch_size}, learning rate {lr:g}")
+    
+    # Per-epoch telemetry (see training_telemetry.py): a new run starts a new
+    # log, a resumed one appends to it
+    if args.run_dir is not None:
+        os.makedirs(args.run_dir, exist_ok=True)
+    telemetry_path = args.telemetry or os.path.join(args.run_dir or '.', telemetry_file)
+    telemetry = TelemetryLog(telemetry_path, append=args.resume)
+    telemetry.write('run', device=str(device), threads=torch.get_num_threads(),
+                    interop_threads=torch.get_num_interop_threads(), batch_size=args.batch_size, lr=lr,
+                    epochs=args.epochs, train_batches=len(train_loader), val_batches=len(val_loader),
+                    has_position=has_position_data, data=args.dataset_cache or args.data or csv_path,
+                    compiled=args.compile, resume=args.resume)
+    
     # Train the model
-    model, train_losses, val_losses = train_model(model, train_loader, val_loader, device, has_position_data)
+    throughput = {}
+    _, train_losses, val_losses = train_model(train_net, train_loader, val_loader, device, has_position_data,
+                                              epochs=args.epochs, lr=lr, patience=args.patience,
+                                              val_every=args.val_every, throughput=throughput,
+                                              checkpoint_dir=args.run_dir, checkpoint_every=args.checkpoint_every,
+                                              resume=args.resume, telemetry=telemetry)
+    print(f"Training throughput: {throughput['samples_per_sec']:.0f} samples/sec, "
+          f"{throughput['mean_epoch_seconds']:.2f}s per epoch over {throughput['epochs']} epochs")
     
     # Save the model
     torch.save(model.state_dict(), model_path)
     
-    # Evaluate the model
-    if has_position_data:
-        mae, circular_error, position_mse, position_mae = evaluate_model(
-            model, X_test, y_test_rot, y_test_pos, device, has_position_data)
-    else:
-        mae, circular_error, _, _ = evaluate_model(
-            model, X_test, y_test_rot, None, device, has_position_data)
+    # Evaluate the model (one chunk of --chunk-rows rows at a time)
+    mae, circular_error, position_mse, position_mae = evaluate_loader(model, test_loader, device, has_position_data)
     
     # Plot and save training history
-    plot_training_history(train_losses, val_losses)
+    if not args.no_plot:
+        plot_training_history(train_losses, val_losses)
     
     print(f"Training complete! Model saved to {model_path}")
     print(f"Evaluation results saved to {results_path}")
-    print(f"Training history plot saved to {plot_path}")
+    print(f"Training telemetry saved to {telemetry_path}")
+    if not args.no_plot:
+        print(f"Training history plot saved to {plot_path}")
     
     # Update model type info for future reference
     model_info = {
         "model_type": "combined" if has_position_data else "rotation_only",
         "input_dim": input_dim,
-        "trained_with_position": has_position_data
+        "trained_with_position": has_position_data,
+        "training_throughput": throughput
     }
     
     with open("model_info.json", "w") as f:
@@ -472,4 +900,4 @@ def main():
         return model, scaler, (mae, circular_error), None
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(parse_args())
\ No newline at end of file
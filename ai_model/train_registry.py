@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Construction Placement AI - Per-Construction Model Training
+
+This script trains one model per construction type (the construction_name
+column of the samples CSVs) and writes them to a registry directory that the
+API server loads from with MODEL_REGISTRY_DIR (see model_registry.py). Each
+type gets its own model, feature scaler, fused NumPy weights (for
+INFERENCE_BACKEND=numpy) and model_info.json; registry.json maps construction
+names to their subdirectories.
+
+Types already in the registry are kept, so the registry can be extended one
+type at a time with --construction.
+
+Usage:
+    python train_registry.py --output models ../construction_samples_*.csv
+    python train_registry.py --output models --construction "LONG TERM RIGHT LANE CLOSURE ..." samples.csv
+"""
+
+import os
+import re
+import json
+import pickle
+import hashlib
+import argparse
+import pandas as pd
+import torch
+from train_model import (model_path, scaler_path, preprocess_data, TensorBatchLoader,
+                         ConstructionPlacementPredictor, train_model, evaluate_model)
+from model_registry import INDEX_FILE
+from export_fused import fuse_model, save_fused_model
+from numpy_engine import fused_model_path
+
+def construction_slug(name):
+    """Filesystem-safe, collision-free subdirectory name for a construction type"""
+    slug = re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')[:60]
+    return f"{slug}-{hashlib.sha1(name.encode('utf-8')).hexdigest()[:8]}"
+
+def train_construction(name, df, model_dir, args, device):
+    """Train, evaluate and save the model for one construction type"""
+    X_train, X_val, X_test, y_train_rot, y_val_rot, y_test_rot, y_train_pos, y_val_pos, y_test_pos, scaler, has_position_data = \
+        preprocess_data(df, save_scaler=False)
+
+    train_loader = TensorBatchLoader(X_train, y_train_rot, y_train_pos, batch_size=args.batch_size, shuffle=True)
+    val_loader = TensorBatchLoader(X_val, y_val_rot, y_val_pos, batch_size=args.batch_size)
+    model = ConstructionPlacementPredictor(X_train.shape[1]).to(device)
+    model, train_losses, _ = train_model(model, train_loader, val_loader, device, has_position_data,
+                                         epochs=args.epochs, verbose=False)
+    _, circular_error, _, position_error = evaluate_model(
+        model, X_test, y_test_rot, y_test_pos, device, has_position_data, results_file=None)
+
+    os.makedirs(model_dir, exist_ok=True)
+    torch.save(model.state_dict(), os.path.join(model_dir, model_path))
+    with open(os.path.join(model_dir, scaler_path), 'wb') as f:
+        pickle.dump(scaler, f)
+    # Fused weights, so the registry also serves with INFERENCE_BACKEND=numpy
+    save_fused_model(fuse_model(model.cpu().eval(), scaler), os.path.join(model_dir, fused_model_path))
+    model_info = {
+        "construction_name": name,
+        "model_type": "combined" if has_position_data else "rotation_only",
+        "input_dim": X_train.shape[1],
+        "trained_with_position": has_position_data,
+        "num_samples": len(df),
+        "epochs_run": len(train_losses),
+        "mean_circular_error": float(circular_error),
+        "mean_position_error": float(position_error) if position_error is not None else None
+    }
+    with open(os.path.join(model_dir, 'model_info.json'), 'w') as f:
+        json.dump(model_info, f, indent=2)
+    return model_info
+
+def main():
+    parser = argparse.ArgumentParser(description="Train one model per construction type into a registry directory")
+    parser.add_argument('csv_paths', nargs='+', help="Sample CSV files")
+    parser.add_argument('--output', default='models', help="Registry directory")
+    parser.add_argument('--construction', action='append', default=None,
+                        help="Only train this construction type (repeatable)")
+    parser.add_argument('--min-samples', type=int, default=200, help="Skip types with fewer samples")
+    parser.add_argument('--epochs', type=int, default=100)
+    parser.add_argument('--batch-size', type=int, default=32)
+    args = parser.parse_args()
+
+    df = pd.concat([pd.read_csv(path) for path in args.csv_paths], ignore_index=True)
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+
+    index_path = os.path.join(args.output, INDEX_FILE)
+    constructions = {}
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            constructions = json.load(f).get('constructions', {})
+
+    for name, group in df.groupby('construction_name'):
+        if args.construction and name not in args.construction:
+            continue
+        if len(group) < args.min_samples:
+            print(f"Skipping {name!r}: {len(group)} samples (< {args.min_samples})")
+            continue
+        position_columns = ['construction_center_lat', 'construction_center_lng']
+        if set(position_columns) <= set(group.columns) and group[position_columns].isna().any().any():
+            # Some rows come from a CSV without construction centers; train rotation only
+            group = group.drop(columns=position_columns)
+        print(f"\nTraining {name!r} on {len(group)} samples...")
+        directory = construction_slug(name)
+        info = train_construction(name, group.reset_index(drop=True), os.path.join(args.output, directory), args, device)
+        print(f"Mean circular error: {info['mean_circular_error']:.2f} degrees -> {directory}")
+        constructions[name] = directory
+
+    # Replace the index atomically; the server re-reads it when it changes
+    os.makedirs(args.output, exist_ok=True)
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'constructions': constructions}, f, indent=2)
+    os.replace(tmp_path, index_path)
+    print(f"\nRegistry {args.output} has {len(constructions)} construction type(s)")
+
+if __name__ == "__main__":
+    main()
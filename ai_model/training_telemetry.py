@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Construction Placement AI - Training Telemetry
+
+train_model.py writes one JSON object per line to a telemetry log
+(telemetry.jsonl in --run-dir, or in the working directory, by default),
+starting it afresh for a new run
+and appending to it with --resume:
+
+- {"event": "run", ...}: written when a run starts or resumes, with the
+  device, thread counts, batch size, learning rate and batches per epoch
+- {"event": "epoch", ...}: one per epoch, with
+    wall_seconds         training plus validation time of the epoch
+    data_seconds         time spent waiting for the batch loader
+    compute_seconds      forward, backward and optimizer steps
+    validation_seconds   validation pass (0 on epochs without one)
+    samples, samples_per_sec (training samples only)
+    peak_rss_mb          peak resident memory of the process so far
+                         (null where the resource module is unavailable)
+    train/val loss, total and split into rotation and position components
+    (null where there was no validation or no position targets)
+
+This script summarizes one or more logs side by side, to compare throughput
+between runs and datasets, and optionally plots them (matplotlib is only
+imported for --plot).
+
+Usage:
+    python training_telemetry.py telemetry.jsonl
+    python training_telemetry.py run_a/telemetry.jsonl run_b/telemetry.jsonl --plot telemetry.png
+"""
+
+import sys
+import json
+import time
+import argparse
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# File paths
+telemetry_file = 'telemetry.jsonl'
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None if it cannot be read"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class TelemetryLog:
+    """
+    Append-only JSONL log; each record is flushed as it is written, so a
+    crashed or preempted run keeps everything up to its last epoch.
+    With append=False, an existing log at path is emptied first.
+    """
+
+    def __init__(self, path, append=True):
+        self.path = path
+        if not append:
+            open(path, 'w').close()
+
+    def write(self, event, **fields):
+        record = {'event': event, 'time': time.time()}
+        record.update(fields)
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+
+def read_telemetry(path):
+    """
+    Read a telemetry log.
+
+    Returns:
+        tuple: (run records, epoch records) where a resumed run's repeated
+               epochs keep only their latest record
+    """
+    runs, epochs = [], {}
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get('event') == 'run':
+                runs.append(record)
+            elif record.get('event') == 'epoch':
+                epochs[record['epoch']] = record
+    return runs, [epochs[epoch] for epoch in sorted(epochs)]
+
+def summarize(epochs):
+    """Totals and means over the epoch records of one log"""
+    wall = sum(e['wall_seconds'] for e in epochs)
+    samples = sum(e['samples'] for e in epochs)
+    training = sum(e['data_seconds'] + e['compute_seconds'] for e in epochs)
+    val_losses = [e['val_loss'] for e in epochs if e['val_loss'] is not None]
+    return {
+        'epochs': len(epochs),
+        'wall_seconds': wall,
+        'samples_per_sec': samples / training if training else 0.0,
+        'data_fraction': sum(e['data_seconds'] for e in epochs) / wall if wall else 0.0,
+        'compute_fraction': sum(e['compute_seconds'] for e in epochs) / wall if wall else 0.0,
+        'validation_fraction': sum(e['validation_seconds'] for e in epochs) / wall if wall else 0.0,
+        'peak_rss_mb': max((e['peak_rss_mb'] for e in epochs if e['peak_rss_mb'] is not None), default=None),
+        'best_val_loss': min(val_losses) if val_losses else None
+    }
+
+def plot_telemetry(logs, output_path):
+    """Plot losses and throughput per epoch of each log (name -> epoch records)"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig, (loss_axis, throughput_axis) = plt.subplots(2, 1, figsize=(10, 9), sharex=True)
+    for name, epochs in logs.items():
+        x = [e['epoch'] for e in epochs]
+        loss_axis.plot(x, [e['train_loss'] for e in epochs], label=f'{name} train')
+        validated = [e for e in epochs if e['val_loss'] is not None]
+        loss_axis.plot([e['epoch'] for e in validated], [e['val_loss'] for e in validated],
+                       label=f'{name} validation', marker='o' if len(validated) < len(epochs) else None)
+        throughput_axis.plot(x, [e['samples_per_sec'] for e in epochs], label=name)
+    loss_axis.set_title('Loss')
+    loss_axis.set_ylabel('Loss')
+    loss_axis.legend()
+    loss_axis.grid(True)
+    throughput_axis.set_title('Training throughput')
+    throughput_axis.set_ylabel('Samples/sec')
+    throughput_axis.set_xlabel('Epoch')
+    throughput_axis.legend()
+    throughput_axis.grid(True)
+    fig.tight_layout()
+    fig.savefig(output_path)
+    plt.close(fig)
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize and compare training telemetry logs")
+    parser.add_argument('logs', nargs='+', help="telemetry.jsonl files")
+    parser.add_argument('--plot', default=None, help="Also plot losses and throughput to this image")
+    args = parser.parse_args()
+
+    logs = {}
+    print(f"{'log':<40} {'epochs':>7} {'wall (s)':>9} {'samples/s':>10} {'data':>6} {'compute':>8} "
+          f"{'val':>6} {'RSS (MB)':>9} {'best val':>10}")
+    for path in args.logs:
+        runs, epochs = read_telemetry(path)
+        logs[path] = epochs
+        s = summarize(epochs)
+        best = f"{s['best_val_loss']:.6f}" if s['best_val_loss'] is not None else 'n/a'
+        rss = f"{s['peak_rss_mb']:.1f}" if s['peak_rss_mb'] is not None else 'n/a'
+        print(f"{path:<40} {s['epochs']:>7} {s['wall_seconds']:>9.1f} {s['samples_per_sec']:>10.0f} "
+              f"{s['data_fraction']:>6.1%} {s['compute_fraction']:>8.1%} {s['validation_fraction']:>6.1%} "
+              f"{rss:>9} {best:>10}")
+        if runs:
+            run = runs[-1]
+            print(f"{'':<40} device {run.get('device')}, batch size {run.get('batch_size')}, "
+                  f"{run.get('train_batches')} batches per epoch")
+
+    if args.plot:
+        plot_telemetry(logs, args.plot)
+        print(f"Plot saved to {args.plot}")
+
+if __name__ == "__main__":
+    main()